@@ -0,0 +1,93 @@
+"""Per-call overhead of building Web3 clients against sharing them.
+
+Deploys PeoplesCourtDAO to a local hardhat node and times one view call
+(``currentCaseId``) done three ways:
+
+- ``fresh``: a new ``Web3(HTTPProvider)`` and contract per call, as the tools
+  used to do, paying for ABI parsing, a new connection and ``eth_chainId``
+- ``shared``: ``courtroom.chain.get_contract``
+- ``failover``: the shared client with an unreachable primary endpoint in
+  front of the node, after the first call has moved it to the fallback
+
+Also reports how long building the contract object alone takes::
+
+    cd ../../evm && npx hardhat compile && npx hardhat node
+    python bench/chain_overhead.py --calls 200
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+from web3 import Web3
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+from courtroom import chain  # noqa: E402
+from courtroom.constants import MY_ABI  # noqa: E402
+from persona_lookup import ARTIFACT, deploy  # noqa: E402
+
+UNREACHABLE = "http://127.0.0.1:9"
+
+
+def fresh(url: str, address: str):
+    w3 = Web3(Web3.HTTPProvider(url))
+    return w3.eth.contract(address=address, abi=MY_ABI).functions.currentCaseId().call()
+
+
+def time_calls(fn, calls: int) -> dict:
+    timings = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    return {
+        "p50_ms": round(statistics.median(timings) * 1000, 3),
+        "p95_ms": round(timings[int(len(timings) * 0.95) - 1] * 1000, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rpc-url", default="http://127.0.0.1:8545")
+    parser.add_argument("--artifact", default=ARTIFACT)
+    parser.add_argument("--calls", type=int, default=200)
+    args = parser.parse_args()
+
+    contract, _ = deploy(Web3(Web3.HTTPProvider(args.rpc_url)), args.artifact, 2)
+    address = contract.address
+
+    start = time.perf_counter()
+    for _ in range(50):
+        Web3().eth.contract(address=address, abi=MY_ABI)
+    build_ms = (time.perf_counter() - start) / 50 * 1000
+
+    shared = chain.get_contract(address, w3=chain.get_web3([args.rpc_url]))
+    w3 = chain.get_web3([UNREACHABLE, args.rpc_url])
+    behind_failover = chain.get_contract(address, w3=w3)
+    start = time.perf_counter()
+    behind_failover.functions.currentCaseId().call()
+    first_failover_ms = (time.perf_counter() - start) * 1000
+
+    results = {
+        "contract_build_ms": round(build_ms, 3),
+        "fresh": time_calls(lambda: fresh(args.rpc_url, address), args.calls),
+        "shared": time_calls(lambda: shared.functions.currentCaseId().call(), args.calls),
+        "failover": {
+            "first_call_ms": round(first_failover_ms, 3),
+            **time_calls(
+                lambda: behind_failover.functions.currentCaseId().call(), args.calls
+            ),
+            "failovers": w3.provider.failovers,
+        },
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
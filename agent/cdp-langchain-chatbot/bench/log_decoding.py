@@ -0,0 +1,164 @@
+"""Log decoding: web3 contract events against the precompiled decoder table.
+
+Synthesises ``--logs`` raw ``eth_getLogs`` results spread over the six
+courtroom events (no node needed) and times decoding them:
+
+- ``web3``: what the indexer used to do, i.e. web3's ``eth_getLogs`` result
+  formatting followed by ``contract.events[name]().process_log`` per log
+- ``table_formatted``: ``courtroom.abi_decoder`` on the same formatted logs,
+  as it decodes websocket and filter notifications
+- ``table_raw``: ``courtroom.abi_decoder`` on the raw JSON-RPC results, as
+  ``abi_decoder.get_logs`` does for the log scanner in the indexer and
+  subscriber
+
+Every decoded log is checked against web3's arguments. Peak memory comes
+from tracemalloc on a separate run, as tracing slows everything down::
+
+    python bench/log_decoding.py --logs 100000
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+from eth_abi import encode
+from eth_utils import event_abi_to_log_topic
+from web3 import Web3
+from web3._utils.method_formatters import log_entry_formatter
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+from courtroom.abi_decoder import decoder_table  # noqa: E402
+from courtroom.constants import MY_ABI  # noqa: E402
+from courtroom.indexer import INDEXED_EVENTS  # noqa: E402
+
+ADDRESS = "0xD1Bdb459928A66682A98f15DDE2c07b252Eec04a"
+
+
+def _value(abi_type: str, rng: random.Random, users):
+    if abi_type == "address":
+        return rng.choice(users)
+    if abi_type == "bool":
+        return rng.random() < 0.5
+    if abi_type == "string":
+        return f"ipfs://bafy{rng.getrandbits(160):040x}"
+    return rng.getrandbits(64)
+
+
+def synthesise(count: int, seed: int = 1):
+    """``count`` raw logs of the indexed events, as a node would return them"""
+    rng = random.Random(seed)
+    users = [Web3.to_checksum_address(f"0x{rng.getrandbits(160):040x}") for _ in range(200)]
+    events = [e for e in MY_ABI if e.get("type") == "event" and e["name"] in INDEXED_EVENTS]
+    table = decoder_table(MY_ABI, INDEXED_EVENTS)
+    topic0 = {decoder.name: "0x" + topic.hex() for topic, decoder in table.decoders.items()}
+    logs = []
+    for i in range(count):
+        event = rng.choice(events)
+        topics, types, values = [topic0[event["name"]]], [], []
+        for entry in event["inputs"]:
+            value = _value(entry["type"], rng, users)
+            if entry["indexed"]:
+                topics.append("0x" + encode([entry["type"]], [value]).hex())
+            else:
+                types.append(entry["type"])
+                values.append(value)
+        data = encode(types, values)
+        logs.append(
+            {
+                "address": ADDRESS.lower(),
+                "topics": topics,
+                "data": "0x" + data.hex(),
+                "blockNumber": hex(21660147 + i // 4),
+                "blockHash": f"0x{rng.getrandbits(256):064x}",
+                "transactionHash": f"0x{rng.getrandbits(256):064x}",
+                "transactionIndex": "0x0",
+                "logIndex": hex(i % 4),
+                "removed": False,
+            }
+        )
+    return logs
+
+
+def web3_path(contract, raw_logs):
+    decoders = {}
+    for name in INDEXED_EVENTS:
+        event = contract.events[name]
+        decoders[event_abi_to_log_topic(event.abi)] = event()
+    decoded = []
+    for log in raw_logs:
+        formatted = log_entry_formatter(log)
+        decoded.append(decoders[bytes(formatted["topics"][0])].process_log(formatted))
+    return decoded
+
+
+def timed(fn) -> dict:
+    start = time.perf_counter()
+    result = fn()
+    return {"seconds": time.perf_counter() - start, "result": result}
+
+
+def peak_mb(fn) -> float:
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return round(peak / 2**20, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--logs", type=int, default=100_000)
+    parser.add_argument("--memory-logs", type=int, default=20_000)
+    args = parser.parse_args()
+
+    raw = synthesise(args.logs)
+    formatted = [log_entry_formatter(log) for log in raw]
+    contract = Web3().eth.contract(address=ADDRESS, abi=MY_ABI)
+    table = decoder_table(MY_ABI, INDEXED_EVENTS)
+
+    results = {
+        "web3": timed(lambda: web3_path(contract, raw)),
+        "table_formatted": timed(lambda: table.decode_all(formatted)),
+        "table_raw": timed(lambda: table.decode_all(raw)),
+    }
+    expected = [
+        (e["event"], dict(e["args"]), e["blockNumber"], e["logIndex"])
+        for e in results["web3"]["result"]
+    ]
+    for name in ("table_formatted", "table_raw"):
+        got = [(r.event, r.args, r.block_number, r.log_index) for r in results[name]["result"]]
+        assert got == expected, f"{name} disagrees with web3"
+
+    small = raw[: args.memory_logs]
+    memory = {
+        "web3": peak_mb(lambda: web3_path(contract, small)),
+        "table_raw": peak_mb(lambda: table.decode_all(small)),
+    }
+    baseline = results["web3"]["seconds"]
+    print(
+        json.dumps(
+            {
+                "logs": args.logs,
+                **{
+                    name: {
+                        "seconds": round(r["seconds"], 3),
+                        "us_per_log": round(r["seconds"] / args.logs * 1e6, 2),
+                        "speedup": round(baseline / r["seconds"], 1),
+                    }
+                    for name, r in results.items()
+                },
+                f"peak_mb_{args.memory_logs}_logs": memory,
+            },
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""Persona lookup: scanning events against batched state reads.
+
+Deploys PeoplesCourtDAO to a local hardhat node, has the node's accounts
+create ``--personas`` personas (PersonaCreated events are what the scan has
+to wade through), opens a case between two of them and then times both
+ways of finding the parties' persona URIs:
+
+- ``scan``: CaseCreated and PersonaCreated logs from the deployment block,
+  filtered in Python, as get_personas used to
+- ``direct``: ``read_case_parties``, i.e. currentCaseId, cases and
+  personaUris batched through Multicall3 (or a JSON-RPC batch when the chain
+  has no Multicall3, as a plain hardhat node does not)
+
+``--rtt-ms`` adds that much latency to every HTTP request, standing in for
+the distance to a hosted RPC provider::
+
+    cd ../../evm && npx hardhat compile && npx hardhat node
+    python bench/persona_lookup.py --personas 5000 --rtt-ms 40
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+from web3 import Web3
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+from courtroom.constants import MY_ABI  # noqa: E402
+from courtroom.get_personas import _last_case, read_case_parties  # noqa: E402
+
+ARTIFACT = os.path.join(
+    HERE,
+    "../../../evm/artifacts/contracts/PeoplesCourtDAO.sol/PeoplesCourtDAO.json",
+)
+
+
+class CountingProvider(Web3.HTTPProvider):
+    """HTTP provider that counts round trips and adds a fixed delay to each"""
+
+    def __init__(self, url: str, rtt: float):
+        super().__init__(url, cache_allowed_requests=True)
+        self.rtt = rtt
+        self.round_trips = 0
+
+    def _make_request(self, method, request_data):
+        # below web3's request cache, so cached answers are not counted
+        self.round_trips += 1
+        time.sleep(self.rtt)
+        return super()._make_request(method, request_data)
+
+    def make_batch_request(self, requests):
+        self.round_trips += 1
+        time.sleep(self.rtt)
+        return super().make_batch_request(requests)
+
+
+def deploy(w3, artifact: str, personas: int):
+    with open(artifact) as f:
+        compiled = json.load(f)
+    owner, *users = w3.eth.accounts
+    factory = w3.eth.contract(abi=compiled["abi"], bytecode=compiled["bytecode"])
+    receipt = w3.eth.wait_for_transaction_receipt(
+        factory.constructor(owner).transact({"from": owner})
+    )
+    contract = w3.eth.contract(address=receipt["contractAddress"], abi=MY_ABI)
+
+    pending = []
+    for i in range(personas):
+        user = users[i % len(users)]
+        pending.append(
+            contract.functions.createPersona(f"ipfs://persona-{i}").transact({"from": user})
+        )
+    for tx_hash in pending:
+        w3.eth.wait_for_transaction_receipt(tx_hash)
+    w3.eth.wait_for_transaction_receipt(
+        contract.functions.createCase("Bench v. Bench", "", users[0], users[1], 3600, 0).transact(
+            {"from": owner}
+        )
+    )
+    return contract, receipt["blockNumber"]
+
+
+def scan(contract, from_block: int):
+    current_id = contract.functions.currentCaseId().call()
+    case_info = None
+    for event in contract.events.CaseCreated.get_logs(from_block=from_block):
+        if event["args"]["caseId"] == current_id:
+            case_info = event["args"]
+    uris = {}
+    for event in contract.events.PersonaCreated.get_logs(from_block=from_block):
+        user = event["args"]["user"]
+        if user in (case_info["plaintiff"], case_info["defendant"]):
+            uris[user] = event["args"]["personaUri"]
+    return uris
+
+
+def direct(contract, cold: bool):
+    if cold:
+        _last_case.clear()
+    return dict(read_case_parties(contract.w3, contract))
+
+
+def measure(provider, fn, rounds: int) -> dict:
+    timings, trips, result = [], [], None
+    for _ in range(rounds):
+        before = provider.round_trips
+        start = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - start)
+        trips.append(provider.round_trips - before)
+    return {
+        "p50_ms": round(statistics.median(timings) * 1000, 2),
+        "max_ms": round(max(timings) * 1000, 2),
+        "round_trips": statistics.median(trips),
+        "result": result,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rpc-url", default="http://127.0.0.1:8545")
+    parser.add_argument("--artifact", default=ARTIFACT)
+    parser.add_argument("--personas", type=int, default=2000)
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--rtt-ms", type=float, default=0.0)
+    args = parser.parse_args()
+
+    setup = Web3(Web3.HTTPProvider(args.rpc_url))
+    start = time.perf_counter()
+    contract, deployed_at = deploy(setup, args.artifact, args.personas)
+    print(f"setup: {args.personas} personas in {time.perf_counter() - start:.1f}s")
+
+    provider = CountingProvider(args.rpc_url, args.rtt_ms / 1000)
+    w3 = Web3(provider)
+    contract = w3.eth.contract(address=contract.address, abi=MY_ABI)
+    results = {
+        "scan": measure(provider, lambda: scan(contract, deployed_at), args.rounds),
+        "direct_cold": measure(provider, lambda: direct(contract, True), args.rounds),
+        "direct_warm": measure(provider, lambda: direct(contract, False), args.rounds),
+    }
+    expected = results["scan"].pop("result")
+    for name in ("direct_cold", "direct_warm"):
+        assert results[name].pop("result") == expected, f"{name} disagrees with scan"
+    print(json.dumps({"personas": args.personas, "rtt_ms": args.rtt_ms, **results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""Reorg drill: does the event index survive the chain changing under it?
+
+Deploys PeoplesCourtDAO to a local hardhat node and indexes ``--personas``
+PersonaCreated events. Each drill then forces a reorg:
+
+1. ``evm_snapshot``, have ``--depth`` accounts create personas (one block
+   each) and sync the index, which now holds events of that branch
+2. ``evm_revert`` to the snapshot and create ``--depth`` + 1 different
+   personas, a longer branch replacing the first
+3. sync again, timing it and counting RPC round trips
+
+After every drill the index must match the contract's logs read from
+scratch. ``rescan`` is what a fresh index pays for the same history, the
+cost of recovering by throwing the index away. Reorgs deeper than
+``--confirmations`` roll back every unconfirmed block rather than just the
+orphaned ones::
+
+    cd ../../evm && npx hardhat compile && npx hardhat node
+    python bench/reorg_drill.py --personas 2000 --drills 10 --depth 3
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from web3 import Web3
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+from courtroom.constants import MY_ABI  # noqa: E402
+from courtroom.abi_decoder import decoder_table  # noqa: E402
+from courtroom.indexer import INDEXED_EVENTS, EventIndex  # noqa: E402
+from persona_lookup import ARTIFACT, CountingProvider, deploy  # noqa: E402
+
+
+def seeded_index(path: str, contract, deployed_at: int, confirmations: int) -> EventIndex:
+    """An index at ``path`` that starts at the contract's deployment block"""
+    index = EventIndex(path, confirmations)
+    before = contract.w3.eth.get_block(deployed_at - 1)
+    index.store(contract.address, [], deployed_at - 1, before["hash"].to_0x_hex())
+    return index
+
+
+def from_scratch(contract, deployed_at: int):
+    """The contract's events as ``EventIndex.replay`` should return them"""
+    table = decoder_table(contract.abi, INDEXED_EVENTS)
+    logs = contract.w3.eth.get_logs(
+        {
+            "address": contract.address,
+            "topics": [table.topics()],
+            "fromBlock": deployed_at,
+            "toBlock": "latest",
+        }
+    )
+    return [
+        (event.block_number, event.block_hash, event.log_index, event.event, event.args)
+        for event in table.decode_all(logs)
+    ]
+
+
+def create_personas(contract, users, prefix: str):
+    w3 = contract.w3
+    for i, user in enumerate(users):
+        w3.eth.wait_for_transaction_receipt(
+            contract.functions.createPersona(f"ipfs://{prefix}-{i}").transact({"from": user})
+        )
+
+
+def timed_sync(provider, index: EventIndex, contract) -> dict:
+    before = provider.round_trips
+    start = time.perf_counter()
+    index.sync(contract)
+    return {
+        "ms": (time.perf_counter() - start) * 1000,
+        "round_trips": provider.round_trips - before,
+    }
+
+
+def summary(values):
+    return {"p50": round(statistics.median(values), 2), "max": round(max(values), 2)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rpc-url", default="http://127.0.0.1:8545")
+    parser.add_argument("--artifact", default=ARTIFACT)
+    parser.add_argument("--personas", type=int, default=500)
+    parser.add_argument("--drills", type=int, default=5)
+    parser.add_argument("--depth", type=int, default=3, help="blocks orphaned per drill")
+    parser.add_argument("--confirmations", type=int, default=12)
+    parser.add_argument("--rtt-ms", type=float, default=0.0)
+    args = parser.parse_args()
+
+    setup = Web3(Web3.HTTPProvider(args.rpc_url))
+    contract, deployed_at = deploy(setup, args.artifact, args.personas)
+    users = setup.eth.accounts[1 : args.depth + 2]
+    if len(users) < args.depth + 1:
+        parser.error(f"--depth {args.depth} needs {args.depth + 2} node accounts")
+
+    provider = CountingProvider(args.rpc_url, args.rtt_ms / 1000)
+    contract = Web3(provider).eth.contract(address=contract.address, abi=MY_ABI)
+    workdir = tempfile.mkdtemp(prefix="reorg-drill-")
+    index = seeded_index(
+        os.path.join(workdir, "index.sqlite3"), contract, deployed_at, args.confirmations
+    )
+    index.sync(contract)
+    indexed = args.personas
+
+    recoveries, rescans, dropped = [], [], []
+    for drill in range(args.drills):
+        snapshot = setup.provider.make_request("evm_snapshot", [])["result"]
+        create_personas(contract, users[: args.depth], f"orphan-{drill}")
+        index.sync(contract)
+        orphaned = len(index.events(contract.address, "PersonaCreated")) - indexed
+
+        setup.provider.make_request("evm_revert", [snapshot])
+        create_personas(contract, users, f"canonical-{drill}")
+        rollbacks = index.rollbacks
+        recoveries.append(timed_sync(provider, index, contract))
+        assert index.rollbacks == rollbacks + 1, f"drill {drill}: reorg not detected"
+        expected = from_scratch(contract, deployed_at)
+        assert index.replay(contract.address) == expected, f"drill {drill}: index diverged"
+        dropped.append(orphaned)
+        indexed = len(index.events(contract.address, "PersonaCreated"))
+
+        fresh = seeded_index(
+            os.path.join(workdir, f"rescan-{drill}.sqlite3"),
+            contract,
+            deployed_at,
+            args.confirmations,
+        )
+        rescans.append(timed_sync(provider, fresh, contract))
+
+    print(
+        json.dumps(
+            {
+                "events": indexed,
+                "drills": args.drills,
+                "depth": args.depth,
+                "confirmations": args.confirmations,
+                "orphaned_events": summary(dropped),
+                "recovery_ms": summary([r["ms"] for r in recoveries]),
+                "recovery_round_trips": summary([r["round_trips"] for r in recoveries]),
+                "rescan_ms": summary([r["ms"] for r in rescans]),
+                "rescan_round_trips": summary([r["round_trips"] for r in rescans]),
+            },
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
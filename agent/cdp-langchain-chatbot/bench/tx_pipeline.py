@@ -0,0 +1,193 @@
+"""Contract writes: one blocking call after another against the pipeline.
+
+Deploys PeoplesCourtDAO to a local hardhat node switched to mining a block
+every ``--block-ms`` (as Base does every 2 seconds), then has one account
+register ``--writes`` personas twice:
+
+- ``blocking``: ``invoke_contract(...).wait()`` per write, as the register
+  tools used to
+- ``pipeline``: ``courtroom.tx_pipeline.submit`` for every write, then
+  waiting on the handles
+
+and reports the wall time and how many blocks the writes landed in.
+``LocalWallet`` stands in for a CDP wallet: it has the same
+``invoke_contract`` / ``wait`` surface but sends through the node's
+unlocked accounts. Like the CDP API, it picks each call's nonce itself,
+counting up from the account's pending transaction count and reading it
+again after a nonce error, so a call sent out of order is rejected by the
+node rather than reordered by it::
+
+    cd ../../evm && npx hardhat compile && npx hardhat node
+    python bench/tx_pipeline.py --writes 6 --block-ms 2000
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from typing import Optional
+
+from web3 import Web3
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+from courtroom import tx_pipeline  # noqa: E402
+from courtroom.constants import MY_ABI  # noqa: E402
+from persona_lookup import ARTIFACT, deploy  # noqa: E402
+
+
+class LocalTransaction:
+    def __init__(self, w3, tx_hash):
+        self.w3 = w3
+        self.transaction_hash = tx_hash.to_0x_hex()
+        self.transaction_link = None
+        self.receipt = None
+
+    @property
+    def status(self) -> str:
+        if self.receipt is None:
+            return "broadcast"
+        return "complete" if self.receipt["status"] == 1 else "failed"
+
+
+class LocalInvocation:
+    """The parts of cdp.ContractInvocation the tools and the pipeline use"""
+
+    def __init__(self, w3, tx_hash):
+        self.transaction = LocalTransaction(w3, tx_hash)
+
+    @property
+    def status(self) -> str:
+        return self.transaction.status
+
+    def reload(self):
+        # sent before invoke_contract returns, like a wallet holding its key
+        return self
+
+    def wait(self, interval_seconds: float = 0.2, timeout_seconds: float = 20):
+        self.transaction.receipt = self.transaction.w3.eth.wait_for_transaction_receipt(
+            self.transaction.transaction_hash,
+            timeout=timeout_seconds,
+            poll_latency=interval_seconds,
+        )
+        return self
+
+
+class LocalAddress:
+    def __init__(self, address_id: str):
+        self.address_id = address_id
+
+
+class LocalWallet:
+    def __init__(self, w3, account: str):
+        self.w3 = w3
+        self.default_address = LocalAddress(account)
+        self._nonce: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def invoke_contract(
+        self, contract_address, method, abi=None, args=None, amount=None, asset_id=None
+    ):
+        contract = self.w3.eth.contract(address=contract_address, abi=abi)
+        account = self.default_address.address_id
+        with self._lock:
+            if self._nonce is None:
+                self._nonce = self.w3.eth.get_transaction_count(account, "pending")
+            try:
+                tx_hash = contract.functions[method](**(args or {})).transact(
+                    {"from": account, "nonce": self._nonce}
+                )
+            except Exception:
+                # someone else used the nonce, or the count was stale
+                self._nonce = None
+                raise
+            self._nonce += 1
+        return LocalInvocation(self.w3, tx_hash)
+
+
+def blocks_of(w3, tx_hashes):
+    return sorted(
+        {w3.eth.get_transaction_receipt(tx_hash)["blockNumber"] for tx_hash in tx_hashes}
+    )
+
+
+def blocking(wallet, address: str, writes: int) -> dict:
+    start = time.perf_counter()
+    hashes = []
+    for i in range(writes):
+        invocation = wallet.invoke_contract(
+            contract_address=address,
+            method="createPersona",
+            abi=MY_ABI,
+            args={"personaUri": f"ipfs://blocking-{i}"},
+        ).wait()
+        hashes.append(invocation.transaction.transaction_hash)
+    return {"seconds": time.perf_counter() - start, "blocks": blocks_of(wallet.w3, hashes)}
+
+
+def pipelined(wallet, address: str, writes: int) -> dict:
+    start = time.perf_counter()
+    handles = [
+        tx_pipeline.submit(
+            wallet,
+            contract_address=address,
+            method="createPersona",
+            abi=MY_ABI,
+            args={"personaUri": f"ipfs://pipeline-{i}"},
+        )
+        for i in range(writes)
+    ]
+    returned = time.perf_counter() - start
+    for handle in handles:
+        handle.wait()
+    failed = [handle.as_dict() for handle in handles if handle.status != "complete"]
+    assert not failed, failed
+    return {
+        "seconds": time.perf_counter() - start,
+        "seconds_to_handles": returned,
+        "nonce_retries": sum(handle.retries for handle in handles),
+        "blocks": blocks_of(wallet.w3, [handle.transaction_hash for handle in handles]),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rpc-url", default="http://127.0.0.1:8545")
+    parser.add_argument("--artifact", default=ARTIFACT)
+    parser.add_argument("--writes", type=int, default=6)
+    parser.add_argument("--block-ms", type=int, default=2000)
+    args = parser.parse_args()
+
+    w3 = Web3(Web3.HTTPProvider(args.rpc_url))
+    contract, _ = deploy(w3, args.artifact, 2)
+    w3.provider.make_request("evm_setAutomine", [False])
+    w3.provider.make_request("evm_setIntervalMining", [args.block_ms])
+    wallet = LocalWallet(w3, w3.eth.accounts[3])
+
+    results = {
+        "blocking": blocking(wallet, contract.address, args.writes),
+        "pipeline": pipelined(wallet, contract.address, args.writes),
+    }
+    print(
+        json.dumps(
+            {
+                "writes": args.writes,
+                "block_ms": args.block_ms,
+                **{
+                    name: {
+                        **{k: round(v, 2) for k, v in r.items() if k != "blocks"},
+                        "blocks_used": len(r["blocks"]),
+                    }
+                    for name, r in results.items()
+                },
+            },
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -21,6 +21,8 @@ from my_tools import (
 from courtroom.register_persona import initCourtroomRegisterPersona
 from courtroom.register_argument import initCourtroomRegisterArgument
 from courtroom.get_personas import initCourtroomGetAllPersonas
+from courtroom.get_case_dossier import initCourtroomGetCaseDossier
+from courtroom.check_transaction import initCourtroomCheckTransaction
 
 # Configure a file to persist the agent's CDP MPC Wallet Data.
 wallet_data_file = "wallet_data.txt"
@@ -60,7 +62,9 @@ def initialize_agent():
         [
             initCourtroomRegisterPersona(agentkit),
             initCourtroomGetAllPersonas(agentkit),
+            initCourtroomGetCaseDossier(agentkit),
             initCourtroomRegisterArgument(agentkit),
+            initCourtroomCheckTransaction(agentkit),
             CreatePersonaTool(),
             CreatePersonaImageTool(),
             UploadPersonaTool(),
@@ -0,0 +1,205 @@
+"""Event logs decoded straight from the ABI, without web3's contract events.
+
+``contract.events.X().process_log`` walks the ABI again for every log and
+builds several AttributeDicts and HexBytes on the way. ``decoder_table``
+parses the events of an ABI once into a table keyed by topic0, each entry
+holding the compiled eth_abi decoder for its data and a converter for each
+indexed topic. Logs of every event type are decoded in one pass, from raw
+``eth_getLogs`` results (hex strings) or from web3's formatted ones, into
+``LogRecord``\\ s.
+"""
+
+import threading
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from eth_abi.decoding import ContextFramesBytesIO
+from eth_abi.registry import registry
+from eth_utils import event_abi_to_log_topic, to_checksum_address
+
+_lock = threading.Lock()
+_tables: Dict[Tuple[int, Optional[Tuple[str, ...]]], "DecoderTable"] = {}
+
+
+def _bytes(value) -> bytes:
+    if isinstance(value, str):
+        return bytes.fromhex(value[2:] if value.startswith("0x") else value)
+    return bytes(value)
+
+
+def _hex(value) -> str:
+    return value if isinstance(value, str) else "0x" + bytes(value).hex()
+
+
+def _int(value) -> int:
+    return value if isinstance(value, int) else int(value, 16)
+
+
+# the same few parties show up in most courtroom logs
+_checksum = lru_cache(maxsize=4096)(to_checksum_address)
+
+
+def _address(value):
+    return _checksum(value) if isinstance(value, str) else value
+
+
+def _topic_converter(abi_type: str) -> Callable[[bytes], Any]:
+    if abi_type == "address":
+        return lambda topic: _checksum(topic[12:])
+    if abi_type == "bool":
+        return lambda topic: topic[31] == 1
+    if abi_type.startswith("uint"):
+        return lambda topic: int.from_bytes(topic, "big")
+    if abi_type in ("string", "bytes") or abi_type.endswith("]") or abi_type.startswith("("):
+        # dynamic values are indexed by their hash, which is all the log holds
+        return lambda topic: topic
+    decoder = registry.get_tuple_decoder(abi_type)
+    return lambda topic: decoder(ContextFramesBytesIO(topic))[0]
+
+
+class LogRecord:
+    """One decoded event log"""
+
+    __slots__ = (
+        "event",
+        "args",
+        "address",
+        "block_number",
+        "block_hash",
+        "log_index",
+        "transaction_hash",
+    )
+
+    def __init__(
+        self,
+        event: str,
+        args: Dict[str, Any],
+        address: str,
+        block_number: int,
+        block_hash: str,
+        log_index: int,
+        transaction_hash: str,
+    ):
+        self.event = event
+        self.args = args
+        self.address = address
+        self.block_number = block_number
+        self.block_hash = block_hash
+        self.log_index = log_index
+        self.transaction_hash = transaction_hash
+
+    def __repr__(self) -> str:
+        return f"LogRecord({self.event}, block {self.block_number}, log {self.log_index})"
+
+
+class EventDecoder:
+    """Decodes the logs of one event"""
+
+    __slots__ = ("name", "topic", "_indexed", "_data_names", "_data_decoder", "_post")
+
+    def __init__(self, abi: Dict[str, Any]):
+        self.name = abi["name"]
+        self.topic = event_abi_to_log_topic(abi)
+        indexed = [i for i in abi["inputs"] if i["indexed"]]
+        data = [i for i in abi["inputs"] if not i["indexed"]]
+        self._indexed: Tuple[Tuple[str, Callable], ...] = tuple(
+            (i["name"], _topic_converter(i["type"])) for i in indexed
+        )
+        self._data_names = tuple(i["name"] for i in data)
+        self._data_decoder = registry.get_tuple_decoder(*(i["type"] for i in data))
+        # eth_abi hands addresses back lowercase; web3 checksums them
+        self._post: Tuple[Tuple[int, Callable], ...] = tuple(
+            (position, _address) for position, i in enumerate(data) if i["type"] == "address"
+        )
+
+    def decode_args(self, topics: Sequence, data) -> Dict[str, Any]:
+        if len(topics) != len(self._indexed) + 1:
+            raise ValueError(f"{self.name} log has {len(topics)} topics")
+        args = {
+            name: convert(_bytes(topic))
+            for (name, convert), topic in zip(self._indexed, topics[1:])
+        }
+        values = self._data_decoder(ContextFramesBytesIO(_bytes(data)))
+        if self._post:
+            values = list(values)
+            for position, convert in self._post:
+                values[position] = convert(values[position])
+        args.update(zip(self._data_names, values))
+        return args
+
+    def decode(self, log) -> LogRecord:
+        return LogRecord(
+            self.name,
+            self.decode_args(log["topics"], log["data"]),
+            _checksum(log["address"]),
+            _int(log["blockNumber"]),
+            _hex(log["blockHash"]),
+            _int(log["logIndex"]),
+            _hex(log["transactionHash"]),
+        )
+
+
+class DecoderTable:
+    """topic0 of each event in an ABI, mapped to its decoder"""
+
+    def __init__(self, abi: Iterable[Dict[str, Any]], events: Optional[Iterable[str]] = None):
+        wanted = None if events is None else set(events)
+        self.decoders: Dict[bytes, EventDecoder] = {}
+        for entry in abi:
+            if entry.get("type") != "event" or entry.get("anonymous"):
+                continue
+            if wanted is not None and entry["name"] not in wanted:
+                continue
+            decoder = EventDecoder(entry)
+            self.decoders[decoder.topic] = decoder
+
+    def topics(self) -> List[str]:
+        """topic0 of every event in the table, for an ``eth_getLogs`` filter"""
+        return ["0x" + topic.hex() for topic in self.decoders]
+
+    def decode(self, log) -> Optional[LogRecord]:
+        """The decoded log, or None for a log the table has no event for"""
+        topics = log["topics"]
+        if not topics:
+            return None
+        decoder = self.decoders.get(_bytes(topics[0]))
+        return None if decoder is None else decoder.decode(log)
+
+    def decode_all(self, logs: Iterable) -> List[LogRecord]:
+        """Every log the table has an event for, decoded, in the order given"""
+        decoders = self.decoders
+        records = []
+        for log in logs:
+            topics = log["topics"]
+            decoder = decoders.get(_bytes(topics[0])) if topics else None
+            if decoder is not None:
+                records.append(decoder.decode(log))
+        return records
+
+
+def decoder_table(
+    abi: List[Dict[str, Any]], events: Optional[Sequence[str]] = None
+) -> DecoderTable:
+    """The table for ``abi`` (only ``events`` of it, if given), parsed once per process"""
+    key = (id(abi), None if events is None else tuple(events))
+    with _lock:
+        table = _tables.get(key)
+        if table is None:
+            table = _tables[key] = DecoderTable(abi, events)
+        return table
+
+
+def get_logs(w3, table: DecoderTable, query: Dict[str, Any]) -> List[LogRecord]:
+    """Events of ``table`` matching an ``eth_getLogs`` filter, from one raw request
+
+    The request skips web3's result formatting; ``table`` decodes the hex
+    strings as they come. The filter's topics default to the table's events.
+    """
+    query = {"topics": [table.topics()], **query}
+    for key in ("fromBlock", "toBlock"):
+        if isinstance(query.get(key), int):
+            query[key] = hex(query[key])
+    response = w3.provider.make_request("eth_getLogs", [query])
+    if "error" in response:
+        raise ValueError(response["error"])
+    return table.decode_all(response["result"])
@@ -0,0 +1,251 @@
+"""In-memory state of the courtroom contract, built by applying its events.
+
+Events are applied in (block number, log index) order; anything at or
+before the last applied position is ignored, so the same log may be
+delivered twice (a replayed index, then a catch-up scan, then a live
+subscription) without being counted twice.
+
+The state also remembers which block hash each applied event came from, so
+a follower told that a log was removed can tell whether the state took it in
+and has to be rebuilt, and which block each part of a case came from, so
+views can tell final parts from those within ``COURTROOM_CONFIRMATIONS`` of
+the head that a reorg may still undo.
+"""
+
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from courtroom.indexer import CONFIRMATIONS
+
+
+class Case:
+    def __init__(
+        self,
+        case_id: int,
+        title: str,
+        plaintiff: str,
+        defendant: str,
+        prize_pool: int,
+        nft_id: int,
+        block: int = -1,
+    ):
+        self.case_id = case_id
+        self.title = title
+        self.plaintiff = plaintiff
+        self.defendant = defendant
+        self.prize_pool = prize_pool
+        self.nft_id = nft_id
+        # blocks the case was created and finalized in
+        self.block = block
+        self.finalized_block: Optional[int] = None
+        self.evidence: List[Dict[str, Any]] = []
+        self.arguments: List[Dict[str, Any]] = []
+        self.votes: Dict[str, Dict[str, Any]] = {}
+        self.guilty_votes = 0
+        self.innocent_votes = 0
+        self.total_staked = 0
+        self.finalized = False
+        self.guilty_verdict: Optional[bool] = None
+        self.winner: Optional[str] = None
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "case_id": self.case_id,
+            "title": self.title,
+            "plaintiff": self.plaintiff,
+            "defendant": self.defendant,
+            "prize_pool": self.prize_pool,
+            "nft_id": self.nft_id,
+            "evidence": list(self.evidence),
+            "arguments": list(self.arguments),
+            "votes": dict(self.votes),
+            "guilty_votes": self.guilty_votes,
+            "innocent_votes": self.innocent_votes,
+            "total_staked": self.total_staked,
+            "finalized": self.finalized,
+            "guilty_verdict": self.guilty_verdict,
+            "winner": self.winner,
+        }
+
+
+class CourtState:
+    """Cases and personas of one courtroom contract"""
+
+    def __init__(self, address: str):
+        self.address = address
+        self._lock = threading.RLock()
+        self.reset()
+
+    def reset(self):
+        """Forget everything, e.g. to replay the events after a reorg
+
+        A reset state is not fresh until it is marked again.
+        """
+        with self._lock:
+            self.cases: Dict[int, Case] = {}
+            self.personas: Dict[str, str] = {}
+            # block each persona URI was registered in
+            self.persona_blocks: Dict[str, int] = {}
+            self.current_case_id = 0
+            # (block number, log index) of the last event applied
+            self.position: Tuple[int, int] = (-1, -1)
+            # hash of each block events were applied from
+            self.blocks: Dict[int, str] = {}
+            # newest block the state is known to reflect, and when that was learnt
+            self.block = -1
+            self.updated_at = 0.0
+
+    def apply(
+        self,
+        event: str,
+        args: Dict[str, Any],
+        block_number: int,
+        log_index: int,
+        block_hash: Optional[str] = None,
+    ) -> bool:
+        """Apply one event; False if it was at or before the last one applied"""
+        with self._lock:
+            if (block_number, log_index) <= self.position:
+                return False
+            self.position = (block_number, log_index)
+            if block_hash is not None:
+                self.blocks[block_number] = block_hash
+            handler = getattr(self, f"_on_{event}", None)
+            if handler is not None:
+                handler(args, block_number)
+            return True
+
+    def mark(self, block_number: int):
+        """Record that every event up to ``block_number`` has been applied"""
+        with self._lock:
+            self.block = max(self.block, block_number)
+            self.updated_at = time.monotonic()
+
+    def applied(self, block_number: int, block_hash: str) -> bool:
+        """Whether events from this block, on this fork, were applied"""
+        with self._lock:
+            return self.blocks.get(block_number) == block_hash
+
+    def fresh(self, max_age: float) -> bool:
+        """Whether the state heard from the chain within ``max_age`` seconds"""
+        with self._lock:
+            return self.block >= 0 and time.monotonic() - self.updated_at <= max_age
+
+    def current_case(self) -> Optional[Case]:
+        with self._lock:
+            return self.cases.get(self.current_case_id)
+
+    def parties(self) -> Optional[List[Tuple[str, str]]]:
+        """(address, persona URI) of the current case's plaintiff and defendant"""
+        with self._lock:
+            case = self.cases.get(self.current_case_id)
+            if case is None:
+                return None
+            return [
+                (case.plaintiff, self.personas.get(case.plaintiff, "")),
+                (case.defendant, self.personas.get(case.defendant, "")),
+            ]
+
+    def case_view(
+        self, case_id: Optional[int] = None, confirmations: int = CONFIRMATIONS
+    ) -> Optional[Dict[str, Any]]:
+        """One case (the current one by default) with its parties' persona URIs
+
+        Evidence and arguments carry the block they came from and whether it
+        is ``confirmations`` deep; ``unconfirmed`` names every part of the
+        case that is not yet.
+        """
+        with self._lock:
+            case = self.cases.get(self.current_case_id if case_id is None else case_id)
+            if case is None:
+                return None
+            view = case.as_dict()
+            confirmed_block = self.block - confirmations
+            unconfirmed = []
+            if case.block > confirmed_block:
+                unconfirmed.append("case")
+            for role in ("plaintiff", "defendant"):
+                party = getattr(case, role)
+                view[f"{role}_persona_uri"] = self.personas.get(party, "")
+                if self.persona_blocks.get(party, -1) > confirmed_block:
+                    unconfirmed.append(f"{role}_persona")
+            for kind, label in (("evidence", "evidence"), ("arguments", "argument")):
+                view[kind] = [
+                    {**entry, "confirmed": entry["block"] <= confirmed_block}
+                    for entry in view[kind]
+                ]
+                unconfirmed += [
+                    f"{label} {entry[f'{label}_id']}"
+                    for entry in view[kind]
+                    if not entry["confirmed"]
+                ]
+            if case.finalized_block is not None and case.finalized_block > confirmed_block:
+                unconfirmed.append("verdict")
+            view["block"] = self.block
+            view["confirmed_block"] = confirmed_block
+            view["unconfirmed"] = unconfirmed
+            return view
+
+    def _on_CaseCreated(self, args, block_number):
+        case_id = args["caseId"]
+        self.cases[case_id] = Case(
+            case_id,
+            args["title"],
+            args["plaintiff"],
+            args["defendant"],
+            args["prizePool"],
+            args["nftId"],
+            block_number,
+        )
+        self.current_case_id = max(self.current_case_id, case_id)
+
+    def _on_PersonaCreated(self, args, block_number):
+        self.personas[args["user"]] = args["personaUri"]
+        self.persona_blocks[args["user"]] = block_number
+
+    def _on_EvidenceSubmitted(self, args, block_number):
+        case = self.cases.get(args["caseId"])
+        if case is not None:
+            case.evidence.append(
+                {
+                    "evidence_id": args["evidenceId"],
+                    "submitter": args["submitter"],
+                    "uri": args["evidenceUri"],
+                    "block": block_number,
+                }
+            )
+
+    def _on_ArgumentSubmitted(self, args, block_number):
+        case = self.cases.get(args["caseId"])
+        if case is not None:
+            case.arguments.append(
+                {
+                    "argument_id": args["argumentId"],
+                    "submitter": args["submitter"],
+                    "uri": args["argumentUri"],
+                    "block": block_number,
+                }
+            )
+
+    def _on_VoteCast(self, args, block_number):
+        case = self.cases.get(args["caseId"])
+        if case is None:
+            return
+        case.votes[args["voter"]] = {
+            "guilty": args["votedGuilty"],
+            "staked": args["stakedAmount"],
+        }
+        if args["votedGuilty"]:
+            case.guilty_votes += 1
+        else:
+            case.innocent_votes += 1
+        case.total_staked += args["stakedAmount"]
+
+    def _on_CaseFinalized(self, args, block_number):
+        case = self.cases.get(args["caseId"])
+        if case is not None:
+            case.finalized = True
+            case.finalized_block = block_number
+            case.guilty_verdict = args["guiltyVerdict"]
+            case.winner = args["winner"]
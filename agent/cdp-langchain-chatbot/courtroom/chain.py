@@ -0,0 +1,129 @@
+"""Process-wide Web3 clients and contract objects.
+
+Tools used to build a fresh ``Web3`` and contract on every call, which opens
+new connections, asks for the chain id again and re-parses the contract ABI.
+``get_web3`` and ``get_contract`` hand out shared ones instead, each client
+keeping its HTTP connections alive.
+
+``ALCHEMY_API_URL`` is the RPC endpoint; ``RPC_FALLBACK_URLS`` (comma
+separated) lists more to fail over to when it cannot be reached or answers
+with an HTTP error. After ``RPC_FAILBACK_SECONDS`` the primary is tried
+first again.
+"""
+
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from web3 import Web3
+from web3.providers.base import JSONBaseProvider
+
+from courtroom.constants import MY_ABI
+
+TIMEOUT = float(os.getenv("RPC_TIMEOUT", "15"))
+FAILBACK_SECONDS = float(os.getenv("RPC_FAILBACK_SECONDS", "60"))
+
+_lock = threading.Lock()
+_clients: Dict[Tuple[str, ...], Web3] = {}
+_contracts: Dict[Tuple[int, str, int], Any] = {}
+
+
+def rpc_urls() -> List[str]:
+    """The configured RPC endpoints, primary first"""
+    fallbacks = os.getenv("RPC_FALLBACK_URLS", "")
+    return [os.environ["ALCHEMY_API_URL"]] + [url for url in fallbacks.split(",") if url]
+
+
+def _http_provider(url: str) -> Web3.HTTPProvider:
+    session = requests.Session()
+    # the log scanner and document readers share one client across threads
+    session.mount("https://", HTTPAdapter(pool_maxsize=16))
+    session.mount("http://", HTTPAdapter(pool_maxsize=16))
+    return Web3.HTTPProvider(
+        url,
+        session=session,
+        request_kwargs={"timeout": TIMEOUT},
+        # eth_chainId and the like, which web3 asks for around every call
+        cache_allowed_requests=True,
+    )
+
+
+class FailoverProvider(JSONBaseProvider):
+    """Sends each request to the first endpoint that answers
+
+    Only transport failures (connection errors, timeouts, HTTP error
+    statuses) move on to the next endpoint; a JSON-RPC error such as a
+    revert is the chain's answer and is returned as is.
+    """
+
+    def __init__(self, urls: Sequence[str]):
+        super().__init__()
+        self.providers = [_http_provider(url) for url in urls]
+        self.active = 0
+        self.failed_over_at = 0.0
+        self.failovers = 0
+        self._lock = threading.Lock()
+
+    @property
+    def endpoint_uri(self) -> str:
+        return self.providers[0].endpoint_uri
+
+    def _order(self) -> List[int]:
+        with self._lock:
+            if self.active and time.monotonic() - self.failed_over_at > FAILBACK_SECONDS:
+                self.active = 0
+            first = self.active
+        count = len(self.providers)
+        return [(first + offset) % count for offset in range(count)]
+
+    def _send(self, call):
+        order = self._order()
+        error = None
+        for index in order:
+            try:
+                response = call(self.providers[index])
+            except (requests.ConnectionError, requests.Timeout, requests.HTTPError) as e:
+                error = e
+                continue
+            if index != order[0]:
+                with self._lock:
+                    self.active = index
+                    self.failed_over_at = time.monotonic()
+                    self.failovers += 1
+            return response
+        raise error
+
+    def make_request(self, method, params):
+        return self._send(lambda provider: provider.make_request(method, params))
+
+    def make_batch_request(self, requests):
+        return self._send(lambda provider: provider.make_batch_request(requests))
+
+    def is_connected(self, show_traceback: bool = False) -> bool:
+        return any(provider.is_connected(show_traceback) for provider in self.providers)
+
+
+def get_web3(urls: Optional[Sequence[str]] = None) -> Web3:
+    """The shared client for ``urls``, by default the configured endpoints"""
+    key = tuple(urls or rpc_urls())
+    with _lock:
+        w3 = _clients.get(key)
+        if w3 is None:
+            provider = _http_provider(key[0]) if len(key) == 1 else FailoverProvider(key)
+            w3 = _clients[key] = Web3(provider)
+        return w3
+
+
+def get_contract(address: str, abi: List[Dict] = MY_ABI, w3: Optional[Web3] = None):
+    """The shared contract object for ``address`` on ``w3``"""
+    w3 = w3 or get_web3()
+    address = Web3.to_checksum_address(address)
+    key = (id(w3), address, id(abi))
+    with _lock:
+        contract = _contracts.get(key)
+        if contract is None:
+            contract = _contracts[key] = w3.eth.contract(address=address, abi=abi)
+        return contract
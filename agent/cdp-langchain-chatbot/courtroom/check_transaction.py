@@ -0,0 +1,70 @@
+from typing import Optional
+from cdp import Wallet
+from cdp_langchain.tools import CdpTool
+from pydantic import BaseModel, Field
+import time
+
+from courtroom import tx_pipeline
+
+COURTROOM_CHECK_TRANSACTION_PROMPT = """
+This tool checks on courtroom transactions sent earlier, such as persona or argument registrations, by the transaction handle (like `tx-3`) they returned. It reports whether each is still queued, created (waiting to be signed and broadcast), sent, complete or failed (or unknown, when the node already held an identical transaction whose outcome could not be followed), with its transaction hash and any error. It does not send any transaction.
+
+Inputs:
+- Transaction handle (optional, defaults to every transaction not settled yet)
+- Seconds to wait for the transaction to complete or fail (optional, defaults to not waiting)
+"""
+
+
+class CourtroomCheckTransactionInput(BaseModel):
+    """Input argument schema for courtroom check transaction action."""
+
+    handle_id: Optional[str] = Field(
+        None,
+        description="The transaction handle returned when the transaction was sent, such as `tx-3`; leave empty for all unsettled transactions",
+    )
+
+    wait_seconds: Optional[float] = Field(
+        None,
+        description="How long to wait for the transaction to complete or fail before answering",
+    )
+
+
+def courtroom_check_transaction(
+    wallet: Wallet, handle_id: Optional[str] = None, wait_seconds: Optional[float] = None
+) -> dict:
+    """Get the status of courtroom transactions sent through the transaction pipeline.
+
+    Args:
+        wallet (Wallet): The wallet the transactions were sent from.
+        handle_id (str): The transaction handle, or empty for every unsettled transaction
+        wait_seconds (float): Seconds to wait for the transactions to settle first
+
+    Returns:
+        dict: The status of each transaction, keyed by handle
+
+    """
+    if handle_id:
+        handle = tx_pipeline.get(handle_id)
+        if handle is None:
+            return {handle_id: {"ERROR": "no transaction with this handle was sent"}}
+        handles = [handle]
+    else:
+        handles = tx_pipeline.pending()
+    if wait_seconds:
+        # one budget for all of them, as they confirm side by side
+        deadline = time.monotonic() + wait_seconds
+        for handle in handles:
+            handle.wait(max(0.0, deadline - time.monotonic()))
+    return {handle.handle_id: handle.as_dict() for handle in handles}
+
+
+def initCourtroomCheckTransaction(agentkit):
+    """Courtroom check transaction definition."""
+
+    return CdpTool(
+        cdp_agentkit_wrapper=agentkit,
+        name="courtroom_check_transaction_action",
+        description=COURTROOM_CHECK_TRANSACTION_PROMPT,
+        args_schema=CourtroomCheckTransactionInput,
+        func=courtroom_check_transaction,
+    )
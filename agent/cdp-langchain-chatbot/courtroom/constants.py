@@ -1,3 +1,6 @@
+# block the PeoplesCourtDAO contract was deployed at; no events precede it
+DEPLOYMENT_BLOCK = 21660147
+
 MY_ABI = [
     {
         "inputs": [
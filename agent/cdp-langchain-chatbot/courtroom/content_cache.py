@@ -0,0 +1,176 @@
+"""Cache of immutable documents, keyed by CID.
+
+Persona, evidence and argument URIs name IPFS content, which never changes
+under its CID, so a document read once never has to be downloaded again.
+Reads go to an in-memory LRU (``CONTENT_CACHE_MEMORY_MB``), then to a SQLite
+store on disk (``CONTENT_CACHE_PATH``) that survives restarts, and only then
+to the network.
+
+URIs that failed to read are remembered for ``CONTENT_CACHE_NEGATIVE_TTL``
+seconds, so a broken persona does not cost a full gateway timeout on every
+call; asking for one again within that time raises ``CachedFailure``.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+PATH = os.getenv(
+    "CONTENT_CACHE_PATH", os.path.expanduser("~/.cache/peoples-court/content_cache.sqlite3")
+)
+MEMORY_BYTES = int(float(os.getenv("CONTENT_CACHE_MEMORY_MB", "32")) * 1024 * 1024)
+NEGATIVE_TTL = float(os.getenv("CONTENT_CACHE_NEGATIVE_TTL", "60"))
+
+
+class CachedFailure(Exception):
+    """The URI failed to read a short while ago and is not retried yet"""
+
+
+class ContentCache:
+    def __init__(
+        self,
+        path: Optional[str] = PATH,
+        memory_bytes: int = MEMORY_BYTES,
+        negative_ttl: float = NEGATIVE_TTL,
+    ):
+        self.path = path
+        self.memory_bytes = memory_bytes
+        self.negative_ttl = negative_ttl
+        self._memory: "OrderedDict[str, bytes]" = OrderedDict()
+        self._memory_size = 0
+        # key -> (error, expires at), by time.time() so it holds across restarts
+        self._failures: Dict[str, Tuple[str, float]] = {}
+        self._db: Optional[sqlite3.Connection] = None
+        self._lock = threading.RLock()
+        self.counts = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "negative_hits": 0,
+            "misses": 0,
+            "bytes_saved": 0,
+        }
+
+    def _conn(self) -> Optional[sqlite3.Connection]:
+        if self._db is None and self.path:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.executescript(
+                "CREATE TABLE IF NOT EXISTS content ("
+                " key TEXT PRIMARY KEY,"
+                " data BLOB NOT NULL,"
+                " stored_at REAL NOT NULL);"
+                "CREATE TABLE IF NOT EXISTS failures ("
+                " key TEXT PRIMARY KEY,"
+                " error TEXT NOT NULL,"
+                " expires_at REAL NOT NULL);"
+            )
+        return self._db
+
+    def _remember(self, key: str, data: bytes):
+        if len(data) > self.memory_bytes:
+            return
+        previous = self._memory.pop(key, None)
+        if previous is not None:
+            self._memory_size -= len(previous)
+        self._memory[key] = data
+        self._memory_size += len(data)
+        while self._memory_size > self.memory_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_size -= len(evicted)
+
+    def get(self, key: str) -> Optional[bytes]:
+        """The stored content for ``key``, or None if it has to be read
+
+        Raises CachedFailure while a failed read of ``key`` is remembered.
+        """
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                self.counts["memory_hits"] += 1
+                self.counts["bytes_saved"] += len(data)
+                return data
+
+            now = time.time()
+            failure = self._failures.get(key)
+            db = self._conn()
+            if failure is None and db is not None:
+                failure = db.execute(
+                    "SELECT error, expires_at FROM failures WHERE key = ?", (key,)
+                ).fetchone()
+            if failure is not None:
+                error, expires_at = failure
+                if expires_at > now:
+                    self._failures[key] = (error, expires_at)
+                    self.counts["negative_hits"] += 1
+                    raise CachedFailure(f"{error} (cached for {expires_at - now:.0f}s more)")
+                self._failures.pop(key, None)
+                if db is not None:
+                    with db:
+                        db.execute("DELETE FROM failures WHERE key = ?", (key,))
+
+            row = None
+            if db is not None:
+                row = db.execute("SELECT data FROM content WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.counts["misses"] += 1
+                return None
+            data = bytes(row[0])
+            self._remember(key, data)
+            self.counts["disk_hits"] += 1
+            self.counts["bytes_saved"] += len(data)
+            return data
+
+    def put(self, key: str, data: bytes):
+        with self._lock:
+            self._remember(key, data)
+            self._failures.pop(key, None)
+            db = self._conn()
+            if db is not None:
+                with db:
+                    db.execute(
+                        "INSERT OR REPLACE INTO content VALUES (?, ?, ?)",
+                        (key, data, time.time()),
+                    )
+                    db.execute("DELETE FROM failures WHERE key = ?", (key,))
+
+    def fail(self, key: str, error: Exception):
+        """Remember that ``key`` could not be read, for the negative TTL"""
+        entry = (f"{type(error).__name__}: {error}", time.time() + self.negative_ttl)
+        with self._lock:
+            self._failures[key] = entry
+            db = self._conn()
+            if db is not None:
+                with db:
+                    db.execute("INSERT OR REPLACE INTO failures VALUES (?, ?, ?)", (key, *entry))
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            counts = dict(self.counts)
+            memory_size = self._memory_size
+        hits = counts["memory_hits"] + counts["disk_hits"]
+        lookups = hits + counts["negative_hits"] + counts["misses"]
+        return {
+            **counts,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "memory_bytes": memory_size,
+        }
+
+
+_cache: Optional[ContentCache] = None
+
+
+def get_cache() -> ContentCache:
+    """The process-wide cache at CONTENT_CACHE_PATH"""
+    global _cache
+    if _cache is None:
+        _cache = ContentCache()
+    return _cache
+
+
+def stats() -> Dict[str, float]:
+    return get_cache().stats()
@@ -0,0 +1,175 @@
+from typing import Any, Dict, Optional, Tuple
+from cdp import Wallet
+from cdp_langchain.tools import CdpTool
+from pydantic import BaseModel, Field
+import os
+import time
+
+
+from courtroom import ipfs
+from courtroom.chain import get_contract
+from courtroom.subscriber import indexed_state, live_state
+
+COURTROOM_GET_CASE_DOSSIER_PROMPT = """
+This tool reads everything about one courtroom case in a single call: title, plaintiff and defendant with their personas, prize pool, vote tally, whether and how the case was decided, and every piece of evidence and argument with its content. Use it instead of looking these up one by one. It does not send any transaction.
+
+Inputs:
+- Courtroom contract address
+- Courtroom case ID (optional, defaults to the current case)
+
+Important notes:
+- Only supported on the following networks:
+  - Base Sepolia (ie, 'base-sepolia')
+"""
+
+
+class CourtroomGetCaseDossierInput(BaseModel):
+    """Input argument schema for get courtroom case dossier action."""
+
+    contract_address: str = Field(
+        ...,
+        description="The courtroom contract address, such as `0xD1Bdb459928A66682A98f15DDE2c07b252Eec04a`,",
+    )
+
+    case_id: Optional[str] = Field(
+        None,
+        description="The identifier of the contract case to read; leave empty for the current case",
+    )
+
+
+# seconds for one evidence, argument or persona document, and for the whole call
+DOCUMENT_TIMEOUT = float(os.getenv("DOSSIER_FETCH_TIMEOUT", "10"))
+DEADLINE = float(os.getenv("DOSSIER_DEADLINE", "20"))
+# seconds of the deadline spent bringing the indexed case state up to date
+SYNC_TIMEOUT = float(os.getenv("DOSSIER_SYNC_TIMEOUT", "5"))
+# answer from the live case state once it has caught up with the chain
+FOLLOW = os.getenv("COURTROOM_FOLLOW", "1") == "1"
+
+
+class IndexSyncing(Exception):
+    pass
+
+
+def read_case_view(
+    contract, case_id: Optional[int] = None, timeout: float = SYNC_TIMEOUT
+) -> Tuple[Optional[Dict[str, Any]], bool]:
+    """The view of a case, and whether it is stale
+
+    From the followed state when current, otherwise from the indexed state,
+    which gets ``timeout`` seconds to catch up with the index before the view
+    it last had is returned, marked stale.
+    """
+    state = live_state(contract) if FOLLOW else None
+    if state is not None:
+        return state.case_view(case_id), False
+    state, stale = indexed_state(contract, timeout)
+    if state.block < 0:
+        raise IndexSyncing(f"the event index is still syncing {contract.address}")
+    return state.case_view(case_id), stale
+
+
+def _content(document) -> Dict[str, Any]:
+    if isinstance(document, Exception):
+        return {"ERROR": f"{type(document).__name__}: {document}"}
+    return {"content": document}
+
+
+def courtroom_get_case_dossier(
+    wallet: Wallet, contract_address: str, case_id: Optional[str] = None
+) -> dict:
+    """Get a courtroom case with its parties, votes, evidence and arguments.
+
+    Args:
+        wallet (Wallet): The wallet to create the token from.
+        contract_address (str): The courtroom contract token contract address, such as `0xD1Bdb459928A66682A98f15DDE2c07b252Eec04a`
+        case_id (str): The case to read, the current case when empty
+
+    Returns:
+        dict: The case dossier; a document that could not be read carries the reason in ERROR
+            instead of its content
+
+    """
+    started = time.monotonic()
+    if case_id and not case_id.strip().isdigit():
+        return {"ERROR": f"case_id must be a case number, not {case_id!r}"}
+    try:
+        contract = get_contract(contract_address)
+        try:
+            view, stale = read_case_view(
+                contract,
+                int(case_id) if case_id else None,
+                timeout=min(SYNC_TIMEOUT, DEADLINE - (time.monotonic() - started)),
+            )
+        except IndexSyncing as e:
+            return {"ERROR": f"{e}, try again shortly"}
+        if view is None:
+            return {"ERROR": f"no case {case_id or 'opened yet'} on {contract_address}"}
+
+        roles = {view["plaintiff"]: "plaintiff", view["defendant"]: "defendant"}
+        uris = {
+            ("persona", role): view[f"{role}_persona_uri"]
+            for role in ("plaintiff", "defendant")
+            if view[f"{role}_persona_uri"]
+        }
+        for kind in ("evidence", "arguments"):
+            for position, entry in enumerate(view[kind]):
+                uris[(kind, position)] = entry["uri"]
+        documents = ipfs.fetch_json_all(
+            uris,
+            timeout=DOCUMENT_TIMEOUT,
+            deadline=max(0.0, DEADLINE - (time.monotonic() - started)),
+        )
+
+        dossier = {
+            "case_id": view["case_id"],
+            "title": view["title"],
+            "prize_pool": view["prize_pool"],
+            "nft_id": view["nft_id"],
+            "votes": {
+                "guilty": view["guilty_votes"],
+                "innocent": view["innocent_votes"],
+                "total_staked": view["total_staked"],
+            },
+            "finalized": view["finalized"],
+            "guilty_verdict": view["guilty_verdict"],
+            "winner": view["winner"],
+            "as_of_block": view["block"],
+            # the index could not catch up in time; newer events may be missing
+            "stale": stale,
+            # parts a reorg may still undo, until they are COURTROOM_CONFIRMATIONS deep
+            "confirmed_block": view["confirmed_block"],
+            "unconfirmed": view["unconfirmed"],
+        }
+        for role in ("plaintiff", "defendant"):
+            persona = documents.get(("persona", role), LookupError("no persona registered"))
+            dossier[role] = {
+                "WALLET_ADDRESS": view[role],
+                "persona_uri": view[f"{role}_persona_uri"],
+                "confirmed": f"{role}_persona" not in view["unconfirmed"],
+                **_content(persona),
+            }
+        for kind in ("evidence", "arguments"):
+            dossier[kind] = [
+                {
+                    **entry,
+                    "submitter_role": roles.get(entry["submitter"]),
+                    **_content(documents[(kind, position)]),
+                }
+                for position, entry in enumerate(view[kind])
+            ]
+        return dossier
+    except Exception as e:
+        print(f"Error getting case dossier onchain {e!s}")
+        return {}
+
+
+def initCourtroomGetCaseDossier(agentkit):
+    """Courtroom get case dossier definition."""
+
+    return CdpTool(
+        cdp_agentkit_wrapper=agentkit,
+        name="courtroom_get_case_dossier_action",
+        description=COURTROOM_GET_CASE_DOSSIER_PROMPT,
+        args_schema=CourtroomGetCaseDossierInput,
+        func=courtroom_get_case_dossier,
+    )
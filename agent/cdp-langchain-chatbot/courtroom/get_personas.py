@@ -1,15 +1,16 @@
 from collections import defaultdict
+from typing import Dict, List, Tuple
 from cdp import Wallet
 from cdp_langchain.tools import CdpTool
 from pydantic import BaseModel, Field
 import os
-import requests
-from web3 import Web3
+import time
 
 
-from courtroom.constants import (
-    MY_ABI,
-)
+from courtroom import ipfs
+from courtroom.chain import get_contract
+from courtroom.multicall import call_all
+from courtroom.subscriber import live_state
 
 COURTROOM_GET_ALL_PERSONAS_PROMPT = """
 This tool can only be used to perfom a function call on a contract with ETH. Do not use this tool for any other purpose, or trading any assets.
@@ -32,6 +33,60 @@ class CourtroomGetAllPersonasInput(BaseModel):
     )
 
 
+# seconds for one persona document, and for the whole tool call
+PERSONA_TIMEOUT = float(os.getenv("PERSONA_FETCH_TIMEOUT", "10"))
+DEADLINE = float(os.getenv("PERSONAS_DEADLINE", "20"))
+# answer from the live case state once it has caught up with the chain
+FOLLOW = os.getenv("COURTROOM_FOLLOW", "1") == "1"
+
+# parties of the latest case seen per contract; a case's parties never change,
+# so while it stays the latest they need not be looked up again
+_last_case: Dict[str, Tuple[int, str, str]] = {}
+
+
+def _results(values: List) -> List:
+    for value in values:
+        if isinstance(value, Exception):
+            raise value
+    return values
+
+
+def read_case_parties(w3, contract) -> List[Tuple[str, str]]:
+    """(address, persona URI) of the current case's plaintiff and defendant
+
+    One batched round trip while the current case is the one seen last time,
+    three when a new case has started.
+    """
+    functions = contract.functions
+    known = _last_case.get(contract.address)
+    if known is not None:
+        case_id, plaintiff, defendant = known
+        current_id, plaintiff_uri, defendant_uri = _results(
+            call_all(
+                w3,
+                [
+                    functions.currentCaseId(),
+                    functions.personaUris(plaintiff),
+                    functions.personaUris(defendant),
+                ],
+            )
+        )
+        if current_id == case_id:
+            return [(plaintiff, plaintiff_uri), (defendant, defendant_uri)]
+    else:
+        current_id = functions.currentCaseId().call()
+
+    case = functions.cases(current_id).call()
+    # cases() returns the Case struct's fields in declaration order
+    plaintiff, defendant = case[2], case[3]
+    assert int(plaintiff, 16), "failed to fetch case info"
+    _last_case[contract.address] = (current_id, plaintiff, defendant)
+    plaintiff_uri, defendant_uri = _results(
+        call_all(w3, [functions.personaUris(plaintiff), functions.personaUris(defendant)])
+    )
+    return [(plaintiff, plaintiff_uri), (defendant, defendant_uri)]
+
+
 def courtroom_get_all_personas(wallet: Wallet, contract_address: str) -> dict:
     """Get all of the personas uploaded to the courtroom contract.
 
@@ -40,44 +95,42 @@ def courtroom_get_all_personas(wallet: Wallet, contract_address: str) -> dict:
         contract_address (str): The courtroom contract token contract address, such as `0xD1Bdb459928A66682A98f15DDE2c07b252Eec04a`
 
     Returns:
-        dict: A collection containing all the persona definitions and their courtroom roles
+        dict: A collection containing all the persona definitions and their courtroom roles;
+            an entry whose document could not be read carries the reason in ERROR
 
     """
+    started = time.monotonic()
     try:
-        w3 = Web3(Web3.HTTPProvider(os.environ["ALCHEMY_API_URL"]))
-        contract = w3.eth.contract(address=contract_address, abi=MY_ABI)
-
-        current_id = contract.functions.currentCaseId().call()
-        case_info = None
-        events = contract.events.CaseCreated.get_logs(from_block=21660147)
-        for event in events:
-            if event.get("args").get("caseId") == current_id:
-                case_info = event.get("args")
-                break
-        assert case_info is not None, "failed to fetch case info"
+        contract = get_contract(contract_address)
+        w3 = contract.w3
+
+        state = live_state(contract) if FOLLOW else None
+        parties = state.parties() if state is not None else None
+        if parties is None:
+            parties = read_case_parties(w3, contract)
+        roles = dict(zip(("plaintiff", "defendant"), parties))
+        documents = ipfs.fetch_json_all(
+            {role: uri for role, (_, uri) in roles.items() if uri},
+            timeout=PERSONA_TIMEOUT,
+            deadline=max(0.0, DEADLINE - (time.monotonic() - started)),
+        )
         personas = defaultdict(dict)
-        events = contract.events.PersonaCreated.get_logs(from_block=21660147)
-        for event in events:
-            try:
-                user = event.get("args").get("user")
-                if user not in [case_info.plaintiff, case_info.defendant]:
-                    continue
-                res = requests.get(event.get("args").get("personaUri"))
-                res.raise_for_status()
-                personas[user] = res.json()
-                personas[user]["COURTROOM_ROLE"] = (
-                    "plaintiff" if case_info.plaintiff == user else "defendant"
-                )
-                personas[user]["WALLET_ADDRESS"] = user
-            except Exception as ex:
-                print(f"SKIP ENTRY: failed to process event {ex!r}")
-                pass
+        for role, (user, persona_uri) in roles.items():
+            document = documents.get(role, LookupError("no persona registered"))
+            if isinstance(document, Exception):
+                # keep the entry, so the caller can tell who is missing and why
+                personas[user]["ERROR"] = f"{type(document).__name__}: {document}"
+            elif isinstance(document, dict):
+                personas[user] = document
+            else:
+                personas[user]["ERROR"] = f"persona document is not an object: {persona_uri}"
+            personas[user]["COURTROOM_ROLE"] = role
+            personas[user]["WALLET_ADDRESS"] = user
         return personas
     except Exception as e:
         print(f"Error getting all persona onchain {e!s}")
         return {}
 
-
 def initCourtroomGetAllPersonas(agentkit):
     """Courtroom get all persona definition."""
 
@@ -0,0 +1,348 @@
+"""Local SQLite index of the PeoplesCourtDAO events the courtroom tools read.
+
+Each sync fetches only the blocks after the persisted cursor, so tools pay for
+new history rather than rescanning from the deployment block every call.
+
+Blocks within ``COURTROOM_CONFIRMATIONS`` of the newest indexed one may still
+be reorganised away. The index keeps the hash of every such block and, before
+syncing, checks them newest first against the chain: the first one still on
+the chain vouches for every block below it. Rows above it are rolled back and
+those blocks fetched again; older, confirmed rows are never touched.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+from functools import partial
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from web3.exceptions import BlockNotFound
+
+from courtroom.abi_decoder import LogRecord, decoder_table, get_logs
+from courtroom.constants import DEPLOYMENT_BLOCK
+from courtroom.log_scanner import scan_logs
+
+CONFIRMATIONS = int(os.getenv("COURTROOM_CONFIRMATIONS", "12"))
+# bumped whenever the tables change; older index files are rebuilt from the chain
+SCHEMA_VERSION = 2
+
+INDEXED_EVENTS = (
+    "CaseCreated",
+    "PersonaCreated",
+    "EvidenceSubmitted",
+    "ArgumentSubmitted",
+    "VoteCast",
+    "CaseFinalized",
+)
+
+
+def _hex(value) -> str:
+    return value.to_0x_hex() if hasattr(value, "to_0x_hex") else value.hex()
+
+
+def _block_hashes(w3, numbers: Iterable[int]) -> Dict[int, str]:
+    """Hash of each block in ``numbers``, in one JSON-RPC batch where possible"""
+    numbers = list(numbers)
+    if not numbers:
+        return {}
+    try:
+        responses = w3.provider.make_batch_request(
+            [("eth_getBlockByNumber", [hex(number), False]) for number in numbers]
+        )
+    except (AttributeError, NotImplementedError):
+        responses = None
+    if not isinstance(responses, list):
+        return {number: _hex(w3.eth.get_block(number)["hash"]) for number in numbers}
+    hashes = {}
+    for number, response in zip(numbers, responses):
+        block = response.get("result")
+        if block is not None:
+            hashes[number] = block["hash"]
+    return hashes
+
+
+class EventIndex:
+    """Events of one or more courtroom contracts, keyed by block and log index"""
+
+    def __init__(self, path: str, confirmations: int = CONFIRMATIONS):
+        self.path = path
+        self.confirmations = confirmations
+        self.rollbacks = 0
+        self._db: Optional[sqlite3.Connection] = None
+        self._lock = threading.RLock()
+
+    def _conn(self) -> sqlite3.Connection:
+        if self._db is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            (version,) = self._db.execute("PRAGMA user_version").fetchone()
+            if version != SCHEMA_VERSION:
+                self._db.executescript(
+                    "DROP TABLE IF EXISTS events;"
+                    "DROP TABLE IF EXISTS cursors;"
+                    "DROP TABLE IF EXISTS blocks;"
+                    f"PRAGMA user_version = {SCHEMA_VERSION};"
+                )
+            self._db.executescript(
+                "CREATE TABLE IF NOT EXISTS events ("
+                " contract TEXT NOT NULL,"
+                " block_number INTEGER NOT NULL,"
+                " block_hash TEXT NOT NULL,"
+                " log_index INTEGER NOT NULL,"
+                " tx_hash TEXT NOT NULL,"
+                " event TEXT NOT NULL,"
+                " case_id INTEGER,"
+                " user TEXT,"
+                " args TEXT NOT NULL,"
+                " PRIMARY KEY (contract, block_number, log_index));"
+                "CREATE INDEX IF NOT EXISTS events_by_case"
+                " ON events (contract, event, case_id);"
+                "CREATE INDEX IF NOT EXISTS events_by_user"
+                " ON events (contract, event, user);"
+                "CREATE TABLE IF NOT EXISTS cursors ("
+                " contract TEXT PRIMARY KEY,"
+                " last_block INTEGER NOT NULL);"
+                # hashes of the unconfirmed blocks the index relies on
+                "CREATE TABLE IF NOT EXISTS blocks ("
+                " contract TEXT NOT NULL,"
+                " block_number INTEGER NOT NULL,"
+                " block_hash TEXT NOT NULL,"
+                " PRIMARY KEY (contract, block_number));"
+            )
+        return self._db
+
+    def cursor(self, contract_address: str) -> int:
+        """Last block whose events are in the index"""
+        with self._lock:
+            row = (
+                self._conn()
+                .execute(
+                    "SELECT last_block FROM cursors WHERE contract = ?",
+                    (contract_address,),
+                )
+                .fetchone()
+            )
+        return row[0] if row else DEPLOYMENT_BLOCK - 1
+
+    def confirmed_block(self, contract_address: str) -> int:
+        """Last block deep enough below the cursor to be final"""
+        return max(self.cursor(contract_address) - self.confirmations, DEPLOYMENT_BLOCK - 1)
+
+    def store(
+        self,
+        contract_address: str,
+        events: Iterable[LogRecord],
+        last_block: int,
+        last_hash: str,
+        recent: Optional[Dict[int, str]] = None,
+    ):
+        """Add decoded events and move the cursor in one transaction
+
+        ``last_hash`` is the hash of ``last_block``, the head the events were
+        read up to, and ``recent`` the hashes of the unconfirmed blocks below it.
+        """
+        rows = []
+        hashes = dict(recent or {})
+        hashes[last_block] = last_hash
+        for event in events:
+            args = event.args
+            hashes[event.block_number] = event.block_hash
+            rows.append(
+                (
+                    contract_address,
+                    event.block_number,
+                    event.block_hash,
+                    event.log_index,
+                    event.transaction_hash,
+                    event.event,
+                    args.get("caseId"),
+                    args.get("user") or args.get("submitter") or args.get("voter"),
+                    json.dumps(args),
+                )
+            )
+        with self._lock:
+            db = self._conn()
+            with db:
+                db.executemany(
+                    "INSERT OR REPLACE INTO events VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    rows,
+                )
+                db.executemany(
+                    "INSERT OR REPLACE INTO blocks VALUES (?, ?, ?)",
+                    [(contract_address, number, h) for number, h in hashes.items()],
+                )
+                db.execute(
+                    "INSERT OR REPLACE INTO cursors VALUES (?, ?)",
+                    (contract_address, last_block),
+                )
+                # confirmed blocks are no longer checked for reorgs
+                db.execute(
+                    "DELETE FROM blocks WHERE contract = ? AND block_number <= ?",
+                    (contract_address, last_block - self.confirmations),
+                )
+
+    def fork_point(self, w3, contract_address: str) -> Optional[int]:
+        """Last indexed block still on the chain, or None if all of them are
+
+        Only the unconfirmed blocks are checked, each of which has its hash
+        stored; when none of them is left, the reorg went deeper than the
+        confirmation depth and the newest confirmed block is taken on trust.
+        """
+        with self._lock:
+            stored = (
+                self._conn()
+                .execute(
+                    "SELECT block_number, block_hash FROM blocks"
+                    " WHERE contract = ? ORDER BY block_number DESC",
+                    (contract_address,),
+                )
+                .fetchall()
+            )
+        for position, (number, block_hash) in enumerate(stored):
+            try:
+                on_chain = _hex(w3.eth.get_block(number)["hash"])
+            except BlockNotFound:
+                on_chain = None
+            if on_chain == block_hash:
+                return None if position == 0 else number
+        if not stored:
+            return None
+        confirmed = self.confirmed_block(contract_address)
+        print(
+            f"courtroom index: reorg below the last {self.confirmations} blocks,"
+            f" rolling back to block {confirmed}"
+        )
+        return confirmed
+
+    def rollback(self, contract_address: str, block_number: int) -> int:
+        """Drop everything indexed after ``block_number``; returns the events dropped"""
+        with self._lock:
+            db = self._conn()
+            with db:
+                dropped = db.execute(
+                    "DELETE FROM events WHERE contract = ? AND block_number > ?",
+                    (contract_address, block_number),
+                ).rowcount
+                db.execute(
+                    "DELETE FROM blocks WHERE contract = ? AND block_number > ?",
+                    (contract_address, block_number),
+                )
+                db.execute(
+                    "UPDATE cursors SET last_block = ? WHERE contract = ?",
+                    (block_number, contract_address),
+                )
+            self.rollbacks += 1
+            return dropped
+
+    def sync(self, contract) -> int:
+        """Index the events emitted since the cursor; returns how many
+
+        Blocks reorganised away since the last sync are rolled back and
+        fetched again first.
+        """
+        # one sync at a time, so two tools don't fetch the same range
+        with self._lock:
+            fork = self.fork_point(contract.w3, contract.address)
+            if fork is not None:
+                self.rollback(contract.address, fork)
+
+            start = self.cursor(contract.address) + 1
+            head = contract.w3.eth.get_block("latest")
+            if start > head["number"]:
+                return 0
+
+            table = decoder_table(contract.abi, INDEXED_EVENTS)
+            events = scan_logs(
+                contract.w3,
+                {"address": contract.address, "topics": [table.topics()]},
+                start,
+                head["number"],
+                fetch=partial(get_logs, contract.w3, table),
+            )
+            # every unconfirmed block, so a shallow reorg is found at its depth
+            recent = _block_hashes(
+                contract.w3,
+                range(max(start, head["number"] - self.confirmations + 1), head["number"]),
+            )
+            self.store(
+                contract.address, events, head["number"], _hex(head["hash"]), recent
+            )
+            return len(events)
+
+    def events(
+        self,
+        contract_address: str,
+        event: str,
+        case_id: Optional[int] = None,
+        user: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        """Decoded arguments of matching events, oldest first"""
+        query = "SELECT args FROM events WHERE contract = ? AND event = ?"
+        params: List[Any] = [contract_address, event]
+        if case_id is not None:
+            query += " AND case_id = ?"
+            params.append(case_id)
+        if user is not None:
+            query += " AND user = ?"
+            params.append(user)
+        query += " ORDER BY block_number, log_index"
+        with self._lock:
+            rows = self._conn().execute(query, params).fetchall()
+        return [json.loads(args) for args, in rows]
+
+    def replay(
+        self, contract_address: str, after: Tuple[int, int] = (-1, -1)
+    ) -> List[Tuple[int, str, int, str, Dict[str, Any]]]:
+        """(block number, block hash, log index, event, arguments) of every event, in order
+
+        Only events after the (block number, log index) position ``after``.
+        """
+        block, log_index = after
+        with self._lock:
+            rows = (
+                self._conn()
+                .execute(
+                    "SELECT block_number, block_hash, log_index, event, args FROM events"
+                    " WHERE contract = ?"
+                    " AND (block_number > ? OR (block_number = ? AND log_index > ?))"
+                    " ORDER BY block_number, log_index",
+                    (contract_address, block, block, log_index),
+                )
+                .fetchall()
+            )
+        return [
+            (block, block_hash, index, event, json.loads(args))
+            for block, block_hash, index, event, args in rows
+        ]
+
+    def case(self, contract_address: str, case_id: int) -> Optional[Dict[str, Any]]:
+        """Arguments of the CaseCreated event for ``case_id``"""
+        created = self.events(contract_address, "CaseCreated", case_id=case_id)
+        return created[-1] if created else None
+
+    def personas(self, contract_address: str, users: Iterable[str]) -> Dict[str, str]:
+        """Latest persona URI registered by each of ``users`` that has one"""
+        latest = {}
+        for user in users:
+            created = self.events(contract_address, "PersonaCreated", user=user)
+            if created:
+                latest[user] = created[-1]["personaUri"]
+        return latest
+
+
+_index: Optional[EventIndex] = None
+
+
+def get_index() -> EventIndex:
+    """The process-wide index at COURTROOM_INDEX_PATH"""
+    global _index
+    if _index is None:
+        _index = EventIndex(
+            os.getenv(
+                "COURTROOM_INDEX_PATH",
+                os.path.expanduser("~/.cache/peoples-court/courtroom_index.sqlite3"),
+            )
+        )
+    return _index
@@ -0,0 +1,295 @@
+"""Hedged, verified reads of IPFS content referenced by the courtroom contract.
+
+Persona and argument URIs point at one gateway. When ``IPFS_GATEWAYS`` lists
+more (comma separated base URLs such as ``https://ipfs.io``), the same CID is
+also requested from them once the fastest source has not answered within
+``IPFS_HEDGE_DELAY`` seconds, and the first good answer wins.
+
+Answers are checked against the CID, so mirrors do not have to be trusted:
+
+- raw-leaf CIDv1 (``bafkrei...``, every document pinned by the webservice):
+  the sha2-256 of the bytes must be the CID's digest
+- single-chunk CIDv0 (``Qm...``): the same, over the UnixFS wrapper ``ipfs add``
+  puts around the bytes
+
+Content that cannot be checked this way is only accepted from the URI's own
+gateway, or for ``ipfs://`` URIs from the configured ones.
+
+Content read by CID is kept in the content cache (``courtroom.content_cache``),
+whichever gateway it came from; URIs that fail to read are not retried until
+the cache's negative TTL runs out.
+"""
+
+import base64
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Dict, List, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from courtroom.content_cache import get_cache
+
+GATEWAYS = [url.rstrip("/") for url in os.getenv("IPFS_GATEWAYS", "").split(",") if url]
+HEDGE_DELAY = float(os.getenv("IPFS_HEDGE_DELAY", "0.5"))
+TIMEOUT = float(os.getenv("IPFS_TIMEOUT", "20"))
+MAX_BYTES = int(os.getenv("IPFS_FETCH_MAX_BYTES", str(16 * 1024 * 1024)))
+
+CHUNK_SIZE = 256 * 1024
+# weight of the newest sample in each gateway's latency average
+ALPHA = 0.2
+ERROR_PENALTY = 5.0
+
+_CID_PATH = re.compile(r"^(?:ipfs://|.*?/ipfs/)([A-Za-z0-9]+)(.*)$")
+_BASE58 = "123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz"
+
+_session = requests.Session()
+_session.mount("https://", HTTPAdapter(pool_maxsize=32))
+_session.mount("http://", HTTPAdapter(pool_maxsize=32))
+_pool = ThreadPoolExecutor(max_workers=16, thread_name_prefix="ipfs")
+# runs whole fetches, which wait on _pool, so it must not share it
+_readers = ThreadPoolExecutor(max_workers=8, thread_name_prefix="ipfs-read")
+_latency: Dict[str, float] = {}
+_lock = threading.Lock()
+
+
+class CidMismatch(Exception):
+    pass
+
+
+class GatewaysFailed(Exception):
+    """Every source was tried and none served the content"""
+
+
+class _LostRace(Exception):
+    pass
+
+
+def split_uri(uri: str) -> Optional[Tuple[str, str]]:
+    """(cid, path within it) of a gateway or ipfs:// URI, None if it has none"""
+    match = _CID_PATH.match(uri)
+    if match is None:
+        return None
+    return match.group(1), match.group(2)
+
+
+def _varint(value: int) -> bytes:
+    out = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if not value:
+            out.append(byte)
+            return bytes(out)
+        out.append(byte | 0x80)
+
+
+def _digest(cid: str) -> Optional[Tuple[int, bytes]]:
+    """(CID version, sha2-256 digest) of a raw CIDv1 or a CIDv0"""
+    try:
+        if cid.startswith("Qm"):
+            number = 0
+            for char in cid:
+                number = number * 58 + _BASE58.index(char)
+            multihash = number.to_bytes(34, "big")
+            return 0, multihash[2:]
+        if cid.startswith("b"):
+            text = cid[1:].upper()
+            raw = base64.b32decode(text + "=" * (-len(text) % 8))
+            # version 1, raw codec, sha2-256, 32 bytes
+            if raw[:4] == b"\x01\x55\x12\x20":
+                return 1, raw[4:]
+    except (ValueError, OverflowError):
+        pass
+    return None
+
+
+def verify(cid: str, data: bytes) -> Optional[bool]:
+    """Whether ``data`` is the content of ``cid``; None if that cannot be told"""
+    parsed = _digest(cid)
+    if parsed is None:
+        return None
+    version, digest = parsed
+    if version == 1:
+        return hashlib.sha256(data).digest() == digest
+    if len(data) > CHUNK_SIZE:
+        return None
+    # dag-pb node whose Data is UnixFS {Type: File, Data: data, filesize}
+    unixfs = b"\x08\x02"
+    if data:
+        unixfs += b"\x12" + _varint(len(data)) + data
+    unixfs += b"\x18" + _varint(len(data))
+    block = b"\x0a" + _varint(len(unixfs)) + unixfs
+    return hashlib.sha256(block).digest() == digest
+
+
+def _host(url: str) -> str:
+    return url.split("/")[2] if "://" in url else url
+
+
+def _record(url: str, seconds: float):
+    host = _host(url)
+    with _lock:
+        previous = _latency.get(host)
+        _latency[host] = (
+            seconds if previous is None else ALPHA * seconds + (1 - ALPHA) * previous
+        )
+
+
+def _attempt(
+    url: str, cid: Optional[str], trusted: bool, cancelled: threading.Event
+) -> bytes:
+    start = time.perf_counter()
+    try:
+        with _session.get(url, stream=True, timeout=TIMEOUT) as response:
+            response.raise_for_status()
+            body = bytearray()
+            for chunk in response.iter_content(64 * 1024):
+                if cancelled.is_set():
+                    # lost the race; what it took so far is a lower bound
+                    _record(url, time.perf_counter() - start)
+                    raise _LostRace()
+                body += chunk
+                if len(body) > MAX_BYTES:
+                    raise ValueError(f"response exceeds {MAX_BYTES} bytes")
+        verified = None if cid is None else verify(cid, bytes(body))
+        if verified is False or (verified is None and not trusted):
+            _record(url, ERROR_PENALTY)
+            raise CidMismatch(f"{_host(url)} served content that is not {cid}")
+    except (CidMismatch, _LostRace):
+        raise
+    except Exception:
+        _record(url, max(time.perf_counter() - start, ERROR_PENALTY))
+        raise
+    _record(url, time.perf_counter() - start)
+    return bytes(body)
+
+
+def fetch(uri: str, deadline: Optional[float] = None) -> bytes:
+    """Read ``uri``, from the content cache or hedging across IPFS_GATEWAYS
+
+    ``deadline`` bounds the whole read in seconds; past it (or when it is
+    already spent) TimeoutError is raised and the attempts still running are
+    abandoned. A URI that failed to read recently raises CachedFailure without
+    being tried.
+    """
+    parsed = split_uri(uri)
+    # the same content behind any gateway; other URIs may change, so only
+    # their failures are remembered
+    key = uri if parsed is None else "".join(parsed)
+    cache = get_cache()
+    data = cache.get(key)
+    if data is not None:
+        return data
+    if deadline is not None and deadline <= 0:
+        raise TimeoutError(f"no time left to read {uri}")
+    try:
+        data = _read(uri, parsed, deadline)
+    except (requests.HTTPError, CidMismatch, GatewaysFailed) as e:
+        # only what the servers said about the document is remembered; a
+        # timeout may be the caller's deadline and anything else is ours
+        cache.fail(key, e)
+        raise
+    if parsed is not None:
+        cache.put(key, data)
+    return data
+
+
+def _read(uri: str, parsed: Optional[Tuple[str, str]], deadline: Optional[float]) -> bytes:
+    expires = None if deadline is None else time.monotonic() + deadline
+    if parsed is None:
+        response = _session.get(
+            uri, timeout=TIMEOUT if deadline is None else min(TIMEOUT, deadline)
+        )
+        response.raise_for_status()
+        return response.content
+
+    cid, path = parsed
+    # (url, trusted): the URI's own gateway is where its author pinned it;
+    # an ipfs:// URI leaves that choice to the configured gateways
+    native = uri.startswith("ipfs://")
+    sources: List[Tuple[str, bool]] = [] if native else [(uri, True)]
+    sources += [(f"{gateway}/ipfs/{cid}{path}", native) for gateway in GATEWAYS]
+    if not sources:
+        raise ValueError(f"set IPFS_GATEWAYS to read {uri}")
+    with _lock:
+        # untried gateways first, in configured order, so each gets measured
+        sources.sort(
+            key=lambda s: (_host(s[0]) in _latency, _latency.get(_host(s[0]), 0.0))
+        )
+
+    # a path inside a directory CID cannot be checked against the CID
+    check = None if path else cid
+    cancelled = threading.Event()
+    running = {}
+    errors = []
+    try:
+        while True:
+            # start another source on the first pass, when the hedge delay
+            # runs out, and as soon as one fails
+            if sources:
+                url, trusted = sources.pop(0)
+                future = _pool.submit(_attempt, url, check, trusted, cancelled)
+                running[future] = url
+            if not running:
+                raise GatewaysFailed(f"no gateway could serve {cid}: {'; '.join(errors)}")
+            timeout = HEDGE_DELAY if sources else None
+            if expires is not None:
+                left = expires - time.monotonic()
+                if left <= 0:
+                    raise TimeoutError(f"no gateway served {cid} within {deadline}s")
+                timeout = left if timeout is None else min(timeout, left)
+            done, _ = wait(running, timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                url = running.pop(future)
+                try:
+                    return future.result()
+                except Exception as e:
+                    errors.append(f"{_host(url)}: {e}")
+    finally:
+        cancelled.set()
+
+
+def fetch_json(uri: str, deadline: Optional[float] = None):
+    return json.loads(fetch(uri, deadline))
+
+
+def _fetch_json_until(uri: str, timeout: float, expires: float):
+    # a read queued behind others only gets what is left of the deadline
+    return fetch_json(uri, min(timeout, expires - time.monotonic()))
+
+
+def fetch_json_all(uris: Dict[Any, str], timeout: float, deadline: float) -> Dict[Any, Any]:
+    """Read several JSON documents at once, keyed like ``uris``
+
+    Each read may take ``timeout`` seconds and all of them together
+    ``deadline``. A document that could not be read has its exception in its
+    place: TimeoutError for those still pending when the deadline passes.
+    """
+    expires = time.monotonic() + deadline
+    futures = {
+        key: _readers.submit(_fetch_json_until, uri, timeout, expires)
+        for key, uri in uris.items()
+    }
+    wait(futures.values(), timeout=deadline)
+    documents = {}
+    for key, future in futures.items():
+        if not future.done():
+            future.cancel()
+            documents[key] = TimeoutError(f"not read within {deadline:.1f}s")
+        elif future.exception() is not None:
+            documents[key] = future.exception()
+        else:
+            documents[key] = future.result()
+    return documents
+
+
+def latency() -> Dict[str, float]:
+    """Moving average of read latency per gateway host, in seconds"""
+    with _lock:
+        return dict(_latency)
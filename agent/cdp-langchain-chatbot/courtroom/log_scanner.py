@@ -0,0 +1,153 @@
+"""Chunked, parallel ``eth_getLogs`` over block ranges of any size.
+
+Providers cap how much one ``eth_getLogs`` call may cover (Alchemy rejects
+wide ranges and responses of more than 10k logs), so a range is split into
+chunks fetched by a bounded pool of workers. The chunk size adapts as the
+scan goes:
+
+- a failed chunk is split in half and both halves are retried, and later
+  chunks start from the smaller size
+- a chunk returning more than ``LOG_SCAN_TARGET_LOGS`` logs shrinks the next
+  ones; chunks returning far fewer grow them, up to ``LOG_SCAN_MAX_CHUNK``
+
+What it learned carries over to the next scan. Results are merged in
+(block number, log index) order whatever order the chunks finish in.
+
+Chunks are fetched with ``w3.eth.get_logs`` unless the scan is given another
+``fetch``, such as ``abi_decoder.get_logs`` bound to a decoder table, which
+returns ``LogRecord``\\ s decoded from the raw results.
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, List, Optional
+
+from courtroom.abi_decoder import LogRecord
+
+CHUNK = int(os.getenv("LOG_SCAN_CHUNK", "2000"))
+MAX_CHUNK = int(os.getenv("LOG_SCAN_MAX_CHUNK", "100000"))
+WORKERS = int(os.getenv("LOG_SCAN_WORKERS", "4"))
+TARGET_LOGS = int(os.getenv("LOG_SCAN_TARGET_LOGS", "2000"))
+# attempts at a single block before the scan gives up
+RETRIES = 3
+
+
+def _position(log):
+    if isinstance(log, LogRecord):
+        return log.block_number, log.log_index
+    return log["blockNumber"], log["logIndex"]
+
+
+class LogScanner:
+    def __init__(
+        self,
+        chunk: int = CHUNK,
+        max_chunk: int = MAX_CHUNK,
+        workers: int = WORKERS,
+        target_logs: int = TARGET_LOGS,
+    ):
+        self.chunk = max(1, min(chunk, max_chunk))
+        self.max_chunk = max_chunk
+        self.workers = max(1, workers)
+        self.target_logs = target_logs
+        self.counts = {"requests": 0, "failures": 0, "splits": 0}
+        self._lock = threading.Lock()
+
+    def _fetched(self, blocks: int, logs: int):
+        with self._lock:
+            self.counts["requests"] += 1
+            if logs > self.target_logs:
+                # aim the next chunks at the target, given this one's density
+                self.chunk = max(1, min(self.chunk, blocks * self.target_logs // logs))
+            elif logs < self.target_logs // 4 and blocks >= self.chunk:
+                self.chunk = min(self.max_chunk, self.chunk * 2)
+
+    def _failed(self, blocks: int):
+        with self._lock:
+            self.counts["requests"] += 1
+            self.counts["failures"] += 1
+            self.chunk = max(1, min(self.chunk, blocks // 2))
+
+    def scan(
+        self,
+        w3,
+        params: Dict[str, Any],
+        from_block: int,
+        to_block: int,
+        fetch: Optional[Callable[[Dict[str, Any]], List]] = None,
+    ) -> List:
+        """Logs matching ``params`` (address, topics) in the inclusive range
+
+        ``fetch`` makes one ``eth_getLogs`` request; ``w3.eth.get_logs`` by default.
+        """
+        fetch = fetch or w3.eth.get_logs
+        # ranges to fetch before new ones are cut: halves of failed chunks
+        retry = deque()
+        next_block = from_block
+        running = {}
+        found = []
+        with ThreadPoolExecutor(self.workers, thread_name_prefix="get-logs") as pool:
+            while True:
+                while len(running) < self.workers and (retry or next_block <= to_block):
+                    if retry:
+                        start, end, attempt = retry.popleft()
+                    else:
+                        start, attempt = next_block, 0
+                        end = min(to_block, start + self.chunk - 1)
+                        next_block = end + 1
+                    query = {**params, "fromBlock": start, "toBlock": end}
+                    running[pool.submit(fetch, query)] = (start, end, attempt)
+                if not running:
+                    break
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    start, end, attempt = running.pop(future)
+                    blocks = end - start + 1
+                    try:
+                        logs = future.result()
+                    except Exception:
+                        self._failed(blocks)
+                        if blocks > 1:
+                            middle = start + blocks // 2
+                            with self._lock:
+                                self.counts["splits"] += 1
+                            retry.appendleft((middle, end, 0))
+                            retry.appendleft((start, middle - 1, 0))
+                        elif attempt < RETRIES:
+                            # nothing left to split, so it is not the range
+                            time.sleep(0.5 * 2**attempt)
+                            retry.appendleft((start, end, attempt + 1))
+                        else:
+                            raise
+                        continue
+                    self._fetched(blocks, len(logs))
+                    found.extend(logs)
+
+        found.sort(key=_position)
+        return found
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"chunk": self.chunk, **self.counts}
+
+
+_scanner = LogScanner()
+
+
+def scan_logs(
+    w3,
+    params: Dict[str, Any],
+    from_block: int,
+    to_block: int,
+    fetch: Optional[Callable[[Dict[str, Any]], List]] = None,
+) -> List:
+    """Scan with the process-wide scanner, so chunk sizes carry over"""
+    return _scanner.scan(w3, params, from_block, to_block, fetch)
+
+
+def stats() -> Dict[str, int]:
+    return _scanner.stats()
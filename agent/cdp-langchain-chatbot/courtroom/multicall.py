@@ -0,0 +1,179 @@
+"""Many contract view calls in one round trip.
+
+Calls go through Multicall3's ``aggregate3`` as a single ``eth_call`` where
+the chain has it (it is deployed at the same address on Base and most other
+chains), otherwise as one JSON-RPC batch of ``eth_call``s, and as separate
+calls only for providers that support neither. Either way a call that
+reverts fails alone: its slot in the results holds the exception.
+"""
+
+import os
+import threading
+from typing import Any, Dict, List, Sequence
+
+from eth_abi.grammar import TupleType, parse
+from eth_utils import get_abi_output_types, to_checksum_address
+
+from courtroom.chain import get_contract
+
+MULTICALL3_ADDRESS = to_checksum_address(
+    os.getenv("MULTICALL3_ADDRESS", "0xcA11bde05977b3631167028862bE2a173976CA11")
+)
+
+AGGREGATE3_ABI = [
+    {
+        "inputs": [
+            {
+                "components": [
+                    {"internalType": "address", "name": "target", "type": "address"},
+                    {"internalType": "bool", "name": "allowFailure", "type": "bool"},
+                    {"internalType": "bytes", "name": "callData", "type": "bytes"},
+                ],
+                "internalType": "struct Multicall3.Call3[]",
+                "name": "calls",
+                "type": "tuple[]",
+            }
+        ],
+        "name": "aggregate3",
+        "outputs": [
+            {
+                "components": [
+                    {"internalType": "bool", "name": "success", "type": "bool"},
+                    {"internalType": "bytes", "name": "returnData", "type": "bytes"},
+                ],
+                "internalType": "struct Multicall3.Result[]",
+                "name": "returnData",
+                "type": "tuple[]",
+            }
+        ],
+        "stateMutability": "payable",
+        "type": "function",
+    }
+]
+
+# whether Multicall3 is deployed, per provider endpoint
+_deployed: Dict[str, bool] = {}
+_lock = threading.Lock()
+
+
+class CallFailed(Exception):
+    pass
+
+
+def _endpoint(w3) -> str:
+    return getattr(w3.provider, "endpoint_uri", None) or str(id(w3.provider))
+
+
+def _has_multicall(w3) -> bool:
+    key = _endpoint(w3)
+    with _lock:
+        known = _deployed.get(key)
+    if known is None:
+        known = len(w3.eth.get_code(MULTICALL3_ADDRESS)) > 0
+        with _lock:
+            _deployed[key] = known
+    return known
+
+
+def _checksummed(abi_type, value):
+    """``value`` with every address in it checksummed, as web3 returns them"""
+    if abi_type.is_array:
+        return [_checksummed(abi_type.item_type, item) for item in value]
+    if isinstance(abi_type, TupleType):
+        return tuple(
+            _checksummed(component, item)
+            for component, item in zip(abi_type.components, value)
+        )
+    if abi_type.base == "address":
+        return to_checksum_address(value)
+    return value
+
+
+def _encode(w3, function) -> str:
+    """Call data of a bound call such as ``contract.functions.cases(1)``"""
+    contract = get_contract(function.address, function.contract_abi, w3)
+    return contract.encode_abi(function.fn_name, args=function.args, kwargs=function.kwargs)
+
+
+def _decode(w3, function, data: bytes) -> Any:
+    """Decode return data the way ``function.call()`` would"""
+    types = get_abi_output_types(function.abi)
+    values = [
+        _checksummed(parse(abi_type), value)
+        for abi_type, value in zip(types, w3.codec.decode(types, data))
+    ]
+    return values[0] if len(values) == 1 else values
+
+
+def _aggregate(w3, functions: Sequence, block_identifier) -> List[Any]:
+    # built once per client, not parsed again from the ABI on every call
+    multicall = get_contract(MULTICALL3_ADDRESS, AGGREGATE3_ABI, w3)
+    calls = [
+        (function.address, True, _encode(w3, function))
+        for function in functions
+    ]
+    results = multicall.functions.aggregate3(calls).call(
+        block_identifier=block_identifier
+    )
+    decoded = []
+    for function, (success, data) in zip(functions, results):
+        if not success:
+            decoded.append(CallFailed(f"{function.fn_name} reverted"))
+            continue
+        try:
+            decoded.append(_decode(w3, function, data))
+        except Exception as e:
+            decoded.append(e)
+    return decoded
+
+
+def _batch(w3, functions: Sequence, block_identifier) -> List[Any]:
+    if isinstance(block_identifier, int):
+        block_identifier = hex(block_identifier)
+    requests = [
+        (
+            "eth_call",
+            [
+                {"to": function.address, "data": _encode(w3, function)},
+                block_identifier,
+            ],
+        )
+        for function in functions
+    ]
+    try:
+        responses = w3.provider.make_batch_request(requests)
+    except (AttributeError, NotImplementedError):
+        responses = None
+    if not isinstance(responses, list):
+        # no batching here: one call each
+        decoded = []
+        for function in functions:
+            try:
+                decoded.append(function.call(block_identifier=block_identifier))
+            except Exception as e:
+                decoded.append(e)
+        return decoded
+
+    decoded = []
+    for function, response in zip(functions, responses):
+        if "error" in response:
+            decoded.append(CallFailed(f"{function.fn_name}: {response['error']}"))
+            continue
+        try:
+            decoded.append(_decode(w3, function, bytes.fromhex(response["result"][2:])))
+        except Exception as e:
+            decoded.append(e)
+    return decoded
+
+
+def call_all(w3, functions: Sequence, block_identifier="latest") -> List[Any]:
+    """Results of bound view calls such as ``contract.functions.cases(1)``
+
+    All are read at the same block when Multicall3 is available. A call that
+    fails leaves its exception in its slot rather than failing the others.
+    """
+    if not functions:
+        return []
+    if _has_multicall(w3):
+        return _aggregate(w3, functions, block_identifier)
+    return _batch(w3, functions, block_identifier)
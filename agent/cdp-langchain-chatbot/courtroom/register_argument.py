@@ -2,6 +2,7 @@ from cdp import Wallet
 from cdp_langchain.tools import CdpTool
 from pydantic import BaseModel, Field
 
+from courtroom import tx_pipeline
 from courtroom.constants import (
     MY_ABI,
 )
@@ -17,6 +18,7 @@ Inputs:
 Important notes:
 - Only supported on the following networks:
   - Base Sepolia (ie, 'base-sepolia')
+- The transaction is sent without waiting for it to be mined and a transaction handle is returned; use courtroom_check_transaction_action with wait_seconds before anything that needs it to have landed
 """
 
 
@@ -49,20 +51,24 @@ def courtroom_register_argument(
         contract_address (str): The courtroom contract token contract address, such as `0xD1Bdb459928A66682A98f15DDE2c07b252Eec04a`
 
     Returns:
-        str: A message containing the token purchase details.
+        str: A message with the handle of the transaction, which is confirmed in the background.
 
     """
     try:
-        invocation = wallet.invoke_contract(
+        handle = tx_pipeline.submit(
+            wallet,
             contract_address=contract_address,
             method="submitArgument",
             abi=MY_ABI,
             args={"caseId": caseId, "argumentUri": argumentUri},
-        ).wait()
+        )
     except Exception as e:
         return f"Error registering argument onchain {e!s}"
 
-    return f"Registered argument onchain with transaction hash: {invocation.transaction.transaction_hash}"
+    return (
+        f"Sent argument registration onchain as transaction {handle.handle_id}; "
+        "check it with courtroom_check_transaction_action"
+    )
 
 
 def initCourtroomRegisterArgument(agentkit):
@@ -0,0 +1,259 @@
+"""Background follower keeping a CourtState current with the chain.
+
+``follow(contract)`` starts, once per contract, a daemon thread that:
+
+1. replays the event index (synced first) into a fresh CourtState
+2. follows new blocks: with ``RPC_WS_URL`` set, through ``eth_subscribe``
+   to ``newHeads`` and the contract's ``logs``; otherwise, or while the
+   websocket is down, by polling an ``eth_newFilter`` with
+   ``eth_getFilterChanges`` every ``COURTROOM_POLL_INTERVAL`` seconds
+
+Every (re)connection first scans the blocks it may have missed, a few
+blocks back to be safe; the state ignores events it has already applied.
+When a reorg removes a log the state has applied, the state is reset and
+rebuilt from the index (which rolls back the orphaned blocks as it syncs)
+and the chain; tools go to the chain meanwhile.
+Tools read the state only while it is fresh (it heard from the chain within
+``COURTROOM_STATE_MAX_AGE`` seconds) and go to the chain otherwise.
+
+``indexed_state(contract, timeout)`` is the fallback for tools that need a
+whole case: a CourtState kept up to date from the event index, applying only
+the events indexed since its last update. The update runs in the background,
+so the caller waits on it for ``timeout`` seconds at most and then gets
+the last state it had, marked stale.
+"""
+
+import asyncio
+import os
+import threading
+import time
+import traceback
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from functools import partial
+from typing import Dict, Optional, Tuple
+
+from web3 import AsyncWeb3, Web3, WebSocketProvider
+
+from courtroom.case_state import CourtState
+from courtroom.abi_decoder import decoder_table, get_logs
+from courtroom.indexer import INDEXED_EVENTS, get_index
+from courtroom.log_scanner import scan_logs
+
+WS_URL = os.getenv("RPC_WS_URL")
+POLL_INTERVAL = float(os.getenv("COURTROOM_POLL_INTERVAL", "2"))
+MAX_AGE = float(os.getenv("COURTROOM_STATE_MAX_AGE", "30"))
+# how long to poll after the websocket fails before trying it again
+WS_RETRY = 60.0
+# blocks re-scanned below the last one seen when (re)connecting
+REWIND = 4
+
+_lock = threading.Lock()
+_followers: Dict[str, "Subscriber"] = {}
+_indexed: Dict[str, "IndexedState"] = {}
+_updates = ThreadPoolExecutor(max_workers=4, thread_name_prefix="courtroom-index")
+
+
+def replay_index(contract, state: CourtState) -> CourtState:
+    """Sync the event index and apply every event in it to ``state``"""
+    index = get_index()
+    index.sync(contract)
+    for block, block_hash, log_index, event, args in index.replay(contract.address):
+        state.apply(event, args, block, log_index, block_hash)
+    state.mark(index.cursor(contract.address))
+    return state
+
+
+class Subscriber:
+    def __init__(
+        self,
+        contract,
+        ws_url: Optional[str] = WS_URL,
+        poll_interval: float = POLL_INTERVAL,
+    ):
+        self.contract = contract
+        self.ws_url = ws_url
+        self.poll_interval = poll_interval
+        self.state = CourtState(contract.address)
+        self.decoders = decoder_table(contract.abi, INDEXED_EVENTS)
+        self.mode = "starting"
+        self.rebuilds = 0
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._thread = threading.Thread(
+            target=self._run, name=f"courtroom-{self.contract.address[:10]}", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+
+    def _apply(self, log) -> bool:
+        block_hash = Web3.to_hex(log["blockHash"])
+        if log.get("removed"):
+            # only the first notice of a reorg finds its block in the state
+            if self.state.applied(log["blockNumber"], block_hash):
+                self.rebuild()
+            return False
+        event = self.decoders.decode(log)
+        if event is None:
+            return False
+        return self._apply_event(event)
+
+    def _apply_event(self, event) -> bool:
+        return self.state.apply(
+            event.event, event.args, event.block_number, event.log_index, event.block_hash
+        )
+
+    def _params(self) -> Dict:
+        return {"address": self.contract.address, "topics": [self.decoders.topics()]}
+
+    def bootstrap(self):
+        self.state.reset()
+        replay_index(self.contract, self.state)
+
+    def rebuild(self):
+        """Start over after a reorg removed events the state had applied"""
+        self.rebuilds += 1
+        self.bootstrap()
+        self.catch_up()
+
+    def catch_up(self) -> int:
+        """Apply the logs since shortly before the last block seen"""
+        w3 = self.contract.w3
+        latest = w3.eth.block_number
+        start = max(0, self.state.block - REWIND)
+        fetch = partial(get_logs, w3, self.decoders)
+        for event in scan_logs(w3, self._params(), start, latest, fetch):
+            self._apply_event(event)
+        self.state.mark(latest)
+        return latest
+
+    def _run(self):
+        while not self._stopped.is_set():
+            try:
+                if self.state.block < 0:
+                    self.bootstrap()
+                if self.ws_url:
+                    try:
+                        asyncio.run(self._subscribe())
+                    except Exception as e:
+                        print(f"courtroom websocket failed, polling instead: {e!r}")
+                    self._poll(time.monotonic() + WS_RETRY)
+                else:
+                    self._poll(None)
+            except Exception:
+                traceback.print_exc()
+                self._stopped.wait(self.poll_interval)
+
+    def _poll(self, until: Optional[float]):
+        self.mode = "polling"
+        w3 = self.contract.w3
+        latest = self.catch_up()
+        log_filter = w3.eth.filter({**self._params(), "fromBlock": latest + 1})
+        try:
+            while not self._stopped.wait(self.poll_interval):
+                # the head first: logs returned after it are at least as new
+                head = w3.eth.block_number
+                for log in log_filter.get_new_entries():
+                    self._apply(log)
+                self.state.mark(head)
+                if until is not None and time.monotonic() > until:
+                    return
+        finally:
+            try:
+                w3.eth.uninstall_filter(log_filter.filter_id)
+            except Exception:
+                pass
+
+    async def _subscribe(self):
+        # fail over to polling at once rather than retrying with backoff
+        provider = WebSocketProvider(self.ws_url, max_connection_retries=1)
+        async with AsyncWeb3(provider) as w3:
+            await w3.eth.subscribe("newHeads")
+            await w3.eth.subscribe("logs", self._params())
+            # subscribed first, so nothing lands between the scan and the stream
+            await asyncio.to_thread(self.catch_up)
+            self.mode = "websocket"
+            async for message in w3.socket.process_subscriptions():
+                if self._stopped.is_set():
+                    return
+                result = message["result"]
+                if "topics" in result:
+                    self._apply(result)
+                else:
+                    self.state.mark(result["number"])
+
+
+def follow(contract) -> CourtState:
+    """The live state of ``contract``, following it from the first call on"""
+    with _lock:
+        subscriber = _followers.get(contract.address)
+        if subscriber is None:
+            subscriber = _followers[contract.address] = Subscriber(contract)
+            subscriber.start()
+    return subscriber.state
+
+
+def live_state(contract, max_age: float = MAX_AGE) -> Optional[CourtState]:
+    """The followed state of ``contract`` if it is current, else None"""
+    state = follow(contract)
+    return state if state.fresh(max_age) else None
+
+
+class IndexedState:
+    """A CourtState brought up to date from the event index on demand"""
+
+    def __init__(self, contract):
+        self.contract = contract
+        self.state = CourtState(contract.address)
+        # index rollbacks already accounted for; another one means a reorg
+        # the state may have applied events from
+        self.rollbacks = -1
+        self._update: Optional[Future] = None
+        self._lock = threading.Lock()
+
+    def _run(self):
+        index = get_index()
+        index.sync(self.contract)
+        rollbacks = index.rollbacks
+        if rollbacks != self.rollbacks:
+            # rebuilt aside, so readers never see a half-replayed state
+            state = CourtState(self.contract.address)
+        else:
+            state = self.state
+        for block, block_hash, log_index, event, args in index.replay(
+            self.contract.address, after=state.position
+        ):
+            state.apply(event, args, block, log_index, block_hash)
+        state.mark(index.cursor(self.contract.address))
+        self.state = state
+        self.rollbacks = rollbacks
+
+    def refresh(self, timeout: float) -> Tuple[CourtState, bool]:
+        """The state, and whether it is stale because the update ran out of time"""
+        with self._lock:
+            if self._update is None or self._update.done():
+                self._update = _updates.submit(self._run)
+            update = self._update
+        done, _ = wait([update], timeout=max(0.0, timeout))
+        if not done:
+            return self.state, True
+        if update.exception() is not None:
+            print(f"courtroom index update failed: {update.exception()!r}")
+            return self.state, True
+        return self.state, False
+
+
+def indexed_state(contract, timeout: float) -> Tuple[CourtState, bool]:
+    """``contract``'s state from the event index, waiting ``timeout`` seconds at most
+
+    The flag is True when the state could not be brought up to date in time
+    and is the last one built (empty, with ``block`` -1, if there is none).
+    """
+    with _lock:
+        indexed = _indexed.get(contract.address)
+        if indexed is None:
+            indexed = _indexed[contract.address] = IndexedState(contract)
+    return indexed.refresh(timeout)
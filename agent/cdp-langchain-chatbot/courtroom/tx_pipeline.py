@@ -0,0 +1,255 @@
+"""Contract calls sent back to back, confirmed in the background.
+
+``wallet.invoke_contract(...).wait()`` holds the agent until each write is
+mined, so a case's writes land one block after another. ``submit`` queues
+the call and returns a ``TxHandle`` at once:
+
+- calls from one wallet address are numbered and created one at a time by
+  a single sender thread. The next call is only created once the one
+  before it has been broadcast (or ``TX_BROADCAST_TIMEOUT`` seconds have
+  passed), without waiting for it to be mined. A wallet with its key in
+  the process broadcasts inside ``invoke_contract``; with a server signer
+  the invocation is polled until it is.
+- once broadcast, the call is handed to a confirmer thread that waits for
+  it to complete or fail (``TX_CONFIRM_TIMEOUT`` seconds at most)
+
+Nonces are not chosen here: ``invoke_contract`` takes none, and the CDP API
+assigns one when it creates the invocation. Sending in order is all this
+module does to keep them in sequence, and it only covers calls made through
+it in this process. A call the node rejected over its nonce (another
+writer used the same address, or the API handed out a nonce already in
+use) is created again, at most ``TX_NONCE_RETRIES`` times, before the calls
+queued after it. Errors saying a transaction is still pending are not
+retried, as that would send the write twice:
+
+- "already known": this very transaction is in the node's mempool. An
+  invocation being polled is followed as sent; one whose broadcast failed
+  inside ``invoke_contract`` cannot be followed, so its handle settles as
+  ``unknown``
+- "replacement transaction underpriced": another transaction with the
+  nonce is pending, and the call fails
+
+A server signer reports a failed broadcast without its reason, so those
+are not retried either. Nothing stops later calls once an earlier one has
+been broadcast, so they may still land after it fails on chain.
+
+Handles are kept for the life of the process and looked up by id with
+``get``; ``TxHandle.wait`` blocks until the call settles.
+"""
+
+import itertools
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+CONFIRM_TIMEOUT = float(os.getenv("TX_CONFIRM_TIMEOUT", "120"))
+BROADCAST_TIMEOUT = float(os.getenv("TX_BROADCAST_TIMEOUT", "30"))
+NONCE_RETRIES = int(os.getenv("TX_NONCE_RETRIES", "3"))
+# seconds between status polls while a call is being confirmed
+POLL_INTERVAL = 1.0
+
+_lock = threading.Lock()
+_handles: Dict[str, "TxHandle"] = {}
+_senders: Dict[str, ThreadPoolExecutor] = {}
+_sequences: Dict[str, "itertools.count[int]"] = {}
+_ids = itertools.count(1)
+_confirmers = ThreadPoolExecutor(max_workers=8, thread_name_prefix="tx-confirm")
+# what nodes and the CDP API say when they reject a transaction over its
+# nonce, leaving nothing pending under it
+_NONCE_ERRORS = (
+    "nonce too low",
+    "nonce too high",
+    "invalid nonce",
+    "invalid transaction nonce",
+    "nonce has already been used",
+)
+# the node already holds this exact transaction
+_KNOWN_ERRORS = ("already known", "known transaction")
+
+
+class TxHandle:
+    """One queued contract call
+
+    Its status goes queued, created (waiting to be signed and broadcast),
+    sent, then complete or failed; or unknown when the node already held the
+    transaction but the invocation was lost with the error.
+    """
+
+    def __init__(
+        self,
+        handle_id: str,
+        sender: str,
+        sequence: int,
+        contract_address: str,
+        method: str,
+        args: Dict[str, Any],
+    ):
+        self.handle_id = handle_id
+        self.sender = sender
+        self.sequence = sequence
+        self.contract_address = contract_address
+        self.method = method
+        self.args = args
+        self.status = "queued"
+        self.transaction_hash: Optional[str] = None
+        self.transaction_link: Optional[str] = None
+        self.error: Optional[str] = None
+        # times the call was created again after a nonce error
+        self.retries = 0
+        self.queued_at = time.time()
+        self.settled_at: Optional[float] = None
+        self._settled = threading.Event()
+
+    @property
+    def settled(self) -> bool:
+        return self._settled.is_set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until the call completes or fails; False if ``timeout`` passed first"""
+        return self._settled.wait(timeout)
+
+    def _settle(self, status: str, error: Optional[str] = None):
+        self.status = status
+        self.error = error
+        self.settled_at = time.time()
+        self._settled.set()
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "handle_id": self.handle_id,
+            "sender": self.sender,
+            "sequence": self.sequence,
+            "contract_address": self.contract_address,
+            "method": self.method,
+            "args": self.args,
+            "status": self.status,
+            "transaction_hash": self.transaction_hash,
+            "transaction_link": self.transaction_link,
+            "error": self.error,
+            "retries": self.retries,
+            "seconds": round((self.settled_at or time.time()) - self.queued_at, 1),
+        }
+
+
+def _status(invocation) -> str:
+    status = invocation.status
+    return str(getattr(status, "value", status))
+
+
+def _nonce_error(error: Exception) -> bool:
+    message = str(error).lower()
+    return any(text in message for text in _NONCE_ERRORS)
+
+
+def _known_error(error: Exception) -> bool:
+    message = str(error).lower()
+    return any(text in message for text in _KNOWN_ERRORS)
+
+
+def _broadcast(invocation) -> str:
+    """Status of ``invocation`` once it is broadcast, failed or out of time"""
+    expires = time.monotonic() + BROADCAST_TIMEOUT
+    status = _status(invocation)
+    while status in ("pending", "signed") and time.monotonic() < expires:
+        time.sleep(POLL_INTERVAL)
+        invocation.reload()
+        status = _status(invocation)
+    return status
+
+
+def _confirm(handle: TxHandle, invocation):
+    try:
+        invocation.wait(interval_seconds=POLL_INTERVAL, timeout_seconds=CONFIRM_TIMEOUT)
+        handle.transaction_hash = invocation.transaction.transaction_hash
+        handle.transaction_link = invocation.transaction.transaction_link
+        status = _status(invocation)
+        if status == "complete":
+            handle._settle("complete")
+        else:
+            handle._settle("failed", f"transaction {status}")
+    except Exception as e:
+        handle._settle("failed", f"{type(e).__name__}: {e}")
+
+
+def _send(handle: TxHandle, wallet, abi, amount, asset_id):
+    while True:
+        invocation = None
+        try:
+            invocation = wallet.invoke_contract(
+                contract_address=handle.contract_address,
+                method=handle.method,
+                abi=abi,
+                args=handle.args,
+                amount=amount,
+                asset_id=asset_id,
+            )
+            handle.status = "created"
+            status = _broadcast(invocation)
+            break
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            if _known_error(e):
+                if invocation is not None:
+                    # our own transaction is pending; follow it rather than resend
+                    status = "broadcast"
+                    break
+                handle._settle("unknown", f"{error}; pending on the node, not sent again")
+                return
+            if handle.retries < NONCE_RETRIES and _nonce_error(e):
+                # the node refused the transaction outright, so nothing is
+                # pending under it; the API assigns the next one a new nonce
+                handle.retries += 1
+                continue
+            handle._settle("failed", error)
+            return
+    transaction = invocation.transaction
+    if transaction is not None:
+        handle.transaction_hash = transaction.transaction_hash
+        handle.transaction_link = transaction.transaction_link
+    if status == "failed":
+        handle._settle("failed", "transaction failed")
+        return
+    if status in ("broadcast", "complete"):
+        handle.status = "sent"
+    # still waiting on its signer: confirmed like the rest, or timed out
+    _confirmers.submit(_confirm, handle, invocation)
+
+
+def submit(
+    wallet,
+    contract_address: str,
+    method: str,
+    abi: List[Dict],
+    args: Dict[str, Any],
+    amount=None,
+    asset_id: Optional[str] = None,
+) -> TxHandle:
+    """Queue ``method`` on ``contract_address`` from ``wallet``'s default address"""
+    sender = wallet.default_address.address_id
+    with _lock:
+        executor = _senders.get(sender)
+        if executor is None:
+            executor = _senders[sender] = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix=f"tx-send-{sender[:10]}"
+            )
+            _sequences[sender] = itertools.count()
+        handle = TxHandle(
+            f"tx-{next(_ids)}", sender, next(_sequences[sender]), contract_address, method, args
+        )
+        _handles[handle.handle_id] = handle
+        # submitted under the lock, so the queue order is the sequence order
+        executor.submit(_send, handle, wallet, abi, amount, asset_id)
+    return handle
+
+
+def get(handle_id: str) -> Optional[TxHandle]:
+    with _lock:
+        return _handles.get(handle_id)
+
+
+def pending() -> List[TxHandle]:
+    """Handles not settled yet, oldest first"""
+    with _lock:
+        return [handle for handle in _handles.values() if not handle.settled]
@@ -0,0 +1,161 @@
+"""Reorg handling of the event index, against an in-memory chain.
+
+``FakeChain`` answers the calls ``EventIndex.sync`` makes (``get_block`` and
+raw ``eth_getLogs``) from a list of block hashes, with one PersonaCreated
+log per block. ``reorg`` replaces the blocks above a fork point, so each
+test can check which block the index finds the fork at and what it fetches
+again::
+
+    python -m pytest tests
+"""
+
+import os
+import sys
+
+import pytest
+from eth_abi import encode
+from eth_utils import event_abi_to_log_topic
+from hexbytes import HexBytes
+from web3.exceptions import BlockNotFound
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+from courtroom.constants import DEPLOYMENT_BLOCK, MY_ABI  # noqa: E402
+from courtroom.indexer import EventIndex  # noqa: E402
+
+ADDRESS = "0xD1Bdb459928A66682A98f15DDE2c07b252Eec04a"
+USER = "0x2B5AD5c4795c026514f8317c7a215E218DcCD6cF"
+CONFIRMATIONS = 12
+HEAD = DEPLOYMENT_BLOCK + 30
+
+PERSONA_CREATED = next(
+    entry for entry in MY_ABI if entry.get("type") == "event" and entry["name"] == "PersonaCreated"
+)
+
+
+class FakeChain:
+    """Blocks from the deployment block up to a head, one persona log in each"""
+
+    def __init__(self, head: int):
+        self.hashes = {}
+        self.uris = {}
+        self.queries = []
+        self.extend(DEPLOYMENT_BLOCK, head, "a")
+
+    def extend(self, first: int, last: int, branch: str):
+        for number in range(first, last + 1):
+            self.hashes[number] = "0x" + f"{branch}{number:x}".rjust(64, "0")
+            self.uris[number] = f"ipfs://{number}-{branch}"
+
+    def reorg(self, fork: int, new_head: int):
+        """Replace every block above ``fork`` by blocks of another branch"""
+        for number in [n for n in self.hashes if n > fork]:
+            del self.hashes[number], self.uris[number]
+        self.extend(fork + 1, new_head, "b")
+
+    @property
+    def head(self) -> int:
+        return max(self.hashes)
+
+    def get_block(self, block_identifier):
+        number = self.head if block_identifier == "latest" else block_identifier
+        if number not in self.hashes:
+            raise BlockNotFound(f"no block {number}")
+        return {"number": number, "hash": HexBytes(self.hashes[number])}
+
+    def _log(self, number: int):
+        return {
+            "address": ADDRESS,
+            "topics": [
+                "0x" + event_abi_to_log_topic(PERSONA_CREATED).hex(),
+                "0x" + USER[2:].lower().rjust(64, "0"),
+            ],
+            "data": "0x" + encode(["string"], [self.uris[number]]).hex(),
+            "blockNumber": hex(number),
+            "blockHash": self.hashes[number],
+            "logIndex": "0x0",
+            "transactionHash": self.hashes[number],
+            "transactionIndex": "0x0",
+            "removed": False,
+        }
+
+    def make_request(self, method, params):
+        assert method == "eth_getLogs", method
+        query = params[0]
+        first, last = int(query["fromBlock"], 16), int(query["toBlock"], 16)
+        self.queries.append((first, last))
+        return {"result": [self._log(n) for n in range(first, last + 1) if n in self.hashes]}
+
+
+class FakeWeb3:
+    # no make_batch_request, so block hashes are read one get_block at a time
+    def __init__(self, chain: FakeChain):
+        self.eth = chain
+        self.provider = chain
+
+
+class FakeContract:
+    def __init__(self, chain: FakeChain):
+        self.w3 = FakeWeb3(chain)
+        self.address = ADDRESS
+        self.abi = MY_ABI
+
+
+def indexed_uris(index: EventIndex):
+    return {
+        block: args["personaUri"]
+        for block, _, _, event, args in index.replay(ADDRESS)
+        if event == "PersonaCreated"
+    }
+
+
+@pytest.fixture
+def synced(tmp_path):
+    chain = FakeChain(HEAD)
+    contract = FakeContract(chain)
+    index = EventIndex(str(tmp_path / "index.sqlite3"), confirmations=CONFIRMATIONS)
+    index.sync(contract)
+    chain.queries.clear()
+    return chain, contract, index
+
+
+def test_no_reorg_leaves_the_index_alone(synced):
+    chain, contract, index = synced
+    assert index.fork_point(contract.w3, ADDRESS) is None
+    assert index.sync(contract) == 0
+    assert index.rollbacks == 0
+    assert chain.queries == []
+
+
+@pytest.mark.parametrize("depth", [1, 3, CONFIRMATIONS - 1])
+def test_fork_point_finds_a_shallow_reorg_exactly(synced, depth):
+    chain, contract, index = synced
+    chain.reorg(HEAD - depth, HEAD)
+    assert index.fork_point(contract.w3, ADDRESS) == HEAD - depth
+
+
+def test_fork_point_falls_back_to_the_confirmed_block_below_the_depth(synced):
+    chain, contract, index = synced
+    chain.reorg(HEAD - CONFIRMATIONS - 5, HEAD)
+    assert index.fork_point(contract.w3, ADDRESS) == HEAD - CONFIRMATIONS
+
+
+@pytest.mark.parametrize("depth", [1, 4])
+def test_sync_reindexes_only_the_blocks_after_the_fork(synced, depth):
+    chain, contract, index = synced
+    fork = HEAD - depth
+    before = indexed_uris(index)
+    # the new branch is two blocks longer than the old one
+    chain.reorg(fork, HEAD + 2)
+
+    assert index.sync(contract) == depth + 2
+    assert index.rollbacks == 1
+    assert min(first for first, _ in chain.queries) == fork + 1
+
+    after = indexed_uris(index)
+    assert after == {number: chain.uris[number] for number in chain.uris}
+    assert all(after[number] == before[number] for number in before if number <= fork)
+    assert all(after[number].endswith("-b") for number in after if number > fork)
+    assert index.cursor(ADDRESS) == HEAD + 2
+    assert index.fork_point(contract.w3, ADDRESS) is None
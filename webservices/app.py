@@ -1,66 +1,186 @@
-from dotenv import load_dotenv
-from fastapi import FastAPI, UploadFile, File, HTTPException, Request
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from mangum import Mangum
 import os
 from pydantic import BaseModel
-import requests
-from typing import Dict, Any
-
-load_dotenv()
+from typing import Dict, Any, AsyncIterator, List, Literal, Optional, Tuple
+import asyncio
+import json
+from collections import deque
+from contextvars import ContextVar
+
+from cid import is_cid, json_cid
+from content_cache import ContentCache
+from gateways import GatewayFetcher
+from limiter import ClientContextMiddleware, Limiter, RateLimited, background
+from metrics import Metrics, MetricsMiddleware
+from pin_index import PinIndex
+from pin_queue import PinJournal, PinQueue
+from storage import create_storage
+from uploads import UploadError, forward_file_upload, iter_lines
+import images
+
+# Lambda gets its configuration from the function environment; skip the
+# dotenv import and filesystem probe on cold start there
+if not os.getenv("AWS_LAMBDA_FUNCTION_NAME"):
+    from dotenv import load_dotenv
+
+    load_dotenv()
+
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(64 * 1024 * 1024)))
+# images up to this size are kept in memory to render WebP/thumbnail derivatives
+IMAGE_DERIVATIVE_MAX_BYTES = int(
+    os.getenv("IMAGE_DERIVATIVE_MAX_BYTES", str(20 * 1024 * 1024))
+)
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "8"))
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "100"))
+INGEST_CONCURRENCY = int(os.getenv("INGEST_CONCURRENCY", "8"))
+INGEST_MAX_LINE_BYTES = int(os.getenv("INGEST_MAX_LINE_BYTES", str(1024 * 1024)))
+# "async" answers pin routes from the local journal and pins in the background
+PIN_MODE = os.getenv("PIN_MODE", "sync")
+
+# base URL of the request being answered, for gateway URLs pointing back here
+request_base_url: ContextVar[str] = ContextVar("request_base_url", default="")
+
+
+class BaseUrlMiddleware:
+    """ASGI middleware remembering each request's base URL in ``request_base_url``"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        token = request_base_url.set(str(Request(scope).base_url).rstrip("/"))
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            request_base_url.reset(token)
 
 
 class PinataHandler:
-    def __init__(self):
-        self.api_key = os.getenv("PINATA_API_KEY")
-        self.secret_key = os.getenv("PINATA_SECRET_KEY")
-        self.headers = {
-            "pinata_api_key": self.api_key,
-            "pinata_secret_api_key": self.secret_key,
-        }
-        self.base_url = "https://api.pinata.cloud"
-
-    async def pin_json(self, name: str, data: Dict[str, Any]) -> str:
-        """Upload JSON data to Pinata"""
+    """Pins and reads content through the configured storage backend
+
+    Adds what every backend shares on top of it: deduplication against the
+    pin index, the read-through content cache, rate limiting and metrics.
+    """
+
+    def __init__(self, metrics: Optional[Metrics] = None):
+        self.metrics = metrics or Metrics()
+        self.storage = create_storage(os.getenv("STORAGE_BACKEND", "pinata"))
+        self.public_gateway_url = os.getenv("PUBLIC_GATEWAY_URL")
+        self.index = PinIndex(
+            os.getenv("PIN_INDEX_PATH", "/tmp/pin_index.sqlite3"),
+            int(os.getenv("PIN_INDEX_SIZE", "4096")),
+            backend=self.storage.name,
+        )
+        self.cache = ContentCache(
+            os.getenv("IPFS_CACHE_DIR", "/tmp/ipfs-cache"),
+            int(os.getenv("IPFS_CACHE_MEMORY_BYTES", str(64 * 1024 * 1024))),
+            int(os.getenv("IPFS_CACHE_DISK_BYTES", str(256 * 1024 * 1024))),
+        )
+        # Pinata's pinning endpoints allow 180 requests a minute by default;
+        # other backends are not throttled unless asked to be
+        default_rate = "3" if self.storage.name == "pinata" else "0"
+        self.limiter = Limiter(
+            rate=float(os.getenv("PINATA_RATE_LIMIT", default_rate)),
+            burst=int(os.getenv("PINATA_RATE_BURST", "10")),
+            max_queue=int(os.getenv("PINATA_QUEUE_SIZE", "100")),
+            max_client_queue=int(os.getenv("PINATA_CLIENT_QUEUE_SIZE", "25")),
+            max_wait=float(os.getenv("PINATA_QUEUE_MAX_WAIT", "10")),
+            metrics=self.metrics,
+        )
+        self.gateways = GatewayFetcher(
+            self.storage,
+            [url for url in os.getenv("IPFS_GATEWAYS", "").split(",") if url],
+            hedge_delay=float(os.getenv("IPFS_HEDGE_DELAY", "0.25")),
+            max_bytes=int(os.getenv("IPFS_FETCH_MAX_BYTES", str(64 * 1024 * 1024))),
+            metrics=self.metrics,
+        )
+
+    @asynccontextmanager
+    async def upstream(self, operation: str) -> AsyncIterator[None]:
+        """Admit, time and quota-check one call to the storage backend"""
+        await self.limiter.acquire()
         try:
-            url = f"{self.base_url}/pinning/pinJSONToIPFS"
-            response = requests.post(
-                url,
-                headers=self.headers,
-                json={
-                    "pinataOptions": {"cidVersion": 1},
-                    "pinataMetadata": {"name": name },
-                    "pinataContent": data,
-                },
-            )
-            response.raise_for_status()
-            return response.json()["IpfsHash"]
-        except Exception as e:
-            raise Exception(f"Pinata upload failed: {str(e)}")
+            with self.metrics.upstream(operation):
+                yield
+        except RateLimited as e:
+            # the backend's own rate limit; stop admitting calls for a while
+            self.limiter.hold(e.retry_after)
+            raise
 
-    async def pin_file(self, files: dict) -> str:
-        """Upload file to Pinata"""
-        try:
-            url = f"{self.base_url}/pinning/pinFileToIPFS"
+    async def close(self):
+        await self.gateways.close()
+        await self.storage.close()
 
-            response = requests.post(url, headers=self.headers, files=files)
-            response.raise_for_status()
-            return response.json()["IpfsHash"]
-        except Exception as e:
-            raise Exception(f"Pinata file upload failed: {str(e)}")
+    async def pin_json(self, name: str, data: Dict[str, Any]) -> str:
+        """Store JSON data, skipping content that is already pinned"""
+        cid = json_cid(data)
+        ipfs_hash = self.index.get(cid)
+        if ipfs_hash is not None:
+            return ipfs_hash
+
+        async with self.upstream("pin_json"):
+            ipfs_hash = await self.storage.add_json(name, data)
+
+        if ipfs_hash != cid:
+            print(f"WARNING local CID {cid} differs from pinned {ipfs_hash}")
+        self.index.add(cid, ipfs_hash, name)
+        return ipfs_hash
+
+    async def pin_bytes(
+        self, name: str, body: bytes, content_type: str = "application/json"
+    ) -> str:
+        """Store exact bytes as a CIDv1 file"""
+        async with self.upstream("pin_bytes"):
+            return await self.storage.add_bytes(name, body, content_type)
+
+    async def pin_file(
+        self, name: str, body: AsyncIterator[bytes], content_type: str
+    ) -> str:
+        """Stream a file into the store"""
+        async with self.upstream("pin_file"):
+            return await self.storage.add_file(name, body, content_type)
+
+    async def fetch(self, ipfs_hash: str) -> Tuple[bytes, str]:
+        """Read content, through the cache and hedged gateways when remote"""
+        if not self.storage.remote:
+            return await self.storage.get(ipfs_hash)
+
+        cached = await self.cache.get(ipfs_hash)
+        if cached is not None:
+            return cached
+
+        with self.metrics.upstream("gateway_get"):
+            data, content_type = await self.gateways.fetch(ipfs_hash)
+        await self.cache.put(ipfs_hash, data, content_type)
+        return data, content_type
 
     async def get_json(self, ipfs_hash: str) -> Dict[str, Any]:
-        """Get JSON data from Pinata gateway"""
-        try:
-            url = f"https://gateway.pinata.cloud/ipfs/{ipfs_hash}"
-            response = requests.get(url)
-            response.raise_for_status()
-            return response.json()
-        except Exception as e:
-            raise Exception(f"Failed to retrieve from Pinata: {str(e)}")
+        """Get JSON data from the store"""
+        data, _ = await self.fetch(ipfs_hash)
+        return json.loads(data)
 
     def get_gateway_url(self, ipfs_hash: str) -> str:
-        """Get the gateway URL for an IPFS hash"""
-        return f"https://gateway.pinata.cloud/ipfs/{ipfs_hash}"
+        """Get the gateway URL for an IPFS hash
+
+        Always absolute, as it is written on-chain: without a configured
+        gateway it is this service's own ``/ipfs/{cid}`` at the request's base URL.
+        """
+        base = (
+            self.public_gateway_url
+            or self.storage.gateway_base_url
+            or request_base_url.get()
+        )
+        if not base:
+            raise RuntimeError(
+                "no gateway base URL outside a request; set PUBLIC_GATEWAY_URL"
+            )
+        return f"{base}/ipfs/{ipfs_hash}"
 
 
 class PersonaCreate(BaseModel):
@@ -84,95 +204,435 @@ class Complaint(BaseModel):
     summary: str
     content: str
 
-app = FastAPI(trailing_slash=False)
-pinata = PinataHandler()
+DOCUMENT_MODELS = {
+    "persona": PersonaCreate,
+    "argument": Argument,
+    "evidence": Evidence,
+    "complaint": Complaint,
+}
+
+
+class BatchItem(BaseModel):
+    type: Literal["persona", "argument", "evidence", "complaint"]
+    document: Dict[str, Any]
+
+
+def document_name(document: BaseModel) -> str:
+    """Pinata metadata name used by the single-document routes"""
+    if isinstance(document, PersonaCreate):
+        return f"{document.name}.json"
+    return f"{document.summary}.txt"
+
+metrics = Metrics()
+pinata = PinataHandler(metrics)
+pin_queue = PinQueue(
+    PinJournal(os.getenv("PIN_JOURNAL_PATH", "/tmp/pin_journal.sqlite3")),
+    pinata,
+    concurrency=int(os.getenv("PIN_QUEUE_CONCURRENCY", "4")),
+    max_attempts=int(os.getenv("PIN_QUEUE_MAX_ATTEMPTS", "10")),
+)
+
+
+async def pin_document(document: BaseModel) -> Dict[str, Any]:
+    """Pin a validated document now, or journal it when PIN_MODE is async"""
+    name = document_name(document)
+    if PIN_MODE == "async":
+        ipfs_hash, queued = await pin_queue.enqueue(name, document.model_dump())
+        status = "queued" if queued else "success"
+    else:
+        ipfs_hash = await pinata.pin_json(name, document.model_dump())
+        status = "success"
+
+    return {
+        "status": status,
+        "ipfs_hash": ipfs_hash,
+        "gateway_url": pinata.get_gateway_url(ipfs_hash),
+    }
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # the client is opened lazily on first use; startup only resumes the
+    # journal a previous process may have left behind
+    if PIN_MODE == "async":
+        pin_queue.start()
+    yield
+    await pin_queue.stop()
+    await pinata.close()
+    images.shutdown()
+
+
+app = FastAPI(trailing_slash=False, lifespan=lifespan)
+app.add_middleware(ClientContextMiddleware)
+app.add_middleware(BaseUrlMiddleware)
+app.add_middleware(MetricsMiddleware, metrics=metrics, routes=app.router.routes)
+
+
+@app.exception_handler(RateLimited)
+async def rate_limited(request: Request, exc: RateLimited):
+    return JSONResponse(
+        {"detail": str(exc)},
+        status_code=exc.status_code,
+        headers={"Retry-After": exc.retry_after_header},
+    )
+
+
+def cache_metrics():
+    index = pinata.index.stats()
+    cache = pinata.cache.stats()
+    families = [
+        (
+            "pin_index_lookups_total",
+            "counter",
+            "Pin deduplication lookups by result",
+            [
+                ((("result", "memory_hit"),), index["memory_hits"]),
+                ((("result", "disk_hit"),), index["disk_hits"]),
+                ((("result", "miss"),), index["misses"]),
+            ],
+        ),
+        (
+            "ipfs_cache_lookups_total",
+            "counter",
+            "IPFS content cache lookups by result",
+            [
+                ((("result", "memory_hit"),), cache["memory_hits"]),
+                ((("result", "disk_hit"),), cache["disk_hits"]),
+                ((("result", "miss"),), cache["misses"]),
+            ],
+        ),
+        (
+            "ipfs_cache_memory_bytes",
+            "gauge",
+            "Bytes held by the in-memory IPFS content cache",
+            [((), cache["memory_bytes"])],
+        ),
+    ]
+    if PIN_MODE == "async":
+        queue = pin_queue.stats()
+        families.append(
+            (
+                "pin_queue_jobs",
+                "gauge",
+                "Journaled pins by status",
+                [
+                    ((("status", status),), queue[status])
+                    for status in ("pending", "retrying", "failed")
+                ],
+            )
+        )
+    return families
+
+
+metrics.collectors.append(cache_metrics)
+metrics.collectors.append(pinata.limiter.families)
+metrics.collectors.append(pinata.gateways.families)
 
 
 @app.post("/personas")
 async def create_persona(persona: PersonaCreate):
     try:
-        # Upload to Pinata
-        name = f"{persona.name}.json"
-        ipfs_hash = await pinata.pin_json(name, persona.model_dump())
-
-        return {
-            "status": "success",
-            "ipfs_hash": ipfs_hash,
-            "gateway_url": pinata.get_gateway_url(ipfs_hash),
-        }
+        return await pin_document(persona)
+    except RateLimited:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/argument")
 async def create_argument(argument: Argument):
     try:
-        # Upload to Pinata
-        name = f"{argument.summary}.txt"
-        ipfs_hash = await pinata.pin_json(name, argument.model_dump())
-
-        return {
-            "status": "success",
-            "ipfs_hash": ipfs_hash,
-            "gateway_url": pinata.get_gateway_url(ipfs_hash),
-        }
+        return await pin_document(argument)
+    except RateLimited:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/evidence")
 async def create_evidence(evidence: Evidence):
     try:
-        # Upload to Pinata
-        name = f"{evidence.summary}.txt"
-        ipfs_hash = await pinata.pin_json(name, evidence.model_dump())
-
-        return {
-            "status": "success",
-            "ipfs_hash": ipfs_hash,
-            "gateway_url": pinata.get_gateway_url(ipfs_hash),
-        }
+        return await pin_document(evidence)
+    except RateLimited:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/complaint")
 async def create_complaint(complaint: Complaint):
     try:
-        # Upload to Pinata
-        name = f"{complaint.summary}.txt"
-        ipfs_hash = await pinata.pin_json(name, complaint.model_dump())
-
-        return {
-            "status": "success",
-            "ipfs_hash": ipfs_hash,
-            "gateway_url": pinata.get_gateway_url(ipfs_hash),
-        }
+        return await pin_document(complaint)
+    except RateLimited:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.post("/image")
-async def upload_file(file: UploadFile = File(...)):
-    try:
-        # Upload to Pinata
-        print("starting file pinning")
+@app.post("/batch")
+async def create_batch(items: List[BatchItem], concurrency: Optional[int] = None):
+    if len(items) > BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=413, detail=f"batch exceeds {BATCH_MAX_ITEMS} items"
+        )
+    limit = min(concurrency or BATCH_CONCURRENCY, BATCH_CONCURRENCY)
+    semaphore = asyncio.Semaphore(max(limit, 1))
+
+    async def pin_item(item: BatchItem) -> Dict[str, Any]:
+        try:
+            document = DOCUMENT_MODELS[item.type].model_validate(item.document)
+            async with semaphore:
+                return await pin_document(document)
+        except RateLimited as e:
+            return {
+                "status": "error",
+                "detail": str(e),
+                "retry_after": e.retry_after_header,
+            }
+        except Exception as e:
+            return {"status": "error", "detail": str(e)}
+
+    # batches yield to interactive pins; gather keeps results in input order
+    with background():
+        results = await asyncio.gather(*(pin_item(item) for item in items))
+    return {"status": "success", "results": results}
+
+
+class DuplexStreamingResponse(StreamingResponse):
+    """StreamingResponse that leaves the request body to its generator
 
-        input_image_path = os.path.join("/tmp", "image.png")
+    Starlette's version drains ``receive`` to watch for disconnects, which
+    would swallow a body the generator is still reading. A disconnect shows
+    up as ClientDisconnect from ``request.stream()`` instead.
+    """
 
-        with open(input_image_path, "wb") as buffer:
-            buffer.write(await file.read())
+    async def __call__(self, scope, receive, send):
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
 
-        files = {"file": (file.filename, open(input_image_path, "rb"))}
 
-        ipfs_hash = await pinata.pin_file(files)
+async def ingest_line(raw: Optional[bytes]) -> Dict[str, Any]:
+    """Validate and pin one NDJSON line, waiting out rate limiting"""
+    if raw is None:
+        return {"status": "error", "detail": f"line exceeds {INGEST_MAX_LINE_BYTES} bytes"}
+    try:
+        item = BatchItem.model_validate_json(raw)
+        document = DOCUMENT_MODELS[item.type].model_validate(item.document)
+    except ValueError as e:
+        return {"status": "error", "detail": str(e)}
 
-        return {
-            "status": "success",
+    while True:
+        try:
+            return await pin_document(document)
+        except RateLimited as e:
+            # a backfill has nobody waiting on it; slow down instead of failing
+            await asyncio.sleep(e.retry_after)
+        except Exception as e:
+            return {"status": "error", "detail": str(e)}
+
+
+@app.post("/ingest")
+async def ingest(request: Request, concurrency: Optional[int] = None):
+    """Pin a stream of NDJSON ``{"type": ..., "document": ...}`` lines
+
+    Results stream back as NDJSON in input order, one per non-blank line,
+    followed by a summary line. At most ``concurrency`` lines are in flight
+    and the body is only read as fast as they complete, so memory stays flat
+    however long the upload is.
+    """
+    limit = max(min(concurrency or INGEST_CONCURRENCY, INGEST_CONCURRENCY), 1)
+
+    async def results() -> AsyncIterator[bytes]:
+        window: "deque[Tuple[int, asyncio.Task]]" = deque()
+        counts = {"lines": 0, "success": 0, "queued": 0, "error": 0}
+
+        def emit(result: Dict[str, Any]) -> bytes:
+            counts[result["status"]] += 1
+            return json.dumps(result).encode() + b"\n"
+
+        with background():
+            try:
+                async for raw in iter_lines(request.stream(), INGEST_MAX_LINE_BYTES):
+                    counts["lines"] += 1
+                    line = counts["lines"]
+                    task = asyncio.create_task(ingest_line(raw))
+                    window.append((line, task))
+                    if len(window) >= limit:
+                        line, task = window.popleft()
+                        yield emit({"line": line, **await task})
+                while window:
+                    line, task = window.popleft()
+                    yield emit({"line": line, **await task})
+            finally:
+                # the client went away; don't keep pinning for nobody
+                for _, task in window:
+                    task.cancel()
+        yield json.dumps({"status": "done", **counts}).encode() + b"\n"
+
+    return DuplexStreamingResponse(results(), media_type="application/x-ndjson")
+
+
+async def pin_derivatives(filename: str, data: bytes) -> Dict[str, Any]:
+    """Render and pin WebP derivatives of an uploaded image"""
+    stem = os.path.splitext(filename)[0] or "image"
+    rendered = await images.make_derivatives(data)
+    with background():
+        hashes = await asyncio.gather(
+            *(
+                pinata.pin_bytes(f"{stem}.{label}.webp", body, "image/webp")
+                for label, body, _, _ in rendered
+            )
+        )
+    return {
+        label: {
             "ipfs_hash": ipfs_hash,
             "gateway_url": pinata.get_gateway_url(ipfs_hash),
+            "width": width,
+            "height": height,
+            "bytes": len(body),
         }
+        for (label, body, width, height), ipfs_hash in zip(rendered, hashes)
+    }
+
+
+@app.post("/image")
+async def upload_file(request: Request, derivatives: bool = True):
+    try:
+        # Stream the upload straight through to the store
+        forwarder, body = await forward_file_upload(
+            request,
+            MAX_UPLOAD_BYTES,
+            capture_bytes=IMAGE_DERIVATIVE_MAX_BYTES if derivatives else 0,
+        )
+        ipfs_hash = await pinata.pin_file(
+            forwarder.filename, body, forwarder.content_type
+        )
+    except UploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    except RateLimited:
+        raise
     except Exception as e:
         print(f"FAILED file pinning {e!r}")
         raise HTTPException(status_code=500, detail=str(e))
 
+    result = {
+        "status": "success",
+        "ipfs_hash": ipfs_hash,
+        "gateway_url": pinata.get_gateway_url(ipfs_hash),
+    }
+    if forwarder.captured is not None:
+        # the original is already pinned; a derivative failure only drops the manifest
+        try:
+            result["derivatives"] = await pin_derivatives(
+                forwarder.filename, bytes(forwarder.captured)
+            )
+        except Exception as e:
+            print(f"FAILED image derivatives {e!r}")
+            result["derivatives_error"] = str(e)
+    return result
+
+
+@app.get("/metrics")
+async def get_metrics():
+    return PlainTextResponse(
+        metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
+@app.get("/pins/stats")
+async def pin_stats():
+    return pinata.index.stats()
+
+
+@app.get("/pins/queue")
+async def pin_queue_stats():
+    return pin_queue.stats()
+
+
+@app.get("/pins/limiter")
+async def pin_limiter_stats():
+    return pinata.limiter.stats()
+
+
+IMMUTABLE_HEADERS = {
+    "Cache-Control": "public, max-age=31536000, immutable",
+    "Accept-Ranges": "bytes",
+}
+
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """Parse a single ``bytes=`` range into inclusive offsets
+
+    Returns None for headers we do not serve as ranges, including malformed
+    ones such as ``bytes=5-2`` (RFC 9110 says to ignore those and send the
+    full body), and raises ValueError for well-formed but unsatisfiable ranges.
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip() != "bytes" or "," in spec:
+        return None
+    start, _, end = spec.strip().partition("-")
+    if not start:
+        if not end.isdigit():
+            return None
+        length = int(end)
+        if length == 0:
+            raise ValueError("empty suffix range")
+        return max(size - length, 0), size - 1
+    if not start.isdigit() or (end and not end.isdigit()):
+        return None
+    first = int(start)
+    if end and int(end) < first:
+        return None
+    if first >= size:
+        raise ValueError("range not satisfiable")
+    last = min(int(end), size - 1) if end else size - 1
+    return first, last
+
+
+@app.get("/ipfs/{ipfs_hash}")
+async def get_ipfs(ipfs_hash: str, request: Request):
+    if not is_cid(ipfs_hash):
+        raise HTTPException(status_code=400, detail="invalid CID")
+
+    etag = f'"{ipfs_hash}"'
+    headers = {**IMMUTABLE_HEADERS, "ETag": etag}
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+
+    try:
+        data, content_type = await pinata.fetch(ipfs_hash)
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=str(e))
+
+    range_header = request.headers.get("range")
+    if range_header and request.headers.get("if-range", etag) == etag:
+        try:
+            byte_range = parse_range(range_header, len(data))
+        except ValueError:
+            return Response(
+                status_code=416,
+                headers={**headers, "Content-Range": f"bytes */{len(data)}"},
+            )
+        if byte_range is not None:
+            first, last = byte_range
+            headers["Content-Range"] = f"bytes {first}-{last}/{len(data)}"
+            return Response(
+                data[first : last + 1],
+                status_code=206,
+                media_type=content_type,
+                headers=headers,
+            )
+
+    return Response(data, media_type=content_type, headers=headers)
+
+
+@app.get("/ipfs/cache/stats")
+async def ipfs_cache_stats():
+    return pinata.cache.stats()
+
+
+@app.get("/ipfs/gateways/stats")
+async def ipfs_gateway_stats():
+    return pinata.gateways.stats()
+
 
 @app.api_route("/{path:path}", methods=["GET", "POST", "PUT", "DELETE"])
 async def catch_all(request: Request, path: str):
@@ -184,4 +644,6 @@ async def catch_all(request: Request, path: str):
     }
 
 
-handler = Mangum(app)
+# Mangum would run the lifespan around every invocation; keep the connection
+# pool alive across warm invocations instead
+handler = Mangum(app, lifespan="off")
@@ -0,0 +1,114 @@
+"""Cold-start cost of the Lambda handler.
+
+Each run starts a fresh interpreter, imports ``app`` and invokes ``handler``
+once with a synthetic API Gateway (REST) event, reporting how long the
+import and the first call took:
+
+    python bench/cold_start.py --runs 10
+    python bench/cold_start.py --importtime   # top modules by import time
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+PROBE = r"""
+import json, sys, time
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+event = {
+    "resource": "/{proxy+}",
+    "path": "/healthz",
+    "httpMethod": "GET",
+    "headers": {"Host": "example.execute-api.us-east-1.amazonaws.com"},
+    "multiValueHeaders": {},
+    "queryStringParameters": None,
+    "multiValueQueryStringParameters": None,
+    "pathParameters": {"proxy": "healthz"},
+    "stageVariables": None,
+    "requestContext": {
+        "resourcePath": "/{proxy+}",
+        "httpMethod": "GET",
+        "path": "/dev/healthz",
+        "stage": "dev",
+        "requestId": "cold-start-bench",
+        "identity": {"sourceIp": "127.0.0.1"},
+    },
+    "body": None,
+    "isBase64Encoded": False,
+}
+response = app.handler(event, type("Context", (), {})())
+called = time.perf_counter()
+assert response["statusCode"] == 200, response
+second = time.perf_counter()
+app.handler(event, type("Context", (), {})())
+warm = time.perf_counter() - second
+print(json.dumps({
+    "import_ms": (imported - start) * 1000,
+    "first_call_ms": (called - imported) * 1000,
+    "warm_call_ms": warm * 1000,
+    "modules": len(sys.modules),
+}))
+"""
+
+
+def run_once(env: dict) -> dict:
+    output = subprocess.run(
+        [sys.executable, "-c", PROBE],
+        cwd=os.path.dirname(HERE),
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def importtime(env: dict, top: int):
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app"],
+        cwd=os.path.dirname(HERE),
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stderr
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        rows.append((int(cumulative), name.rstrip()))
+    for cumulative, name in sorted(rows, reverse=True)[:top]:
+        print(f"{cumulative / 1000:8.1f} ms {name}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--importtime", action="store_true")
+    parser.add_argument("--top", type=int, default=25)
+    args = parser.parse_args()
+
+    env = {**os.environ, "PYTHONDONTWRITEBYTECODE": "0"}
+    if args.importtime:
+        importtime(env, args.top)
+        return
+
+    runs = [run_once(env) for _ in range(args.runs)]
+    report = {
+        key: round(statistics.median(run[key] for run in runs), 2)
+        for key in ("import_ms", "first_call_ms", "warm_call_ms", "modules")
+    }
+    report["runs"] = args.runs
+    print(json.dumps(report))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Requests per second of the pin routes under concurrent load.
+
+Starts the fake Pinata server and the webservice in-process with uvicorn, then
+fires ``--requests`` POSTs at ``/argument`` with ``--concurrency`` in flight:
+
+    python bench/concurrency.py --latency 0.2 --concurrency 1 8 32 64
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import threading
+import time
+
+import httpx
+import uvicorn
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [HERE, os.path.dirname(HERE)]
+
+
+def serve(app, port: int) -> uvicorn.Server:
+    server = uvicorn.Server(
+        uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning")
+    )
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        if server.should_exit:
+            raise RuntimeError(f"server on port {port} failed to start")
+        time.sleep(0.01)
+    return server
+
+
+async def drive(url: str, total: int, concurrency: int) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async with httpx.AsyncClient(timeout=60) as client:
+
+        async def one(i):
+            # distinct documents so the pin deduplication index never hits
+            payload = {"summary": f"benchmark {i} {time.time()}", "content": "x" * 512}
+            async with semaphore:
+                response = await client.post(f"{url}/argument", json=payload)
+                response.raise_for_status()
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(total)))
+        return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--latency", type=float, default=0.1)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    args = parser.parse_args()
+
+    os.environ["FAKE_PINATA_LATENCY"] = str(args.latency)
+    os.environ["PINATA_API_URL"] = "http://127.0.0.1:8001"
+    os.environ["PINATA_GATEWAY_URL"] = "http://127.0.0.1:8001"
+    os.environ["PINATA_RATE_LIMIT"] = "0"
+
+    import fake_pinata
+    import app
+
+    serve(fake_pinata.app, 8001)
+    serve(app.app, 8002)
+
+    for concurrency in args.concurrency:
+        elapsed = asyncio.run(drive("http://127.0.0.1:8002", args.requests, concurrency))
+        print(
+            f"concurrency={concurrency:<4} requests={args.requests} "
+            f"elapsed={elapsed:.2f}s rps={args.requests / elapsed:.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""Local stand-in for the Pinata pinning API and gateway used by the benchmarks.
+
+Behaviour is set through the environment:
+
+- ``FAKE_PINATA_LATENCY``: base latency of every call in seconds
+- ``FAKE_PINATA_JITTER``: mean of an exponential tail added on top
+- ``FAKE_PINATA_ERROR_RATE``: fraction of calls answered with
+  ``FAKE_PINATA_ERROR_STATUS`` (default 500)
+- ``FAKE_PINATA_RATE_LIMIT``: pin calls per second allowed before answering
+  429 with Retry-After, like Pinata's own quota (default 0, unlimited)
+
+Run standalone with:
+
+    FAKE_PINATA_LATENCY=0.2 FAKE_PINATA_ERROR_RATE=0.05 uvicorn fake_pinata:app --port 8001
+"""
+
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+
+from fastapi import FastAPI, HTTPException, Request, Response
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from cid import UnixFSHasher, json_bytes, json_cid  # noqa: E402
+
+LATENCY = float(os.getenv("FAKE_PINATA_LATENCY", "0.1"))
+JITTER = float(os.getenv("FAKE_PINATA_JITTER", "0"))
+ERROR_RATE = float(os.getenv("FAKE_PINATA_ERROR_RATE", "0"))
+ERROR_STATUS = int(os.getenv("FAKE_PINATA_ERROR_STATUS", "500"))
+RATE_LIMIT = float(os.getenv("FAKE_PINATA_RATE_LIMIT", "0"))
+
+app = FastAPI()
+store = {}
+# fixed one-second windows: (window start, calls in it)
+window = [0.0, 0]
+throttled = 0
+
+
+def quota():
+    global throttled
+    if not RATE_LIMIT:
+        return
+    now = time.monotonic()
+    if now - window[0] >= 1.0:
+        window[:] = [now, 0]
+    window[1] += 1
+    if window[1] > RATE_LIMIT:
+        throttled += 1
+        raise HTTPException(
+            status_code=429,
+            detail="rate limited",
+            headers={"Retry-After": "1"},
+        )
+
+
+async def upstream_behaviour():
+    delay = LATENCY + (random.expovariate(1 / JITTER) if JITTER else 0)
+    await asyncio.sleep(delay)
+    if random.random() < ERROR_RATE:
+        raise HTTPException(status_code=ERROR_STATUS, detail="injected failure")
+
+
+@app.post("/pinning/pinJSONToIPFS")
+async def pin_json(request: Request):
+    content = json.loads(await request.body())["pinataContent"]
+    quota()
+    await upstream_behaviour()
+    ipfs_hash = json_cid(content)
+    store[ipfs_hash] = json_bytes(content)
+    return {"IpfsHash": ipfs_hash, "PinSize": len(store[ipfs_hash])}
+
+
+@app.post("/pinning/pinFileToIPFS")
+async def pin_file(request: Request):
+    quota()
+    hasher = UnixFSHasher()
+    size = 0
+    small = bytearray()
+    async with request.form() as form:
+        upload = form["file"]
+        while chunk := await upload.read(1024 * 1024):
+            hasher.update(chunk)
+            size += len(chunk)
+            if size <= 1024 * 1024:
+                small += chunk
+    await upstream_behaviour()
+    ipfs_hash = hasher.cid()
+    if size <= 1024 * 1024:
+        store[ipfs_hash] = bytes(small)
+    return {"IpfsHash": ipfs_hash, "PinSize": size}
+
+
+@app.get("/stats")
+async def stats():
+    return {"stored": len(store), "throttled": throttled}
+
+
+@app.get("/ipfs/{ipfs_hash}")
+async def gateway(ipfs_hash: str):
+    await upstream_behaviour()
+    if ipfs_hash not in store:
+        return Response(status_code=404)
+    return Response(store[ipfs_hash], media_type="application/json")
@@ -0,0 +1,37 @@
+"""Process management shared by the benchmarks."""
+
+import os
+import subprocess
+import sys
+import time
+
+import httpx
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SERVICE_DIR = os.path.dirname(HERE)
+
+
+def start(module: str, cwd: str, port: int, env: dict) -> subprocess.Popen:
+    """Run ``module`` under uvicorn in its own process and wait until it answers"""
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", module, "--port", str(port),
+         "--log-level", "warning"],
+        cwd=cwd,
+        env={**os.environ, **env},
+    )
+    for _ in range(200):
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/")
+            return proc
+        except httpx.TransportError:
+            time.sleep(0.05)
+    proc.kill()
+    raise RuntimeError(f"{module} did not start")
+
+
+def start_fake_pinata(port: int, env: dict) -> subprocess.Popen:
+    return start("fake_pinata:app", HERE, port, env)
+
+
+def start_service(port: int, env: dict) -> subprocess.Popen:
+    return start("app:app", SERVICE_DIR, port, env)
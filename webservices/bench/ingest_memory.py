@@ -0,0 +1,116 @@
+"""Memory of the webservice while a long NDJSON stream goes through /ingest.
+
+Runs the webservice against the local storage backend and streams
+``--lines`` synthetic documents to ``POST /ingest``, reading the results
+while it is still uploading (as a full-duplex client must), and samples the
+webservice's resident set size along the way:
+
+    python bench/ingest_memory.py --lines 50000
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import time
+
+from harness import start_service
+from upload_memory import rss_mb
+
+KINDS = ["persona", "argument", "evidence", "complaint"]
+
+
+def line(i: int) -> bytes:
+    kind = KINDS[i % len(KINDS)]
+    tag = f"{kind} {i} {time.time_ns()}"
+    if kind == "persona":
+        document = {
+            "name": tag,
+            "age": 40,
+            "occupation": "Food Truck Owner",
+            "physical_description": "Short, restless",
+            "image_url": "https://example.invalid/portrait.png",
+            "personality": "Stubborn",
+            "details": {},
+        }
+    else:
+        document = {"summary": tag, "content": "x" * 512}
+    return json.dumps({"type": kind, "document": document}).encode() + b"\n"
+
+
+async def ingest(port: int, lines: int, pid: int, samples: list) -> dict:
+    """Upload with chunked encoding on one task while reading on another"""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(
+        b"POST /ingest HTTP/1.1\r\nHost: bench\r\n"
+        b"Content-Type: application/x-ndjson\r\nTransfer-Encoding: chunked\r\n\r\n"
+    )
+
+    async def upload():
+        batch = []
+        for i in range(lines):
+            batch.append(line(i))
+            if len(batch) == 64 or i == lines - 1:
+                data = b"".join(batch)
+                writer.write(b"%x\r\n%s\r\n" % (len(data), data))
+                await writer.drain()
+                batch = []
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+    sender = asyncio.create_task(upload())
+    status = await reader.readline()
+    while (await reader.readline()).strip():
+        pass
+
+    # the response is chunked; results are the NDJSON lines inside it
+    summary, buffer, seen = {}, b"", 0
+    while True:
+        size = int((await reader.readline()).strip(), 16)
+        if size == 0:
+            break
+        buffer += await reader.readexactly(size)
+        await reader.readexactly(2)
+        *complete, buffer = buffer.split(b"\n")
+        for result in complete:
+            summary = json.loads(result)
+            seen += 1
+            if seen % 5000 == 0:
+                samples.append((seen, rss_mb(pid)))
+    await sender
+    writer.close()
+    return {"http": status.decode().strip(), **summary}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--lines", type=int, default=50000)
+    args = parser.parse_args()
+
+    run_dir = f"/tmp/ingest-{os.getpid()}"
+    env = {
+        "STORAGE_BACKEND": "local",
+        "STORAGE_DIR": f"{run_dir}-store",
+        "PIN_INDEX_PATH": f"{run_dir}-index.sqlite3",
+    }
+    service = start_service(8002, env)
+    try:
+        baseline = rss_mb(service.pid)
+        samples = []
+        start = time.perf_counter()
+        summary = asyncio.run(ingest(8002, args.lines, service.pid, samples))
+        elapsed = time.perf_counter() - start
+    finally:
+        service.terminate()
+
+    print(json.dumps(summary))
+    print(
+        f"lines={args.lines} elapsed={elapsed:.2f}s "
+        f"lines_per_s={args.lines / elapsed:.0f} rss_idle={baseline:.1f}MB "
+        f"rss_peak={max((mb for _, mb in samples), default=baseline):.1f}MB"
+    )
+    print(" ".join(f"{seen}:{mb:.0f}MB" for seen, mb in samples))
+
+
+if __name__ == "__main__":
+    main()
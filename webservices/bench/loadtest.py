@@ -0,0 +1,228 @@
+"""Load test of every pinning route against the fake Pinata server.
+
+The fake Pinata and the webservice each run in their own uvicorn process.
+Each route is driven at every ``--concurrency`` level in turn and the run
+is reported as JSON (latency percentiles in milliseconds, requests per
+second, error counts):
+
+    python bench/loadtest.py --latency 0.1 --jitter 0.05 --error-rate 0.01 \\
+        --concurrency 1 8 32 --requests 200 --output loadtest.json
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import os
+import platform
+import sys
+import time
+from typing import Any, Callable, Dict, List
+
+import httpx
+
+from harness import start_fake_pinata, start_service
+
+ROUTES = ["personas", "argument", "evidence", "complaint", "batch", "image", "ipfs"]
+
+
+def percentile(samples: List[float], q: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(int(round(q / 100 * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+
+def document(kind: str, i: int) -> Dict[str, Any]:
+    # unique per request so the pin deduplication index never short-circuits
+    tag = f"{kind} {i} {time.time_ns()}"
+    if kind == "persona":
+        return {
+            "name": tag,
+            "age": 40,
+            "occupation": "Food Truck Owner",
+            "physical_description": "Short, restless",
+            "image_url": "https://example.invalid/portrait.png",
+            "personality": "Stubborn",
+            "details": {"quirks": "names her utensils"},
+        }
+    return {"summary": tag, "content": "x" * 1024}
+
+
+def request_factory(route: str, base: str, state: dict) -> Callable:
+    if route in ("personas", "argument", "evidence", "complaint"):
+        kind = "persona" if route == "personas" else route
+
+        def build(client: httpx.AsyncClient, i: int):
+            return client.post(f"{base}/{route}", json=document(kind, i))
+
+    elif route == "batch":
+
+        def build(client: httpx.AsyncClient, i: int):
+            items = [
+                {"type": kind, "document": document(kind, i * 10 + j)}
+                for j, kind in enumerate(
+                    ["persona", "persona", "complaint", "argument", "evidence"]
+                )
+            ]
+            return client.post(f"{base}/batch", json=items)
+
+    elif route == "image":
+
+        def build(client: httpx.AsyncClient, i: int):
+            image = state["image"] + i.to_bytes(8, "big")
+            return client.post(
+                f"{base}/image", files={"file": (f"{i}.png", image, "image/png")}
+            )
+
+    elif route == "ipfs":
+
+        def build(client: httpx.AsyncClient, i: int):
+            return client.get(f"{base}/ipfs/{state['cid']}")
+
+    else:
+        raise ValueError(route)
+    return build
+
+
+async def run_level(build: Callable, total: int, concurrency: int) -> Dict[str, Any]:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    errors: Dict[str, int] = {}
+
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(timeout=120, limits=limits) as client:
+
+        async def one(i: int):
+            async with semaphore:
+                start = time.perf_counter()
+                try:
+                    response = await build(client, i)
+                    status = response.status_code
+                    outcome = None if status < 400 else str(status)
+                except httpx.HTTPError as e:
+                    outcome = type(e).__name__
+                latencies.append(time.perf_counter() - start)
+                if outcome is not None:
+                    errors[outcome] = errors.get(outcome, 0) + 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(total)))
+        elapsed = time.perf_counter() - start
+
+    ms = [latency * 1000 for latency in latencies]
+    return {
+        "concurrency": concurrency,
+        "requests": total,
+        "errors": errors,
+        "elapsed_s": round(elapsed, 3),
+        "rps": round(total / elapsed, 1),
+        "p50_ms": round(percentile(ms, 50), 2),
+        "p95_ms": round(percentile(ms, 95), 2),
+        "p99_ms": round(percentile(ms, 99), 2),
+        "max_ms": round(max(ms), 2),
+    }
+
+
+def noise_png(kb: int) -> bytes:
+    """A PNG of roughly ``kb`` KiB that the /image derivative pipeline can decode"""
+    from PIL import Image
+
+    side = max(int((kb * 1024 / 3) ** 0.5), 1)
+    out = io.BytesIO()
+    Image.effect_noise((side, side), 64).convert("RGB").save(out, format="PNG")
+    return out.getvalue()
+
+
+async def prepare(base: str, image_kb: int) -> dict:
+    """Pin the document the ipfs route reads back, riding out injected errors"""
+    async with httpx.AsyncClient(timeout=60) as client:
+        for _ in range(20):
+            response = await client.post(
+                f"{base}/argument", json=document("argument", -1)
+            )
+            if response.status_code == 200:
+                return {
+                    "cid": response.json()["ipfs_hash"],
+                    "image": noise_png(image_kb),
+                }
+    raise RuntimeError(f"could not pin the ipfs route document: {response.text}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--latency", type=float, default=0.1)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument(
+        "--upstream-quota", type=float, default=0.0,
+        help="pin calls per second the fake Pinata allows before answering 429",
+    )
+    parser.add_argument(
+        "--rate-limit", type=float, default=0.0,
+        help="PINATA_RATE_LIMIT for the service (0 disables the limiter)",
+    )
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32, 64])
+    parser.add_argument("--routes", nargs="+", default=ROUTES, choices=ROUTES)
+    parser.add_argument("--image-kb", type=int, default=512)
+    parser.add_argument("--pin-mode", default="sync", choices=["sync", "async"])
+    parser.add_argument(
+        "--storage", default="pinata", choices=["pinata", "local"],
+        help="STORAGE_BACKEND for the service",
+    )
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    run_dir = f"/tmp/loadtest-{os.getpid()}"
+    env = {
+        "FAKE_PINATA_LATENCY": str(args.latency),
+        "FAKE_PINATA_JITTER": str(args.jitter),
+        "FAKE_PINATA_ERROR_RATE": str(args.error_rate),
+        "FAKE_PINATA_RATE_LIMIT": str(args.upstream_quota),
+        "PINATA_RATE_LIMIT": str(args.rate_limit),
+        "PINATA_API_URL": "http://127.0.0.1:8001",
+        "PINATA_GATEWAY_URL": "http://127.0.0.1:8001",
+        "PIN_MODE": args.pin_mode,
+        "STORAGE_BACKEND": args.storage,
+        "STORAGE_DIR": f"{run_dir}-store",
+        "PIN_INDEX_PATH": f"{run_dir}-index.sqlite3",
+        "PIN_JOURNAL_PATH": f"{run_dir}-journal.sqlite3",
+        "IPFS_CACHE_DIR": f"{run_dir}-cache",
+    }
+    fake = start_fake_pinata(8001, env)
+    base = "http://127.0.0.1:8002"
+    service = start_service(8002, env)
+    try:
+        state = asyncio.run(prepare(base, args.image_kb))
+
+        results = []
+        for route in args.routes:
+            build = request_factory(route, base, state)
+            for concurrency in args.concurrency:
+                result = asyncio.run(run_level(build, args.requests, concurrency))
+                results.append({"route": route, **result})
+                print(
+                    f"{route:<10} c={concurrency:<4} rps={result['rps']:<8} "
+                    f"p50={result['p50_ms']}ms p99={result['p99_ms']}ms "
+                    f"errors={sum(result['errors'].values())}",
+                    file=sys.stderr,
+                )
+    finally:
+        service.terminate()
+        fake.terminate()
+
+    report = {
+        "config": {**vars(args), "python": platform.python_version()},
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""Peak memory of the webservice while concurrent large images stream through /image.
+
+Runs the fake Pinata server and the webservice as separate uvicorn processes,
+streams ``--concurrency`` uploads of ``--size-mb`` each, and samples the
+webservice's resident set size from /proc while they are in flight:
+
+    python bench/upload_memory.py --size-mb 50 --concurrency 8
+"""
+
+import argparse
+import asyncio
+import os
+import threading
+import time
+
+import httpx
+
+from harness import start_fake_pinata, start_service
+
+CHUNK = 64 * 1024
+
+
+def rss_mb(pid: int) -> float:
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+async def upload(client: httpx.AsyncClient, size: int):
+    boundary = "benchboundary"
+    block = os.urandom(CHUNK)
+
+    head = (
+        f"--{boundary}\r\n"
+        'Content-Disposition: form-data; name="file"; filename="bench.png"\r\n'
+        "Content-Type: image/png\r\n\r\n"
+    ).encode()
+    tail = f"\r\n--{boundary}--\r\n".encode()
+    chunks = size // CHUNK
+
+    async def body():
+        yield head
+        for _ in range(chunks):
+            yield block
+        yield tail
+
+    # announce the length up front like ordinary multipart clients do
+    response = await client.post(
+        "http://127.0.0.1:8002/image",
+        content=body(),
+        headers={
+            "Content-Type": f"multipart/form-data; boundary={boundary}",
+            "Content-Length": str(len(head) + chunks * CHUNK + len(tail)),
+        },
+    )
+    response.raise_for_status()
+
+
+async def drive(size: int, concurrency: int):
+    async with httpx.AsyncClient(timeout=300) as client:
+        await asyncio.gather(*(upload(client, size) for _ in range(concurrency)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size-mb", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+
+    env = {
+        "FAKE_PINATA_LATENCY": "0",
+        "PINATA_API_URL": "http://127.0.0.1:8001",
+        "PINATA_RATE_LIMIT": "0",
+        "MAX_UPLOAD_BYTES": str((args.size_mb + 1) * 1024 * 1024),
+    }
+    fake = start_fake_pinata(8001, env)
+    service = start_service(8002, env)
+    try:
+        baseline = rss_mb(service.pid)
+        peak = baseline
+        done = threading.Event()
+
+        def sample():
+            nonlocal peak
+            while not done.is_set():
+                peak = max(peak, rss_mb(service.pid))
+                time.sleep(0.02)
+
+        sampler = threading.Thread(target=sample)
+        sampler.start()
+        start_time = time.perf_counter()
+        asyncio.run(drive(args.size_mb * 1024 * 1024, args.concurrency))
+        elapsed = time.perf_counter() - start_time
+        done.set()
+        sampler.join()
+
+        total = args.size_mb * args.concurrency
+        print(
+            f"uploads={args.concurrency}x{args.size_mb}MB elapsed={elapsed:.2f}s "
+            f"throughput={total / elapsed:.1f}MB/s "
+            f"rss_idle={baseline:.1f}MB rss_peak={peak:.1f}MB"
+        )
+    finally:
+        service.terminate()
+        fake.terminate()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+"""Local computation of the CIDs IPFS assigns to pinned content
+
+Mirrors ``ipfs add --cid-version=1`` as used by Pinata for ``cidVersion: 1``:
+256 KiB fixed-size chunks stored as raw leaves, joined by a balanced UnixFS
+DAG of dag-pb nodes with at most 174 links each. A file that fits in one
+chunk is addressed by its raw leaf directly.
+
+CIDv0 (plain ``ipfs add``, Pinata's default) uses the same layout with
+dag-pb leaves, and is what older persona URIs point at.
+"""
+
+import base64
+import hashlib
+import json
+import re
+from typing import Any, List, Optional, Tuple
+
+CHUNK_SIZE = 256 * 1024
+MAX_LINKS = 174
+
+RAW = 0x55
+DAG_PB = 0x70
+SHA2_256 = 0x12
+
+
+def varint(value: int) -> bytes:
+    out = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def _field_varint(number: int, value: int) -> bytes:
+    return varint(number << 3) + varint(value)
+
+
+def _field_bytes(number: int, value: bytes) -> bytes:
+    return varint((number << 3) | 2) + varint(len(value)) + value
+
+
+def _cid_v1(codec: int, block: bytes) -> bytes:
+    digest = hashlib.sha256(block).digest()
+    return varint(1) + varint(codec) + bytes([SHA2_256, len(digest)]) + digest
+
+
+def _multihash(block: bytes) -> bytes:
+    digest = hashlib.sha256(block).digest()
+    return bytes([SHA2_256, len(digest)]) + digest
+
+
+_BASE58 = "123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz"
+
+
+def _b58encode(data: bytes) -> str:
+    number = int.from_bytes(data, "big")
+    out = ""
+    while number:
+        number, rem = divmod(number, 58)
+        out = _BASE58[rem] + out
+    return "1" * (len(data) - len(data.lstrip(b"\0"))) + out
+
+
+def _b58decode(text: str) -> bytes:
+    number = 0
+    for char in text:
+        number = number * 58 + _BASE58.index(char)
+    body = number.to_bytes((number.bit_length() + 7) // 8, "big")
+    return b"\0" * (len(text) - len(text.lstrip("1"))) + body
+
+
+def encode_cid(cid: bytes) -> str:
+    """Render a binary CID: base58 for CIDv0, base32 multibase for CIDv1"""
+    if cid[:1] == bytes([SHA2_256]):
+        return _b58encode(cid)
+    return "b" + base64.b32encode(cid).decode().lower().rstrip("=")
+
+
+def parse_cid(cid: str) -> Optional[Tuple[int, int, bytes]]:
+    """Split a CID string into (version, codec, multihash), None if malformed"""
+    try:
+        if cid.startswith("Qm"):
+            return 0, DAG_PB, _b58decode(cid)
+        if cid.startswith("b"):
+            text = cid[1:].upper()
+            raw = base64.b32decode(text + "=" * (-len(text) % 8))
+            if raw[0] != 1:
+                return None
+            # version and codec are single-byte varints for everything we handle
+            return 1, raw[1], raw[2:]
+    except (ValueError, IndexError):
+        pass
+    return None
+
+
+# (binary cid, file bytes covered, cumulative block size)
+Link = Tuple[bytes, int, int]
+
+
+def _file_node(children: List[Link], version: int = 1) -> Link:
+    unixfs = _field_varint(1, 2)  # Type: File
+    unixfs += _field_varint(3, sum(size for _, size, _ in children))
+    unixfs += b"".join(_field_varint(4, size) for _, size, _ in children)
+
+    # dag-pb canonical form puts Links (field 2) before Data (field 1)
+    block = b"".join(
+        _field_bytes(
+            2, _field_bytes(1, cid) + _field_bytes(2, b"") + _field_varint(3, tsize)
+        )
+        for cid, _, tsize in children
+    )
+    block += _field_bytes(1, unixfs)
+    return (
+        _cid_v1(DAG_PB, block) if version else _multihash(block),
+        sum(size for _, size, _ in children),
+        len(block) + sum(tsize for _, _, tsize in children),
+    )
+
+
+def _balanced(leaves: List[Link], depth: int, version: int) -> Link:
+    if depth == 0:
+        return leaves[0]
+    span = MAX_LINKS ** (depth - 1)
+    return _file_node(
+        [
+            _balanced(leaves[i : i + span], depth - 1, version)
+            for i in range(0, len(leaves), span)
+        ],
+        version,
+    )
+
+
+def _leaf(chunk: bytes, version: int) -> Link:
+    if version:
+        return _cid_v1(RAW, chunk), len(chunk), len(chunk)
+    # CIDv0 leaves wrap the chunk in a UnixFS File node
+    unixfs = _field_varint(1, 2)
+    if chunk:
+        unixfs += _field_bytes(2, chunk)
+    unixfs += _field_varint(3, len(chunk))
+    block = _field_bytes(1, unixfs)
+    return _multihash(block), len(chunk), len(block)
+
+
+class UnixFSHasher:
+    """Incrementally compute the CID of a file as its bytes stream in"""
+
+    def __init__(self, version: int = 1):
+        self.version = version
+        self._buffer = bytearray()
+        self._leaves: List[Link] = []
+
+    def update(self, data: bytes):
+        self._buffer += data
+        while len(self._buffer) >= CHUNK_SIZE:
+            self._add_leaf(bytes(self._buffer[:CHUNK_SIZE]))
+            del self._buffer[:CHUNK_SIZE]
+
+    def _add_leaf(self, chunk: bytes):
+        self._leaves.append(_leaf(chunk, self.version))
+
+    def cid(self) -> str:
+        leaves = list(self._leaves)
+        if self._buffer or not leaves:
+            leaves.append(_leaf(bytes(self._buffer), self.version))
+        if len(leaves) == 1:
+            return encode_cid(leaves[0][0])
+
+        depth = 1
+        while MAX_LINKS**depth < len(leaves):
+            depth += 1
+        return encode_cid(_balanced(leaves, depth, self.version)[0])
+
+
+def hasher_for(cid: str) -> Optional[UnixFSHasher]:
+    """A hasher that reproduces ``cid`` from the file's bytes, if any can
+
+    Only sha2-256 CIDs of raw or dag-pb files are reproducible, and a dag-pb
+    file only if it was added with the default importer settings; None means
+    the bytes cannot be checked against this CID at all.
+    """
+    parsed = parse_cid(cid)
+    if parsed is None:
+        return None
+    version, codec, multihash = parsed
+    if codec not in (RAW, DAG_PB) or multihash[:2] != bytes([SHA2_256, 32]):
+        return None
+    return UnixFSHasher(version)
+
+
+def bytes_cid(data: bytes) -> str:
+    """CIDv1 of a complete file"""
+    hasher = UnixFSHasher()
+    hasher.update(data)
+    return hasher.cid()
+
+
+def json_bytes(data: Any) -> bytes:
+    """Serialize JSON the way Pinata does (``JSON.stringify``) before hashing"""
+    return json.dumps(data, separators=(",", ":"), ensure_ascii=False).encode()
+
+
+def json_cid(data: Any) -> str:
+    """CIDv1 that ``pinJSONToIPFS`` assigns to ``data``"""
+    return bytes_cid(json_bytes(data))
+
+
+_CID_PATTERN = re.compile(r"^(Qm[1-9A-HJ-NP-Za-km-z]{44}|b[a-z2-7]{58,})$")
+
+
+def is_cid(value: str) -> bool:
+    """Whether ``value`` looks like a base58 CIDv0 or base32 CIDv1"""
+    return _CID_PATTERN.match(value) is not None
@@ -0,0 +1,130 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+import anyio
+
+
+class ContentCache:
+    """Two-tier cache for immutable IPFS content keyed by CID
+
+    Blobs live in an in-memory LRU bounded by total bytes, over a directory
+    on disk bounded the same way. Content never changes for a given CID, so
+    entries are only ever evicted, never invalidated.
+    """
+
+    def __init__(self, directory: str, max_memory_bytes: int, max_disk_bytes: int):
+        self.directory = directory
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._lru: "OrderedDict[str, Tuple[bytes, str]]" = OrderedDict()
+        self._memory_bytes = 0
+        self._disk_bytes: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def _path(self, cid: str) -> str:
+        return os.path.join(self.directory, cid)
+
+    def _remember(self, cid: str, data: bytes, content_type: str):
+        if len(data) > self.max_memory_bytes or cid in self._lru:
+            return
+        self._lru[cid] = (data, content_type)
+        self._memory_bytes += len(data)
+        while self._memory_bytes > self.max_memory_bytes:
+            _, (evicted, _) = self._lru.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+
+    async def get(self, cid: str) -> Optional[Tuple[bytes, str]]:
+        with self._lock:
+            entry = self._lru.get(cid)
+            if entry is not None:
+                self._lru.move_to_end(cid)
+                self.memory_hits += 1
+                return entry
+        # file IO off the event loop
+        return await anyio.to_thread.run_sync(self._read_disk, cid)
+
+    def _read_disk(self, cid: str) -> Optional[Tuple[bytes, str]]:
+        try:
+            with open(self._path(cid), "rb") as f:
+                data = f.read()
+            with open(self._path(cid) + ".type") as f:
+                content_type = f.read()
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.disk_hits += 1
+            self._remember(cid, data, content_type)
+        return data, content_type
+
+    async def put(self, cid: str, data: bytes, content_type: str):
+        with self._lock:
+            self._remember(cid, data, content_type)
+        await anyio.to_thread.run_sync(self._write_disk, cid, data, content_type)
+
+    def _write_disk(self, cid: str, data: bytes, content_type: str):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(cid)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp + ".type", "w") as f:
+            f.write(content_type)
+        with open(tmp, "wb") as f:
+            f.write(data)
+
+        with self._lock:
+            if self._disk_bytes is None:
+                self._disk_bytes = self._scan_disk()
+            # concurrent misses on one CID each write it; count it once
+            try:
+                previous = os.path.getsize(path)
+            except FileNotFoundError:
+                previous = 0
+            os.replace(tmp + ".type", path + ".type")
+            os.replace(tmp, path)
+            self._disk_bytes += len(data) - previous
+            if self._disk_bytes > self.max_disk_bytes:
+                self._evict_disk()
+
+    def _scan_disk(self) -> int:
+        return sum(
+            entry.stat().st_size
+            for entry in os.scandir(self.directory)
+            if entry.is_file() and not entry.name.endswith((".type", ".tmp"))
+        )
+
+    def _evict_disk(self):
+        """Drop the least recently written blobs until 90% of the budget is free"""
+        entries = sorted(
+            (
+                entry
+                for entry in os.scandir(self.directory)
+                if entry.is_file() and not entry.name.endswith((".type", ".tmp"))
+            ),
+            key=lambda entry: entry.stat().st_mtime,
+        )
+        for entry in entries:
+            if self._disk_bytes <= self.max_disk_bytes * 0.9:
+                break
+            size = entry.stat().st_size
+            for path in (entry.path, entry.path + ".type"):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+            self._disk_bytes -= size
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "memory_bytes": self._memory_bytes,
+            "memory_entries": len(self._lru),
+        }
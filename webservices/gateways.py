@@ -0,0 +1,236 @@
+import asyncio
+import time
+from abc import ABC, abstractmethod
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from cid import RAW, hasher_for, parse_cid
+from metrics import Family, Metrics
+from storage import Storage, open_client
+
+if TYPE_CHECKING:
+    import httpx
+
+# weight of the newest sample in each source's latency average
+ALPHA = 0.2
+# latency charged for a failed attempt, so failing sources sink in the ranking
+ERROR_PENALTY = 5.0
+
+
+class CidMismatch(Exception):
+    pass
+
+
+class Source(ABC):
+    """Somewhere content can be read from, with its observed latency"""
+
+    def __init__(self, name: str, trusted: bool):
+        self.name = name
+        # trusted sources may serve content whose CID cannot be recomputed
+        self.trusted = trusted
+        self.ewma: Optional[float] = None
+        self.results: Dict[str, int] = {}
+
+    def record(self, seconds: float, result: str):
+        self.ewma = seconds if self.ewma is None else (
+            ALPHA * seconds + (1 - ALPHA) * self.ewma
+        )
+        self.results[result] = self.results.get(result, 0) + 1
+
+    @abstractmethod
+    async def get(self, cid: str, max_bytes: int) -> Tuple[bytes, str, Optional[bool]]:
+        """Return (content, content type, whether it hashed to ``cid``)
+
+        The last item is None when the CID cannot be recomputed from bytes.
+        """
+
+
+class StorageSource(Source):
+    """The configured storage backend's own read path"""
+
+    def __init__(self, storage: Storage):
+        super().__init__(storage.name, trusted=True)
+        self.storage = storage
+
+    async def get(self, cid: str, max_bytes: int) -> Tuple[bytes, str, Optional[bool]]:
+        data, content_type = await self.storage.get(cid)
+        hasher = hasher_for(cid)
+        if hasher is None:
+            return data, content_type, None
+        hasher.update(data)
+        return data, content_type, hasher.cid() == cid
+
+
+class GatewaySource(Source):
+    """An HTTP gateway serving ``/ipfs/{cid}``, hashed as the body streams in"""
+
+    def __init__(self, base_url: str, fetcher: "GatewayFetcher"):
+        super().__init__(urlsplit(base_url).netloc or base_url, trusted=False)
+        self.base_url = base_url.rstrip("/")
+        self.fetcher = fetcher
+
+    async def get(self, cid: str, max_bytes: int) -> Tuple[bytes, str, Optional[bool]]:
+        client = await self.fetcher.start()
+        hasher = hasher_for(cid)
+        body = bytearray()
+        async with client.stream(
+            "GET", f"{self.base_url}/ipfs/{cid}", follow_redirects=True
+        ) as response:
+            response.raise_for_status()
+            async for chunk in response.aiter_bytes():
+                body += chunk
+                if len(body) > max_bytes:
+                    raise ValueError(f"response exceeds {max_bytes} bytes")
+                if hasher is not None:
+                    hasher.update(chunk)
+            content_type = response.headers.get(
+                "content-type", "application/octet-stream"
+            )
+        verified = None if hasher is None else hasher.cid() == cid
+        return bytes(body), content_type, verified
+
+
+class GatewayFetcher:
+    """Hedged reads across the storage backend and extra IPFS gateways
+
+    Sources are tried fastest first by their latency average. If the first
+    has not answered within ``hedge_delay`` (or fails) the next is started
+    alongside it, and so on; the first acceptable answer wins and the rest
+    are cancelled. An answer is acceptable when its bytes hash to the
+    requested CID. A trusted source may also serve dag-pb content whose CID
+    cannot be recomputed (it may have been added with other chunking), but
+    a raw-block CID is always checked, and untrusted mirrors never get the
+    benefit of the doubt.
+    """
+
+    def __init__(
+        self,
+        storage: Storage,
+        gateways: List[str],
+        hedge_delay: float,
+        max_bytes: int,
+        metrics: Optional[Metrics] = None,
+    ):
+        self.metrics = metrics or Metrics()
+        self.hedge_delay = hedge_delay
+        self.max_bytes = max_bytes
+        self.timeout = 30.0
+        self.client: Optional["httpx.AsyncClient"] = None
+        self.sources: List[Source] = [StorageSource(storage)] + [
+            GatewaySource(url, self) for url in gateways
+        ]
+
+    async def start(self) -> "httpx.AsyncClient":
+        if self.client is None:
+            self.client = open_client(self.timeout)
+        return self.client
+
+    async def close(self):
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+
+    def ranked(self) -> List[Source]:
+        # untried sources first, in configured order, so each gets measured
+        return sorted(
+            self.sources, key=lambda s: (s.ewma is not None, s.ewma or 0.0)
+        )
+
+    def _accept(self, source: Source, cid: str, verified: Optional[bool]) -> bool:
+        if verified:
+            return True
+        parsed = parse_cid(cid)
+        definitive = parsed is not None and parsed[1] == RAW
+        return source.trusted and not definitive
+
+    def _count(self, source: Source, result: str):
+        self.metrics.inc(
+            "gateway_requests_total",
+            (("gateway", source.name), ("result", result)),
+            help="Content reads by source and result",
+        )
+
+    async def _attempt(self, source: Source, cid: str) -> Tuple[bytes, str]:
+        start = time.perf_counter()
+        try:
+            data, content_type, verified = await source.get(cid, self.max_bytes)
+            if not self._accept(source, cid, verified):
+                raise CidMismatch(f"{source.name} served content that is not {cid}")
+        except asyncio.CancelledError:
+            # lost the race; what it took so far is a lower bound on its latency
+            source.record(time.perf_counter() - start, "cancelled")
+            raise
+        except CidMismatch:
+            source.record(ERROR_PENALTY, "mismatch")
+            self._count(source, "mismatch")
+            raise
+        except Exception:
+            source.record(max(time.perf_counter() - start, ERROR_PENALTY), "error")
+            self._count(source, "error")
+            raise
+
+        elapsed = time.perf_counter() - start
+        result = "verified" if verified else "trusted"
+        source.record(elapsed, result)
+        self._count(source, result)
+        self.metrics.observe(
+            "gateway_request_duration_seconds",
+            (("gateway", source.name),),
+            elapsed,
+            help="Latency of successful content reads by source",
+        )
+        return data, content_type
+
+    async def fetch(self, cid: str) -> Tuple[bytes, str]:
+        waiting = self.ranked()
+        running: Dict[asyncio.Task, Source] = {}
+        errors: List[str] = []
+        try:
+            while True:
+                # start another source on the first pass, when the hedge
+                # delay runs out, and as soon as one fails
+                if waiting:
+                    source = waiting.pop(0)
+                    running[asyncio.create_task(self._attempt(source, cid))] = source
+                if not running:
+                    raise Exception(f"no source could serve {cid}: {'; '.join(errors)}")
+
+                done, _ = await asyncio.wait(
+                    running,
+                    timeout=self.hedge_delay if waiting else None,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                for task in done:
+                    source = running.pop(task)
+                    try:
+                        return task.result()
+                    except Exception as e:
+                        errors.append(f"{source.name}: {e}")
+        finally:
+            for task in running:
+                task.cancel()
+
+    def stats(self) -> List[Dict]:
+        return [
+            {
+                "source": source.name,
+                "trusted": source.trusted,
+                "latency_ewma_seconds": source.ewma,
+                "results": source.results,
+            }
+            for source in self.ranked()
+        ]
+
+    def families(self) -> List[Family]:
+        return [
+            (
+                "gateway_latency_ewma_seconds",
+                "gauge",
+                "Moving average of read latency per source, used to rank them",
+                [
+                    ((("gateway", source.name),), source.ewma)
+                    for source in self.sources
+                    if source.ewma is not None
+                ],
+            )
+        ]
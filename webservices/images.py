@@ -0,0 +1,70 @@
+import asyncio
+import io
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import List, Optional, Sequence, Tuple
+
+THUMBNAIL_SIZES = [
+    int(size) for size in os.getenv("IMAGE_THUMBNAIL_SIZES", "512,128").split(",") if size
+]
+WEBP_QUALITY = int(os.getenv("IMAGE_WEBP_QUALITY", "80"))
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", str(os.cpu_count() or 1)))
+
+# (label, encoded bytes, width, height)
+Derivative = Tuple[str, bytes, int, int]
+
+_executor: Optional[Executor] = None
+
+
+def render_derivatives(
+    data: bytes, sizes: Sequence[int], quality: int
+) -> List[Derivative]:
+    """Encode a full-size WebP plus one WebP thumbnail per bounding size
+
+    Runs in a worker process, so it only takes and returns plain bytes.
+    """
+    from PIL import Image
+
+    with Image.open(io.BytesIO(data)) as image:
+        image.load()
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA" if "A" in image.getbands() else "RGB")
+
+        derivatives = []
+        for label, size in [("webp", None)] + [(f"thumb_{s}", s) for s in sizes]:
+            variant = image
+            if size is not None:
+                variant = image.copy()
+                variant.thumbnail((size, size), Image.LANCZOS)
+            out = io.BytesIO()
+            variant.save(out, format="WEBP", quality=quality, method=4)
+            derivatives.append((label, out.getvalue(), variant.width, variant.height))
+        return derivatives
+
+
+def executor() -> Executor:
+    global _executor
+    if _executor is None:
+        try:
+            _executor = ProcessPoolExecutor(max_workers=IMAGE_WORKERS)
+        except (OSError, NotImplementedError):
+            # Lambda has no /dev/shm for multiprocessing semaphores; Pillow
+            # releases the GIL while encoding, so threads still keep the
+            # event loop free
+            _executor = ThreadPoolExecutor(max_workers=IMAGE_WORKERS)
+    return _executor
+
+
+async def make_derivatives(data: bytes) -> List[Derivative]:
+    """Render derivatives off the event loop"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        executor(), render_derivatives, data, THUMBNAIL_SIZES, WEBP_QUALITY
+    )
+
+
+def shutdown():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
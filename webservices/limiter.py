@@ -0,0 +1,269 @@
+import asyncio
+import heapq
+import math
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional
+
+from metrics import Family, Metrics
+
+INTERACTIVE = 0
+BACKGROUND = 1
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BACKGROUND: "background"}
+
+# set per request by ClientContextMiddleware and per unit of work by background()
+priority: ContextVar[int] = ContextVar("priority", default=INTERACTIVE)
+client_id: ContextVar[str] = ContextVar("client_id", default="anonymous")
+
+
+class RateLimited(Exception):
+    status_code = 429
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+    @property
+    def retry_after_header(self) -> str:
+        return str(max(math.ceil(self.retry_after), 1))
+
+
+@contextmanager
+def background() -> Iterator[None]:
+    """Run upstream calls made inside the block at background priority"""
+    token = priority.set(BACKGROUND)
+    try:
+        yield
+    finally:
+        priority.reset(token)
+
+
+def retry_after_seconds(value: Optional[str], default: float) -> float:
+    """Parse a delta-seconds Retry-After header, ignoring HTTP dates"""
+    try:
+        return max(float(value), 0.0)
+    except (TypeError, ValueError):
+        return default
+
+
+class Limiter:
+    """Token bucket admission control for calls to a rate-limited upstream
+
+    Calls take a token when one is free and nobody is waiting. Otherwise they
+    queue ordered by priority, then by how many calls their client already
+    has queued, so one busy client cannot crowd out the others. Calls that
+    would overflow the queue, exceed their client's share of it, or wait
+    longer than ``max_wait`` are rejected with RateLimited instead of piling
+    up behind the upstream's own rate limit.
+
+    A ``rate`` of 0 disables limiting.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        burst: int,
+        max_queue: int,
+        max_client_queue: int,
+        max_wait: float,
+        metrics: Optional[Metrics] = None,
+    ):
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self.max_queue = max_queue
+        self.max_client_queue = max_client_queue
+        self.max_wait = max_wait
+        self.metrics = metrics or Metrics()
+        self.tokens = float(self.burst)
+        # refill accrues from here; pushed into the future while the
+        # upstream has asked us to back off
+        self.updated = time.monotonic()
+        self.held = 0
+        # [priority, turn, seq, future]
+        self._waiters: List[list] = []
+        self._seq = 0
+        self._depth: Dict[int, int] = defaultdict(int)
+        self._queued: Dict[str, int] = defaultdict(int)
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    def _refill(self, now: float):
+        if now > self.updated:
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def _wait_for(self, ahead: int, now: float) -> float:
+        """Seconds until ``ahead`` more tokens than are available have accrued"""
+        return max(self.updated - now, 0.0) + max(ahead + 1 - self.tokens, 0.0) / self.rate
+
+    def _reject(self, reason: str, level: int, retry_after: float):
+        self.metrics.inc(
+            "pinata_limiter_requests_total",
+            (("priority", PRIORITY_NAMES[level]), ("result", reason)),
+            help="Pinata calls by admission result",
+        )
+        raise RateLimited(f"Pinata rate limit: {reason.replace('_', ' ')}", retry_after)
+
+    def _admitted(self, level: int, waited: float):
+        labels = (("priority", PRIORITY_NAMES[level]),)
+        self.metrics.inc(
+            "pinata_limiter_requests_total", labels + (("result", "admitted"),)
+        )
+        self.metrics.observe(
+            "pinata_limiter_wait_seconds",
+            labels,
+            waited,
+            help="Time Pinata calls spent queued in the rate limiter",
+        )
+
+    async def acquire(self):
+        """Wait for a token at the current context's priority and client"""
+        level = priority.get()
+        if self.rate <= 0:
+            self._admitted(level, 0.0)
+            return
+
+        now = time.monotonic()
+        self._refill(now)
+        if not self._waiters and self.tokens >= 1:
+            self.tokens -= 1
+            self._admitted(level, 0.0)
+            return
+
+        client = client_id.get()
+        # interactive calls only queue behind other interactive calls
+        ahead = sum(n for p, n in self._depth.items() if p <= level)
+        wait = self._wait_for(ahead, now)
+        if len(self._waiters) >= self.max_queue:
+            self._reject("queue_full", level, wait)
+        if self._queued[client] >= self.max_client_queue:
+            self._reject("client_share", level, wait)
+        if wait > self.max_wait:
+            self._reject("wait_too_long", level, wait)
+
+        future = asyncio.get_running_loop().create_future()
+        self._seq += 1
+        heapq.heappush(self._waiters, [level, self._queued[client], self._seq, future])
+        self._depth[level] += 1
+        self._queued[client] += 1
+        self._schedule()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # granted just as the caller went away; hand the token back
+                self.tokens = min(self.tokens + 1, self.burst)
+                self._schedule()
+            else:
+                future.cancel()
+            raise
+        finally:
+            self._depth[level] -= 1
+            self._queued[client] -= 1
+            if not self._queued[client]:
+                del self._queued[client]
+        self._admitted(level, time.monotonic() - now)
+
+    def _schedule(self):
+        if self._timer is not None:
+            return
+        now = time.monotonic()
+        self._refill(now)
+        while self._waiters and self.tokens >= 1:
+            future = heapq.heappop(self._waiters)[3]
+            if not future.done():
+                self.tokens -= 1
+                future.set_result(None)
+        if self._waiters:
+            self._timer = asyncio.get_running_loop().call_later(
+                self._wait_for(0, now), self._wake
+            )
+
+    def _wake(self):
+        self._timer = None
+        self._schedule()
+
+    def hold(self, seconds: float):
+        """Stop admitting calls for ``seconds`` after the upstream answered 429"""
+        self.held += 1
+        self.tokens = min(self.tokens, 0.0)
+        self.updated = max(self.updated, time.monotonic() + seconds)
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._waiters:
+            self._schedule()
+
+    def stats(self) -> Dict[str, float]:
+        self._refill(time.monotonic())
+        return {
+            "rate": self.rate,
+            "burst": self.burst,
+            "tokens": self.tokens,
+            "held_until_seconds": max(self.updated - time.monotonic(), 0.0),
+            "held": self.held,
+            "queued_interactive": self._depth[INTERACTIVE],
+            "queued_background": self._depth[BACKGROUND],
+            "queued_clients": len(self._queued),
+        }
+
+    def families(self) -> List[Family]:
+        stats = self.stats()
+        return [
+            (
+                "pinata_limiter_tokens",
+                "gauge",
+                "Tokens available in the Pinata rate limiter bucket",
+                [((), stats["tokens"])],
+            ),
+            (
+                "pinata_limiter_queued",
+                "gauge",
+                "Pinata calls waiting for a token",
+                [
+                    ((("priority", name),), self._depth[level])
+                    for level, name in PRIORITY_NAMES.items()
+                ],
+            ),
+            (
+                "pinata_limiter_queued_clients",
+                "gauge",
+                "Distinct clients with Pinata calls waiting for a token",
+                [((), stats["queued_clients"])],
+            ),
+            (
+                "pinata_limiter_upstream_holds_total",
+                "counter",
+                "Times Pinata answered 429 and the limiter paused admission",
+                [((), stats["held"])],
+            ),
+        ]
+
+
+class ClientContextMiddleware:
+    """ASGI middleware naming the API client behind each request
+
+    The X-Client-Id header wins so agents sharing an egress address can still
+    be told apart; otherwise the peer address is used.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        client = None
+        for name, value in scope.get("headers", ()):
+            if name == b"x-client-id":
+                client = value.decode("latin-1")[:128]
+                break
+        if not client and scope.get("client"):
+            client = scope["client"][0]
+        token = client_id.set(client or "anonymous")
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            client_id.reset(token)
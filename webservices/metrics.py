@@ -0,0 +1,180 @@
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Sequence, Tuple
+
+from starlette.routing import Match
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+Labels = Tuple[Tuple[str, str], ...]
+# (name, type, help, [(labels, value)])
+Family = Tuple[str, str, str, List[Tuple[Labels, float]]]
+
+
+class Histogram:
+    __slots__ = ("counts", "total", "count")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(BUCKETS, value)] += 1
+        self.total += value
+        self.count += 1
+
+
+def _labels(labels: Labels, **extra: str) -> str:
+    pairs = list(labels) + list(extra.items())
+    if not pairs:
+        return ""
+    escaped = (
+        (k, str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for k, v in pairs
+    )
+    return "{" + ",".join(f'{k}="{v}"' for k, v in escaped) + "}"
+
+
+class Metrics:
+    """In-process request and upstream metrics rendered in Prometheus text format"""
+
+    def __init__(self):
+        self.histograms: Dict[str, Dict[Labels, Histogram]] = defaultdict(dict)
+        self.counters: Dict[str, Dict[Labels, float]] = defaultdict(
+            lambda: defaultdict(float)
+        )
+        self.gauges: Dict[str, Dict[Labels, float]] = defaultdict(
+            lambda: defaultdict(float)
+        )
+        self.help: Dict[str, str] = {}
+        self.collectors: List[Callable[[], Sequence[Family]]] = []
+
+    def observe(self, name: str, labels: Labels, value: float, help: str = ""):
+        histogram = self.histograms[name].get(labels)
+        if histogram is None:
+            histogram = self.histograms[name][labels] = Histogram()
+        histogram.observe(value)
+        self.help.setdefault(name, help)
+
+    def inc(self, name: str, labels: Labels, value: float = 1.0, help: str = ""):
+        self.counters[name][labels] += value
+        self.help.setdefault(name, help)
+
+    def add(self, name: str, labels: Labels, value: float, help: str = ""):
+        self.gauges[name][labels] += value
+        self.help.setdefault(name, help)
+
+    @contextmanager
+    def upstream(self, operation: str) -> Iterator[None]:
+        """Time one call to an upstream service such as Pinata"""
+        labels = (("operation", operation),)
+        start = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            self.inc(
+                "upstream_errors_total", labels, help="Failed upstream calls"
+            )
+            raise
+        finally:
+            self.observe(
+                "upstream_request_duration_seconds",
+                labels,
+                time.perf_counter() - start,
+                help="Latency of upstream calls",
+            )
+
+    def render(self) -> str:
+        lines = []
+        for name, series in self.histograms.items():
+            lines.append(f"# HELP {name} {self.help.get(name, '')}")
+            lines.append(f"# TYPE {name} histogram")
+            for labels, histogram in series.items():
+                cumulative = 0
+                for bound, count in zip(BUCKETS + (float("inf"),), histogram.counts):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f"{name}_bucket{_labels(labels, le=le)} {cumulative}")
+                lines.append(f"{name}_sum{_labels(labels)} {histogram.total}")
+                lines.append(f"{name}_count{_labels(labels)} {histogram.count}")
+
+        families: List[Family] = [
+            (name, "counter", self.help.get(name, ""), list(series.items()))
+            for name, series in self.counters.items()
+        ]
+        families += [
+            (name, "gauge", self.help.get(name, ""), list(series.items()))
+            for name, series in self.gauges.items()
+        ]
+        for collector in self.collectors:
+            families += collector()
+
+        for name, kind, help, samples in families:
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                lines.append(f"{name}{_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording latency, in-flight and errors per route
+
+    Works the same under uvicorn and Mangum since both drive the app through
+    plain ASGI http scopes. Routes are labelled by their path template so
+    ``/ipfs/{ipfs_hash}`` is one series, not one per CID.
+    """
+
+    def __init__(self, app, metrics: Metrics, routes: list):
+        self.app = app
+        self.metrics = metrics
+        self.routes = routes
+
+    def _route(self, scope) -> str:
+        for route in self.routes:
+            match, _ = route.matches(scope)
+            if match == Match.FULL:
+                return route.path
+        return "unmatched"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        labels = (("method", scope["method"]), ("route", self._route(scope)))
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        self.metrics.add(
+            "http_requests_in_flight", labels, 1, help="Requests being served"
+        )
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            self.metrics.add("http_requests_in_flight", labels, -1)
+            self.metrics.observe(
+                "http_request_duration_seconds",
+                labels,
+                time.perf_counter() - start,
+                help="Time spent serving requests, including upstream calls",
+            )
+            self.metrics.inc(
+                "http_requests_total",
+                labels + (("status", str(status)),),
+                help="Requests served by status code",
+            )
+            if status >= 500:
+                self.metrics.inc(
+                    "http_request_errors_total",
+                    labels,
+                    help="Requests that failed with a 5xx",
+                )
@@ -0,0 +1,102 @@
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+# bumped whenever the table changes; older index files start over empty
+SCHEMA_VERSION = 1
+
+
+class PinIndex:
+    """LRU of already-pinned CIDs in memory, backed by a SQLite table
+
+    Keys are the locally computed CID of the content; values are the hash
+    the storage backend returned for it (the same CID unless serialization
+    diverged). Rows are kept per backend, so content pinned by one is not
+    taken as pinned by another sharing the same file.
+    """
+
+    def __init__(self, path: str, capacity: int = 4096, backend: str = "pinata"):
+        self.path = path
+        self.capacity = capacity
+        self.backend = backend
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._lru: "OrderedDict[str, str]" = OrderedDict()
+        self._db: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _conn(self) -> sqlite3.Connection:
+        if self._db is None:
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            (version,) = self._db.execute("PRAGMA user_version").fetchone()
+            if version != SCHEMA_VERSION:
+                # older rows do not say which backend holds them
+                self._db.executescript(
+                    "DROP TABLE IF EXISTS pins;"
+                    f"PRAGMA user_version = {SCHEMA_VERSION};"
+                )
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS pins ("
+                " backend TEXT NOT NULL,"
+                " cid TEXT NOT NULL,"
+                " ipfs_hash TEXT NOT NULL,"
+                " name TEXT,"
+                " pinned_at REAL NOT NULL,"
+                " PRIMARY KEY (backend, cid))"
+            )
+            self._db.commit()
+        return self._db
+
+    def _remember(self, cid: str, ipfs_hash: str):
+        self._lru[cid] = ipfs_hash
+        self._lru.move_to_end(cid)
+        while len(self._lru) > self.capacity:
+            self._lru.popitem(last=False)
+
+    def get(self, cid: str) -> Optional[str]:
+        """Return the pinned hash for ``cid`` if this backend pinned it before"""
+        with self._lock:
+            ipfs_hash = self._lru.get(cid)
+            if ipfs_hash is not None:
+                self._lru.move_to_end(cid)
+                self.memory_hits += 1
+                return ipfs_hash
+
+            row = (
+                self._conn()
+                .execute(
+                    "SELECT ipfs_hash FROM pins WHERE backend = ? AND cid = ?",
+                    (self.backend, cid),
+                )
+                .fetchone()
+            )
+            if row is None:
+                self.misses += 1
+                return None
+            self._remember(cid, row[0])
+            self.disk_hits += 1
+            return row[0]
+
+    def add(self, cid: str, ipfs_hash: str, name: Optional[str] = None):
+        """Record that ``cid`` is pinned as ``ipfs_hash``"""
+        with self._lock:
+            self._remember(cid, ipfs_hash)
+            db = self._conn()
+            db.execute(
+                "INSERT OR REPLACE INTO pins (backend, cid, ipfs_hash, name, pinned_at)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (self.backend, cid, ipfs_hash, name, time.time()),
+            )
+            db.commit()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "cached": len(self._lru),
+            "capacity": self.capacity,
+        }
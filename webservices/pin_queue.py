@@ -0,0 +1,257 @@
+import asyncio
+import random
+import sqlite3
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+
+from cid import bytes_cid, json_bytes
+from limiter import BACKGROUND, RateLimited, client_id, priority
+
+if TYPE_CHECKING:
+    from app import PinataHandler
+
+
+class PinJournal:
+    """Durable SQLite (WAL) journal of documents waiting to be pinned"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._db: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _conn(self) -> sqlite3.Connection:
+        if self._db is None:
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=FULL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                " cid TEXT PRIMARY KEY,"
+                " name TEXT NOT NULL,"
+                " body BLOB NOT NULL,"
+                " status TEXT NOT NULL DEFAULT 'pending',"
+                " attempts INTEGER NOT NULL DEFAULT 0,"
+                " next_attempt_at REAL NOT NULL,"
+                " last_error TEXT,"
+                " created_at REAL NOT NULL)"
+            )
+            self._db.commit()
+        return self._db
+
+    def add(self, cid: str, name: str, body: bytes):
+        """Journal a job, or start over one that failed for good"""
+        now = time.time()
+        with self._lock:
+            db = self._conn()
+            db.execute(
+                "INSERT INTO jobs (cid, name, body, next_attempt_at, created_at)"
+                " VALUES (?, ?, ?, ?, ?)"
+                " ON CONFLICT(cid) DO UPDATE SET status = 'pending', attempts = 0,"
+                " next_attempt_at = excluded.next_attempt_at"
+                " WHERE jobs.status = 'failed'",
+                (cid, name, body, now, now),
+            )
+            db.commit()
+
+    def due(self, limit: int) -> List[Tuple[str, str, bytes, int]]:
+        with self._lock:
+            return (
+                self._conn()
+                .execute(
+                    "SELECT cid, name, body, attempts FROM jobs"
+                    " WHERE status != 'failed' AND next_attempt_at <= ?"
+                    " ORDER BY next_attempt_at LIMIT ?",
+                    (time.time(), limit),
+                )
+                .fetchall()
+            )
+
+    def next_due_in(self) -> Optional[float]:
+        with self._lock:
+            row = (
+                self._conn()
+                .execute(
+                    "SELECT MIN(next_attempt_at) FROM jobs WHERE status != 'failed'"
+                )
+                .fetchone()
+            )
+        if row[0] is None:
+            return None
+        return max(row[0] - time.time(), 0.0)
+
+    def done(self, cid: str):
+        with self._lock:
+            db = self._conn()
+            db.execute("DELETE FROM jobs WHERE cid = ?", (cid,))
+            db.commit()
+
+    def retry(self, cid: str, error: str, next_attempt_at: float, give_up: bool):
+        with self._lock:
+            db = self._conn()
+            db.execute(
+                "UPDATE jobs SET attempts = attempts + 1, last_error = ?,"
+                " next_attempt_at = ?, status = ? WHERE cid = ?",
+                (error, next_attempt_at, "failed" if give_up else "retrying", cid),
+            )
+            db.commit()
+
+    def postpone(self, cid: str, next_attempt_at: float):
+        """Push a job back without counting it as a failed attempt"""
+        with self._lock:
+            db = self._conn()
+            db.execute(
+                "UPDATE jobs SET next_attempt_at = ? WHERE cid = ?",
+                (next_attempt_at, cid),
+            )
+            db.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            db = self._conn()
+            counts = dict(
+                db.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+            )
+            oldest = db.execute(
+                "SELECT MIN(created_at) FROM jobs WHERE status != 'failed'"
+            ).fetchone()[0]
+            errors = db.execute(
+                "SELECT cid, attempts, status, last_error, next_attempt_at FROM jobs"
+                " WHERE last_error IS NOT NULL ORDER BY next_attempt_at DESC LIMIT 10"
+            ).fetchall()
+        return {
+            "depth": sum(counts.get(s, 0) for s in ("pending", "retrying")),
+            "pending": counts.get("pending", 0),
+            "retrying": counts.get("retrying", 0),
+            "failed": counts.get("failed", 0),
+            "oldest_age_seconds": time.time() - oldest if oldest else 0.0,
+            "recent_errors": [
+                {
+                    "cid": cid,
+                    "attempts": attempts,
+                    "status": status,
+                    "error": error,
+                    "next_attempt_at": next_attempt_at,
+                }
+                for cid, attempts, status, error, next_attempt_at in errors
+            ],
+        }
+
+
+class PinQueue:
+    """Write-behind pinning: journal now, pin in the background with backoff
+
+    Documents are serialized exactly as they will be uploaded, so the CID
+    handed back to the caller is the one Pinata ends up storing.
+    """
+
+    def __init__(
+        self,
+        journal: PinJournal,
+        pinata: "PinataHandler",
+        concurrency: int = 4,
+        max_attempts: int = 10,
+        base_delay: float = 1.0,
+        max_delay: float = 300.0,
+    ):
+        self.journal = journal
+        self.pinata = pinata
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.pinned = 0
+        self.attempts = 0
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+
+    async def enqueue(self, name: str, data: Dict[str, Any]) -> Tuple[str, bool]:
+        """Journal ``data`` for pinning and return its CID immediately
+
+        The flag is False when the content was already pinned, in which case
+        the hash the backend pinned it under is returned instead.
+        """
+        body = json_bytes(data)
+        cid = bytes_cid(body)
+        pinned = self.pinata.index.get(cid)
+        if pinned is not None:
+            # the hash the backend pinned, which may not be our CID (v0 vs v1,
+            # upstream chunking)
+            return pinned, False
+
+        self.journal.add(cid, name, body)
+        # readers following the returned gateway URL get it before the pin lands
+        await self.pinata.cache.put(cid, body, "application/json")
+        self.start()
+        self._wakeup.set()
+        return cid, True
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        # the task inherits the context of the request that started it
+        priority.set(BACKGROUND)
+        client_id.set("pin-queue")
+        while True:
+            jobs = self.journal.due(self.concurrency)
+            if jobs:
+                await asyncio.gather(*(self._pin(*job) for job in jobs))
+                continue
+
+            self._wakeup.clear()
+            timeout = self.journal.next_due_in()
+            try:
+                await asyncio.wait_for(
+                    self._wakeup.wait(), timeout=60.0 if timeout is None else timeout
+                )
+            except asyncio.TimeoutError:
+                pass
+
+    async def _pin(self, cid: str, name: str, body: bytes, attempts: int):
+        self.attempts += 1
+        try:
+            ipfs_hash = await self.pinata.pin_bytes(name, body)
+        except RateLimited as e:
+            # interactive pins have the upstream's budget; try again later
+            self.journal.postpone(cid, time.time() + e.retry_after)
+            return
+        except Exception as e:
+            delay = min(self.base_delay * 2**attempts, self.max_delay)
+            give_up = attempts + 1 >= self.max_attempts
+            print(f"FAILED background pin {cid} attempt {attempts + 1}: {e!r}")
+            self.journal.retry(
+                cid, str(e), time.time() + delay * random.uniform(0.5, 1.0), give_up
+            )
+            return
+
+        if ipfs_hash != cid:
+            # retrying cannot fix a chunking/serialization mismatch
+            print(f"FAILED background pin {cid}: Pinata stored {ipfs_hash}")
+            self.journal.retry(
+                cid, f"Pinata stored {ipfs_hash}", time.time(), give_up=True
+            )
+            return
+
+        self.pinata.index.add(cid, ipfs_hash, name)
+        self.journal.done(cid)
+        self.pinned += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self.journal.stats(),
+            "worker_running": self._task is not None and not self._task.done(),
+            "pinned": self.pinned,
+            "attempts": self.attempts,
+        }
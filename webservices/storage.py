@@ -0,0 +1,419 @@
+"""Content-addressed stores the pin routes can write to
+
+``STORAGE_BACKEND`` selects one of:
+
+- ``pinata``: the Pinata pinning API and gateway (default)
+- ``kubo``: the HTTP RPC API of a Kubo (go-ipfs) node
+- ``local``: a directory on disk, addressed by the CIDv1 values ``cid.py``
+  computes, which are the ones the other two backends assign
+"""
+
+import json
+import os
+import secrets
+from abc import ABC, abstractmethod
+from typing import TYPE_CHECKING, Any, AsyncIterator, Dict, Optional, Tuple
+
+import anyio
+
+from cid import UnixFSHasher, bytes_cid, json_bytes
+from limiter import RateLimited, retry_after_seconds
+from uploads import UploadError
+
+if TYPE_CHECKING:
+    import httpx
+
+
+def guess_type(data: bytes) -> str:
+    """Content type for stores that do not keep one, from the leading bytes"""
+    if data[:8] == b"\x89PNG\r\n\x1a\n":
+        return "image/png"
+    if data[:3] == b"\xff\xd8\xff":
+        return "image/jpeg"
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    if data[:6] in (b"GIF87a", b"GIF89a"):
+        return "image/gif"
+    if data[:1] in (b"{", b"["):
+        return "application/json"
+    return "application/octet-stream"
+
+
+async def multipart_file(
+    name: str,
+    chunks: AsyncIterator[bytes],
+    content_type: str,
+    boundary: str,
+    fields: Optional[Dict[str, str]] = None,
+) -> AsyncIterator[bytes]:
+    """Frame a streamed file (and optional form fields) as multipart/form-data"""
+    for field, value in (fields or {}).items():
+        yield (
+            f"--{boundary}\r\n"
+            f'Content-Disposition: form-data; name="{field}"\r\n\r\n'
+            f"{value}\r\n"
+        ).encode()
+    filename = name.replace('"', "%22")
+    yield (
+        f"--{boundary}\r\n"
+        f'Content-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+        f"Content-Type: {content_type}\r\n\r\n"
+    ).encode()
+    async for chunk in chunks:
+        yield chunk
+    yield f"\r\n--{boundary}--\r\n".encode()
+
+
+class Storage(ABC):
+    """Interface of a content-addressed store
+
+    Every ``add_*`` returns the CID the store assigned. ``remote`` stores are
+    read through the local content cache; local ones are not.
+    """
+
+    name = "storage"
+    remote = True
+    # base URL serving /ipfs/{cid} for this store; empty means this service,
+    # at the base URL of the request being answered
+    gateway_base_url = ""
+
+    async def add_json(self, name: str, data: Dict[str, Any]) -> str:
+        return await self.add_bytes(name, json_bytes(data), "application/json")
+
+    @abstractmethod
+    async def add_bytes(self, name: str, body: bytes, content_type: str) -> str:
+        ...
+
+    @abstractmethod
+    async def add_file(
+        self, name: str, chunks: AsyncIterator[bytes], content_type: str
+    ) -> str:
+        ...
+
+    @abstractmethod
+    async def get(self, cid: str) -> Tuple[bytes, str]:
+        ...
+
+    async def close(self):
+        pass
+
+
+def open_client(timeout: float) -> "httpx.AsyncClient":
+    """A keep-alive connection pool, over HTTP/2 when h2 is installed"""
+    # httpx (and h2) are imported here rather than at module load so that
+    # cold starts which never go over the network do not pay for them
+    import httpx
+
+    try:
+        import h2  # noqa: F401
+
+        http2 = True
+    except ImportError:
+        http2 = False
+
+    return httpx.AsyncClient(
+        http2=http2,
+        timeout=httpx.Timeout(timeout, connect=5.0),
+        limits=httpx.Limits(
+            max_connections=int(os.getenv("PINATA_MAX_CONNECTIONS", "100")),
+            max_keepalive_connections=20,
+            keepalive_expiry=30.0,
+        ),
+    )
+
+
+class HttpStorage(Storage):
+    """Shared keep-alive HTTP client for the stores reached over the network"""
+
+    def __init__(self):
+        self.timeout = float(os.getenv("PINATA_TIMEOUT", "30"))
+        self.client: Optional["httpx.AsyncClient"] = None
+
+    async def start(self) -> "httpx.AsyncClient":
+        """Open the shared keep-alive connection pool on first use"""
+        if self.client is None:
+            self.client = open_client(self.timeout)
+        return self.client
+
+    async def close(self):
+        """Close the shared connection pool"""
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+
+
+class PinataStorage(HttpStorage):
+    name = "pinata"
+
+    def __init__(self):
+        super().__init__()
+        self.headers = {
+            "pinata_api_key": os.getenv("PINATA_API_KEY"),
+            "pinata_secret_api_key": os.getenv("PINATA_SECRET_KEY"),
+        }
+        self.base_url = os.getenv("PINATA_API_URL", "https://api.pinata.cloud")
+        self.gateway_base_url = os.getenv(
+            "PINATA_GATEWAY_URL", "https://gateway.pinata.cloud"
+        )
+
+    @property
+    def auth_headers(self) -> Dict[str, str]:
+        # credentials go to the pinning API only, never to gateways
+        return {k: v for k, v in self.headers.items() if v is not None}
+
+    def check_quota(self, response: "httpx.Response"):
+        """Surface Pinata's own rate limiting so the limiter can back off"""
+        if response.status_code == 429:
+            raise RateLimited(
+                "Pinata rate limit: upstream quota",
+                retry_after_seconds(response.headers.get("retry-after"), 60.0),
+            )
+
+    async def add_json(self, name: str, data: Dict[str, Any]) -> str:
+        """Upload JSON data to Pinata"""
+        try:
+            url = f"{self.base_url}/pinning/pinJSONToIPFS"
+            client = await self.start()
+            response = await client.post(
+                url,
+                headers=self.auth_headers,
+                json={
+                    "pinataOptions": {"cidVersion": 1},
+                    "pinataMetadata": {"name": name },
+                    "pinataContent": data,
+                },
+            )
+            self.check_quota(response)
+            response.raise_for_status()
+            return response.json()["IpfsHash"]
+        except RateLimited:
+            raise
+        except Exception as e:
+            raise Exception(f"Pinata upload failed: {str(e)}")
+
+    async def add_bytes(self, name: str, body: bytes, content_type: str) -> str:
+        """Upload exact bytes to Pinata as a CIDv1 file"""
+        try:
+            url = f"{self.base_url}/pinning/pinFileToIPFS"
+            client = await self.start()
+            response = await client.post(
+                url,
+                headers=self.auth_headers,
+                files={"file": (name, body, content_type)},
+                data={
+                    "pinataOptions": json.dumps({"cidVersion": 1}),
+                    "pinataMetadata": json.dumps({"name": name}),
+                },
+            )
+            self.check_quota(response)
+            response.raise_for_status()
+            return response.json()["IpfsHash"]
+        except RateLimited:
+            raise
+        except Exception as e:
+            raise Exception(f"Pinata upload failed: {str(e)}")
+
+    async def add_file(
+        self, name: str, chunks: AsyncIterator[bytes], content_type: str
+    ) -> str:
+        """Stream a file to Pinata as a CIDv1 file"""
+        boundary = secrets.token_hex(16)
+        body = multipart_file(
+            name,
+            chunks,
+            content_type,
+            boundary,
+            fields={
+                "pinataOptions": json.dumps({"cidVersion": 1}),
+                "pinataMetadata": json.dumps({"name": name}),
+            },
+        )
+        try:
+            url = f"{self.base_url}/pinning/pinFileToIPFS"
+            client = await self.start()
+            response = await client.post(
+                url,
+                content=body,
+                headers={
+                    **self.auth_headers,
+                    "Content-Type": f"multipart/form-data; boundary={boundary}",
+                },
+            )
+            self.check_quota(response)
+            response.raise_for_status()
+            return response.json()["IpfsHash"]
+        except (UploadError, RateLimited):
+            raise
+        except Exception as e:
+            raise Exception(f"Pinata file upload failed: {str(e)}")
+
+    async def get(self, cid: str) -> Tuple[bytes, str]:
+        try:
+            url = f"{self.gateway_base_url}/ipfs/{cid}"
+            client = await self.start()
+            response = await client.get(url, follow_redirects=True)
+            response.raise_for_status()
+        except Exception as e:
+            raise Exception(f"Failed to retrieve from Pinata: {str(e)}")
+        return (
+            response.content,
+            response.headers.get("content-type", "application/octet-stream"),
+        )
+
+
+class KuboStorage(HttpStorage):
+    """A Kubo node's RPC API (``/api/v0``), e.g. a self-hosted IPFS daemon"""
+
+    name = "kubo"
+
+    def __init__(self):
+        super().__init__()
+        self.base_url = os.getenv("KUBO_API_URL", "http://127.0.0.1:5001")
+        self.gateway_base_url = os.getenv("KUBO_GATEWAY_URL", "")
+
+    async def _add(self, client: "httpx.AsyncClient", **kwargs) -> str:
+        # cid-version=1 implies raw leaves, matching Pinata's cidVersion 1
+        response = await client.post(
+            f"{self.base_url}/api/v0/add",
+            params={"cid-version": "1", "pin": "true", "quieter": "true"},
+            **kwargs,
+        )
+        response.raise_for_status()
+        return response.json()["Hash"]
+
+    async def add_bytes(self, name: str, body: bytes, content_type: str) -> str:
+        try:
+            client = await self.start()
+            return await self._add(client, files={"file": (name, body, content_type)})
+        except Exception as e:
+            raise Exception(f"Kubo upload failed: {str(e)}")
+
+    async def add_file(
+        self, name: str, chunks: AsyncIterator[bytes], content_type: str
+    ) -> str:
+        boundary = secrets.token_hex(16)
+        try:
+            client = await self.start()
+            return await self._add(
+                client,
+                content=multipart_file(name, chunks, content_type, boundary),
+                headers={"Content-Type": f"multipart/form-data; boundary={boundary}"},
+            )
+        except UploadError:
+            raise
+        except Exception as e:
+            raise Exception(f"Kubo file upload failed: {str(e)}")
+
+    async def get(self, cid: str) -> Tuple[bytes, str]:
+        try:
+            client = await self.start()
+            # every RPC endpoint is POST-only
+            response = await client.post(
+                f"{self.base_url}/api/v0/cat", params={"arg": cid}
+            )
+            response.raise_for_status()
+        except Exception as e:
+            raise Exception(f"Failed to retrieve from Kubo: {str(e)}")
+        return response.content, guess_type(response.content)
+
+
+class LocalStorage(Storage):
+    """Content-addressed directory on local disk
+
+    Files are written under their CID (``<dir>/<last two chars>/<cid>``)
+    with the content type in a ``.type`` sidecar, through a temporary file
+    and ``os.replace`` so readers never see a partial write. File IO runs in
+    worker threads, off the event loop.
+    """
+
+    name = "local"
+    remote = False
+
+    def __init__(self):
+        self.directory = os.getenv("STORAGE_DIR", "/tmp/ipfs-store")
+        self.gateway_base_url = os.getenv("STORAGE_GATEWAY_URL", "")
+
+    def _path(self, cid: str) -> str:
+        return os.path.join(self.directory, cid[-2:], cid)
+
+    def _commit(self, tmp: str, cid: str, content_type: str):
+        path = self._path(cid)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(f"{path}.type", "w") as f:
+            f.write(content_type)
+        os.replace(tmp, path)
+
+    def _tmp(self) -> str:
+        os.makedirs(self.directory, exist_ok=True)
+        return os.path.join(self.directory, f".tmp-{secrets.token_hex(8)}")
+
+    def _write(self, cid: str, body: bytes, content_type: str):
+        if os.path.exists(self._path(cid)):
+            return
+        tmp = self._tmp()
+        with open(tmp, "wb") as f:
+            f.write(body)
+        self._commit(tmp, cid, content_type)
+
+    def _discard(self, tmp: str):
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+
+    def _read(self, cid: str) -> Tuple[bytes, str]:
+        path = self._path(cid)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            raise Exception(f"{cid} is not in the local store")
+        try:
+            with open(f"{path}.type") as f:
+                content_type = f.read()
+        except FileNotFoundError:
+            content_type = guess_type(data)
+        return data, content_type
+
+    async def add_bytes(self, name: str, body: bytes, content_type: str) -> str:
+        cid = bytes_cid(body)
+        await anyio.to_thread.run_sync(self._write, cid, body, content_type)
+        return cid
+
+    async def add_file(
+        self, name: str, chunks: AsyncIterator[bytes], content_type: str
+    ) -> str:
+        hasher = UnixFSHasher()
+        tmp = await anyio.to_thread.run_sync(self._tmp)
+        try:
+            f = await anyio.to_thread.run_sync(open, tmp, "wb")
+            try:
+                async for chunk in chunks:
+                    hasher.update(chunk)
+                    await anyio.to_thread.run_sync(f.write, chunk)
+            finally:
+                await anyio.to_thread.run_sync(f.close)
+            cid = hasher.cid()
+            await anyio.to_thread.run_sync(self._commit, tmp, cid, content_type)
+        except BaseException:
+            with anyio.CancelScope(shield=True):
+                await anyio.to_thread.run_sync(self._discard, tmp)
+            raise
+        return cid
+
+    async def get(self, cid: str) -> Tuple[bytes, str]:
+        return await anyio.to_thread.run_sync(self._read, cid)
+
+
+BACKENDS = {
+    "pinata": PinataStorage,
+    "kubo": KuboStorage,
+    "local": LocalStorage,
+}
+
+
+def create_storage(name: str) -> Storage:
+    try:
+        return BACKENDS[name]()
+    except KeyError:
+        raise ValueError(
+            f"unknown STORAGE_BACKEND {name!r}; expected one of {', '.join(BACKENDS)}"
+        ) from None
@@ -0,0 +1,207 @@
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from fastapi import Request
+
+
+class UploadError(Exception):
+    status_code = 400
+
+
+class UploadTooLarge(UploadError):
+    status_code = 413
+
+
+class FilePartForwarder:
+    """Extract the ``file`` part of an incoming multipart body as it streams
+
+    Incoming chunks are fed to a streaming multipart parser and the file bytes
+    are handed on as soon as they are parsed, so nothing is buffered beyond
+    the chunk in flight. The storage backend decides how to frame them.
+    """
+
+    def __init__(
+        self,
+        boundary: bytes,
+        max_bytes: int,
+        field: bytes = b"file",
+        capture_bytes: int = 0,
+    ):
+        from multipart.multipart import MultipartParser
+
+        self.field = field
+        self.max_bytes = max_bytes
+        # keep a copy of files up to this size for post-processing
+        self.capture_bytes = capture_bytes
+        self.captured: Optional[bytearray] = bytearray() if capture_bytes else None
+        self.size = 0
+        self.filename: Optional[str] = None
+        self.content_type = "application/octet-stream"
+        self._pending: List[bytes] = []
+        self._headers: Dict[bytes, bytes] = {}
+        self._header_field = bytearray()
+        self._header_value = bytearray()
+        self._in_file = False
+        self._done = False
+        self._parser = MultipartParser(
+            boundary,
+            callbacks={
+                "on_part_begin": self._on_part_begin,
+                "on_header_field": self._on_header_field,
+                "on_header_value": self._on_header_value,
+                "on_header_end": self._on_header_end,
+                "on_headers_finished": self._on_headers_finished,
+                "on_part_data": self._on_part_data,
+                "on_part_end": self._on_part_end,
+            },
+        )
+
+    def feed(self, chunk: bytes) -> List[bytes]:
+        """Parse an incoming chunk and return the file bytes it contained"""
+        self._parser.write(chunk)
+        pending, self._pending = self._pending, []
+        return pending
+
+    def finish(self):
+        """Check the whole body has been parsed and contained the file"""
+        self._parser.finalize()
+        if not self._done:
+            raise UploadError(f"missing '{self.field.decode()}' file field")
+
+    def _on_part_begin(self):
+        self._headers = {}
+
+    def _on_header_field(self, data: bytes, start: int, end: int):
+        self._header_field += data[start:end]
+
+    def _on_header_value(self, data: bytes, start: int, end: int):
+        self._header_value += data[start:end]
+
+    def _on_header_end(self):
+        self._headers[bytes(self._header_field).lower()] = bytes(self._header_value)
+        self._header_field.clear()
+        self._header_value.clear()
+
+    def _on_headers_finished(self):
+        from multipart.multipart import parse_options_header
+
+        _, options = parse_options_header(
+            self._headers.get(b"content-disposition", b"")
+        )
+        if options.get(b"name") != self.field or self._done:
+            return
+        self._in_file = True
+        self.filename = options.get(b"filename", b"upload").decode(errors="replace")
+        self.content_type = self._headers.get(
+            b"content-type", b"application/octet-stream"
+        ).decode(errors="replace")
+
+    def _on_part_data(self, data: bytes, start: int, end: int):
+        if not self._in_file:
+            return
+        self.size += end - start
+        if self.size > self.max_bytes:
+            raise UploadTooLarge(f"upload exceeds {self.max_bytes} bytes")
+        chunk = bytes(data[start:end])
+        self._pending.append(chunk)
+        if self.captured is not None:
+            if self.size > self.capture_bytes:
+                self.captured = None
+            else:
+                self.captured += chunk
+
+    def _on_part_end(self):
+        if self._in_file:
+            self._in_file = False
+            self._done = True
+
+
+async def iter_lines(
+    chunks: AsyncIterator[bytes], max_line_bytes: int
+) -> AsyncIterator[Optional[bytes]]:
+    """Split a streamed body into lines without holding more than one
+
+    Yields None in place of a line longer than ``max_line_bytes``, whose bytes
+    are discarded as they arrive. Blank lines are skipped.
+    """
+    line = bytearray()
+    oversized = False
+    async for chunk in chunks:
+        start = 0
+        while True:
+            end = chunk.find(b"\n", start)
+            piece = chunk[start:] if end < 0 else chunk[start:end]
+            if not oversized:
+                line += piece
+                if len(line) > max_line_bytes:
+                    oversized = True
+                    line.clear()
+            if end < 0:
+                break
+            if oversized:
+                yield None
+            elif line.strip():
+                yield bytes(line)
+            line.clear()
+            oversized = False
+            start = end + 1
+    if oversized:
+        yield None
+    elif line.strip():
+        yield bytes(line)
+
+
+async def forward_file_upload(
+    request: Request, max_bytes: int, capture_bytes: int = 0
+) -> Tuple[FilePartForwarder, AsyncIterator[bytes]]:
+    """Stream the bytes of the file uploaded in ``request``
+
+    Reads just far enough into the body to see the file part's headers, so
+    ``filename`` and ``content_type`` are set when this returns.
+    """
+    from multipart.multipart import parse_options_header
+
+    content_type, options = parse_options_header(
+        request.headers.get("content-type", "")
+    )
+    if content_type != b"multipart/form-data" or b"boundary" not in options:
+        raise UploadError("expected a multipart/form-data body")
+
+    # leave room for the multipart envelope around the file itself
+    content_length = request.headers.get("content-length")
+    length: Optional[int] = None
+    if content_length:
+        try:
+            length = int(content_length)
+        except ValueError:
+            raise UploadError("invalid Content-Length header")
+        if length < 0:
+            raise UploadError("invalid Content-Length header")
+    if length is not None and length > max_bytes + 64 * 1024:
+        raise UploadTooLarge(f"upload exceeds {max_bytes} bytes")
+    if length is None or length > capture_bytes + 64 * 1024:
+        # unknown or too big to keep a copy of; don't start buffering only to
+        # drop it, so chunked uploads always stream with flat memory
+        capture_bytes = 0
+
+    forwarder = FilePartForwarder(
+        options[b"boundary"], max_bytes, capture_bytes=capture_bytes
+    )
+
+    stream = request.stream()
+    first: List[bytes] = []
+    async for chunk in stream:
+        first += forwarder.feed(chunk)
+        if forwarder.filename is not None:
+            break
+    else:
+        forwarder.finish()
+
+    async def body() -> AsyncIterator[bytes]:
+        for part in first:
+            yield part
+        async for chunk in stream:
+            for part in forwarder.feed(chunk):
+                yield part
+        forwarder.finish()
+
+    return forwarder, body()